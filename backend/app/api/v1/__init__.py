@@ -1,7 +1,8 @@
 from fastapi import APIRouter
-from app.api.v1 import media, config
+from app.api.v1 import media, config, metrics
 
 router = APIRouter()
 
 router.include_router(media.router, prefix="/media", tags=["media"])
-router.include_router(config.router, prefix="/config", tags=["config"])
\ No newline at end of file
+router.include_router(config.router, prefix="/config", tags=["config"])
+router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
\ No newline at end of file
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Literal, Dict
+from typing import Dict
 from sqlalchemy.orm import Session
 
-from app.core.config import settings
+from app.core.config import AI_MODELS, AIModelName, settings
 from app.core.database import get_db
+from app.services.model_registry import get_model_registry
+from app.services.yolo_models import discover_yolo_bundles, yolo_input_size
 
 router = APIRouter()
 
 class AIModelConfig(BaseModel):
-    model: Literal["clip", "opencv_dnn", "opencv_yolo"]
+    model: AIModelName
 
 class ConfigResponse(BaseModel):
     message: str
@@ -19,7 +21,11 @@ class ConfigResponse(BaseModel):
 def get_config():
     """Obtiene la configuración actual del sistema."""
     current_settings = {
-        "ai_model": settings.AI_MODEL
+        "ai_model": settings.AI_MODEL,
+        "yolo_variant": settings.YOLO_VARIANT,
+        "yolo_input_size": yolo_input_size(),
+        # Variantes de YOLO con cfg y pesos en el directorio de modelos
+        "yolo_variants": sorted(discover_yolo_bundles())
     }
     return {
         "message": "Configuración actual del sistema",
@@ -31,7 +37,7 @@ def set_ai_model(config: AIModelConfig):
     """Establece el modelo de IA a utilizar para la clasificación de imágenes."""
     try:
         # Validar el modelo seleccionado
-        if config.model not in ["clip", "opencv_dnn", "opencv_yolo"]:
+        if config.model not in AI_MODELS:
             raise ValueError(f"Modelo de IA no válido: {config.model}")
             
         # Actualizar la configuración en memoria
@@ -40,6 +46,10 @@ def set_ai_model(config: AIModelConfig):
         # Guardar la configuración en archivo para persistencia
         save_result = settings.save_config_to_file()
         
+        # Cargar y calentar en segundo plano los modelos del nuevo backend
+        if settings.MODEL_PRELOAD:
+            get_model_registry().preload(config.model)
+        
         if save_result:
             message = f"Modelo de IA cambiado a {config.model} y configuración guardada"
         else:
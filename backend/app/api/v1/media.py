@@ -1,20 +1,38 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 import os
 import re
-import shutil
 import hashlib
 import json
 from pathlib import Path
 from app.core.config import settings
-from app.core.database import get_db
-from app.schemas.media import Media, MediaCreate, MediaUpdate
+from app.core.database import SessionLocal, get_db
+from app.schemas.media import Media, MediaUpdate, MediaSearchResult, ReclassifyRequest, ReclassifyResult, UploadCheckRequest, UploadCheckResult
+from app.schemas.job import BatchUploadResult, IngestJob, UploadAccepted
+from app.schemas.upload import UploadSession as UploadSessionSchema, UploadSessionCreate
 from app.crud import media as media_crud
-from app.services.media_processor import MediaProcessor
+from app.crud import job as job_crud
+from app.crud import upload as upload_crud
+from app.models.job import JOB_COMPLETED
+from app.services.media_processor import get_media_processor
+from app.services.ingest_queue import IngestQueue
+from app.services.media_workers import create_media_process_pool
+from app.services.model_pool import model_memory_sweeper
+from app.services.model_registry import get_model_registry
+from app.services.classification_cache import classification_cache
+from app.services.multipart_upload import ReceivedFile, receive_files
+from app.services.uploads import parse_content_range, resumable_uploads, store_upload, store_uploads
+from app.services.reclassify import reclassify_library
+from app.services.semantic_search import search_media
+from app.services.similarity_index import get_similarity_index, save_similarity_indexes
+from app.utils.file_validator import ALLOWED_MIMES
 
 router = APIRouter()
-media_processor = MediaProcessor()
+media_processor = get_media_processor()
+ingest_queue = IngestQueue(media_processor, process_pool=create_media_process_pool())
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -33,119 +51,297 @@ def sanitize_filename(filename: str) -> str:
     # Reconstruir nombre con extensión
     return f"{name}{ext.lower()}"
 
-def is_supported_file(file: UploadFile) -> bool:
-    """Verifica si el archivo es de un tipo soportado"""
-    mime_type = get_correct_mime_type(file)
-    return mime_type.startswith('image/') or mime_type.startswith('video/')
-
-# Definir una función para obtener el tipo MIME correcto
-def get_correct_mime_type(file: UploadFile) -> str:
-    """Determina el tipo MIME correcto para el archivo."""
-    if file.filename:
-        ext = Path(file.filename).suffix.lower()
-        if ext in ['.heic', '.heif']:
-            return 'image/heic'
-    return file.content_type
-
-@router.post("/upload/", response_model=Media)
+@router.post(
+    "/upload/",
+    response_model=UploadAccepted,
+    status_code=202,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"]
+    }}}}}
+)
 async def upload_media(
-    file: UploadFile = File(...),
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
+    """
+    Guarda el archivo y encola su procesamiento.
+
+    El cuerpo multipart se analiza en streaming: el archivo se escribe una sola
+    vez en disco mientras se calcula su SHA-256 y se detecta su tipo real.
+    Devuelve 202 con el identificador del trabajo de ingesta; la miniatura,
+    los metadatos y la clasificación se generan en segundo plano. Si ya existe
+    un medio con el mismo contenido (SHA-256) se devuelve ese medio con 200 y
+    no se vuelve a procesar.
+    """
+    received_files = await receive_files(request, ("file",))
+    if not received_files:
+        raise HTTPException(status_code=400, detail="No se ha enviado ningún archivo (campo 'file')")
+    received, extra = received_files[0], received_files[1:]
+    for other in extra:
+        other.discard()
+
     # Log de información del archivo
     print(f"DEBUG: Intento de subida de archivo:")
-    print(f"DEBUG: Nombre del archivo: {file.filename}")
-    print(f"DEBUG: Tipo de contenido original: {file.content_type}")
-    print(f"DEBUG: Tamaño: {file.size if hasattr(file, 'size') else 'desconocido'}")
-
-    # Determinar tipo MIME correcto
-    content_type = get_correct_mime_type(file)
-    print(f"DEBUG: Tipo de contenido ajustado: {content_type}")
-
-    if not is_supported_file(file):
-        error_msg = f"Tipo de archivo no soportado: {content_type}"
-        print(f"DEBUG: ERROR - {error_msg}")
-        raise HTTPException(status_code=400, detail=error_msg)
+    print(f"DEBUG: Nombre del archivo: {received.filename}")
+    print(f"DEBUG: Tipo de contenido declarado: {received.declared_type}")
+    print(f"DEBUG: Tamaño: {received.size}")
+
+    if received.error:
+        print(f"DEBUG: ERROR - {received.error}")
+        raise HTTPException(status_code=received.status_code, detail=received.error)
+
+    # Tipo MIME detectado con libmagic (los HEIC se identifican también por extensión)
+    content_type = _media_mime_type(received)
+    print(f"DEBUG: Tipo de contenido detectado: {content_type}, SHA-256: {received.content_hash}")
     
     # Sanitizar nombre de archivo
-    safe_filename = sanitize_filename(file.filename)
+    safe_filename = sanitize_filename(received.filename)
     print(f"DEBUG: Nombre sanitizado: {safe_filename}")
     
-    # Crear directorio de uploads si no existe
-    uploads_dir = settings.UPLOADS_DIR
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-    print(f"DEBUG: Directorio de uploads verificado: {uploads_dir}")
+    # El almacenamiento se indexa por contenido: dos fotos distintas con el mismo
+    # nombre ya no se sobrescriben, y un contenido repetido no se reprocesa
+    # (inserción y rename en el pool de hilos, como en la subida por lotes)
+    db_media, created = await run_in_threadpool(
+        store_upload, db, *received.as_pending(safe_filename, content_type)
+    )
+    if not created:
+        print(f"DEBUG: Contenido duplicado, se devuelve media {db_media.id}")
+        response.status_code = 200
+        return await run_in_threadpool(_duplicate_accepted, db, db_media)
+    print(f"DEBUG: Archivo guardado exitosamente en: {db_media.file_path}")
     
-    # Guardar archivo
-    file_path = uploads_dir / safe_filename
+    return await run_in_threadpool(_enqueue_ingest, db, db_media)
+
+@router.post(
+    "/upload/batch",
+    response_model=BatchUploadResult,
+    status_code=202,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+        "required": ["files"]
+    }}}}}
+)
+async def upload_media_batch(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Sube varios archivos (campo ``files``) en una sola petición.
+
+    Todos los medios nuevos se insertan en una única transacción y sus trabajos
+    de ingesta se reparten entre los trabajadores de la cola. La respuesta
+    indica el resultado de cada archivo; un archivo rechazado no impide
+    registrar los demás.
+    """
+    received_files = await receive_files(request, ("files", "file"), max_files=settings.UPLOAD_BATCH_MAX_FILES)
+    print(f"DEBUG: Subida por lotes de {len(received_files)} archivos")
+
+    valid = [received for received in received_files if not received.error]
+    stored = await run_in_threadpool(store_uploads, db, [
+        received.as_pending(sanitize_filename(received.filename), _media_mime_type(received))
+        for received in valid
+    ])
+
+    new_media = [db_media for db_media, created in stored if created]
+    jobs_by_media = {}
+    if new_media:
+        db_jobs = job_crud.create_jobs(db, [db_media.id for db_media in new_media])
+        ingest_queue.enqueue_many([db_job.id for db_job in db_jobs])
+        jobs_by_media = {db_job.media_id: db_job for db_job in db_jobs}
+
+    results = iter(stored)
+    items = []
+    for received in received_files:
+        if received.error:
+            items.append({"filename": received.filename, "status": "error", "error": received.error})
+            continue
+        db_media, created = next(results)
+        if created:
+            accepted = _upload_accepted(jobs_by_media[db_media.id])
+            items.append({**accepted, "filename": received.filename, "status": "accepted"})
+        else:
+            duplicate = _duplicate_accepted(db, db_media)
+            items.append({**duplicate, "filename": received.filename, "status": "duplicate"})
+    print(f"DEBUG: Lote registrado: {len(new_media)} nuevos, {len(valid) - len(new_media)} duplicados, "
+          f"{len(received_files) - len(valid)} con error")
+
+    return {
+        "accepted": len(new_media),
+        "duplicates": len(valid) - len(new_media),
+        "failed": len(received_files) - len(valid),
+        "items": items
+    }
+
+@router.post("/upload/check", response_model=UploadCheckResult)
+def check_uploads(
+    request: UploadCheckRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Indica qué archivos (por SHA-256 y tamaño calculados en el cliente) ya están
+    almacenados, para que el cliente solo suba los que faltan.
+    """
+    requested = {item.content_hash.lower(): item.file_size for item in request.files}
+    stored = media_crud.get_media_by_hashes(db, list(requested))
+    existing = [
+        {"content_hash": m.content_hash, "media_id": m.id}
+        for m in stored
+        if m.file_size == requested[m.content_hash]
+    ]
+    found = {match["content_hash"] for match in existing}
+    return {
+        "existing": existing,
+        "missing": [content_hash for content_hash in requested if content_hash not in found]
+    }
+
+def _media_mime_type(received: ReceivedFile) -> str:
+    """Tipo MIME a guardar: el detectado por libmagic, salvo HEIC/HEIF reconocidos por extensión."""
+    if Path(received.filename).suffix.lower() in ['.heic', '.heif']:
+        return 'image/heic'
+    assert received.mime_type is not None  # detectado en todos los archivos sin error
+    return received.mime_type
+
+def _enqueue_ingest(db: Session, db_media) -> dict:
+    """Crea y encola el trabajo de ingesta (miniatura, metadatos y clasificación) de un medio nuevo."""
+    db_job = job_crud.create_job(db, db_media.id)
+    ingest_queue.enqueue(db_job.id)
+    print(f"DEBUG: Trabajo de ingesta {db_job.id} encolado para media {db_media.id}")
+    return _upload_accepted(db_job)
+
+def _upload_accepted(db_job) -> dict:
+    return {
+        "job_id": db_job.id,
+        "media_id": db_job.media_id,
+        "status": db_job.status,
+        "status_url": f"{settings.API_V1_STR}/media/jobs/{db_job.id}"
+    }
+
+def _duplicate_accepted(db: Session, db_media) -> dict:
+    """Respuesta para un contenido ya subido: su último trabajo de ingesta, si lo hay."""
+    jobs = job_crud.get_jobs_for_media(db, db_media.id)
+    if jobs:
+        return {**_upload_accepted(jobs[-1]), "duplicate": True}
+    return {"media_id": db_media.id, "status": JOB_COMPLETED, "duplicate": True}
+
+@router.post("/uploads", response_model=UploadSessionSchema, status_code=201)
+def create_upload_session(
+    request: UploadSessionCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Inicia una subida reanudable. El cliente envía después los bytes con
+    ``PUT /uploads/{id}`` (cabecera ``Content-Range``) y la cierra con
+    ``POST /uploads/{id}/complete``.
+    """
+    mime_type = request.mime_type
+    if Path(request.filename).suffix.lower() in ['.heic', '.heif']:
+        mime_type = 'image/heic'
+    # El contenido se vuelve a comprobar con libmagic al finalizar
+    if mime_type not in ALLOWED_MIMES:
+        raise HTTPException(status_code=400, detail=f"Tipo de archivo no soportado: {mime_type}")
+    return resumable_uploads.create(
+        db, sanitize_filename(request.filename), mime_type, request.total_size, request.content_hash
+    )
+
+@router.get("/uploads/{session_id}", response_model=UploadSessionSchema)
+def get_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db)
+):
+    """Estado de una subida reanudable; ``received`` indica desde qué byte continuar."""
+    return _get_upload_session(db, session_id)
+
+@router.put("/uploads/{session_id}", response_model=UploadSessionSchema)
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Escribe un rango de bytes (``Content-Range: bytes inicio-fin/total``) directamente
+    en el archivo de la subida. El rango debe empezar en el byte ``received`` actual.
+    """
+    db_session = _get_upload_session(db, session_id)
+    start, end = parse_content_range(request.headers.get("content-range"), db_session.total_size)
+    return await resumable_uploads.write(db, db_session, start, end, request.stream())
+
+@router.post("/uploads/{session_id}/complete", response_model=UploadAccepted, status_code=202)
+def complete_upload(
+    session_id: str,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """Verifica el SHA-256 de la subida completa y la entrega a la cola de ingesta."""
+    db_session = _get_upload_session(db, session_id)
+    db_media, created = resumable_uploads.finalize(db, db_session)
+    if not created:
+        response.status_code = 200
+        return _duplicate_accepted(db, db_media)
+    return _enqueue_ingest(db, db_media)
+
+def _get_upload_session(db: Session, session_id: str):
+    db_session = upload_crud.get_upload_session(db, session_id)
+    if db_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return db_session
+
+@router.get("/jobs/{job_id}", response_model=IngestJob)
+def get_ingest_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """Estado y progreso de un trabajo de ingesta."""
+    db_job = job_crud.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+@router.get("/{media_id}/jobs", response_model=List[IngestJob])
+def list_media_jobs(
+    media_id: int,
+    db: Session = Depends(get_db)
+):
+    """Historial de trabajos de ingesta de un medio."""
+    return job_crud.get_jobs_for_media(db, media_id)
+
+@router.on_event("startup")
+def start_ingest_queue():
+    ingest_queue.start()
+
+@router.on_event("startup")
+def preload_models():
+    if settings.MODEL_PRELOAD:
+        get_model_registry().preload()
+    # Los .part abandonados se borran periódicamente, no solo al reiniciar
+    model_memory_sweeper.add_task("sesiones de subida", expire_upload_sessions)
+    # Trabajos en curso de un proceso que terminó sin cerrarlos
+    model_memory_sweeper.add_task("trabajos de ingesta abandonados", ingest_queue.requeue_abandoned)
+    model_memory_sweeper.start()
+
+@router.on_event("startup")
+def expire_upload_sessions():
+    db = SessionLocal()
     try:
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        print(f"DEBUG: Archivo guardado exitosamente en: {file_path}")
+        resumable_uploads.expire_stale(db)
     except Exception as e:
-        print(f"DEBUG: ERROR guardando archivo - {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error guardando archivo: {str(e)}")
+        print(f"Error caducando sesiones de subida: {e}")
     finally:
-        file.file.close()
-    
-    # Crear entrada en la base de datos
-    media_create = MediaCreate(
-        filename=safe_filename,
-        mime_type=content_type,  # Usamos el tipo MIME corregido
-        file_size=os.path.getsize(file_path)
-    )
-    
-    # Guardar rutas relativas en la base de datos
-    file_relative_path = f"/uploads/{safe_filename}"
-    print(f"DEBUG: Guardando en BD con ruta relativa: {file_relative_path}")
-    db_media = media_crud.create_media(db, media_create, file_relative_path)
-    
-    # Procesar archivo
-    try:            # Crear miniatura
-        thumbnail_path = media_processor.create_thumbnail(str(file_path), content_type)
-        if thumbnail_path:
-            print(f"DEBUG: Miniatura creada con éxito. Ruta: {thumbnail_path}")
-            
-            # La ruta ya viene en formato web estandarizado: /thumbnails/thumb_nombre.jpg
-            # Verificar que sigue el formato correcto
-            if not str(thumbnail_path).startswith('/thumbnails/'):
-                print(f"DEBUG: Normalizando ruta de miniatura")
-                # Normalizar la ruta en caso de error
-                thumb_name = Path(str(thumbnail_path)).name
-                thumbnail_path = f"/thumbnails/{thumb_name}"
-            
-            # Guardar la ruta web en la base de datos
-            print(f"DEBUG: Actualizando ruta de miniatura en BD: {thumbnail_path}")
-            db_media.thumbnail_path = thumbnail_path
-        
-        # Extraer metadatos
-        print(f"DEBUG: Extrayendo metadatos del archivo")
-        metadata = media_processor.extract_metadata(str(file_path), content_type)
-        for key, value in metadata.items():
-            setattr(db_media, key, value)
-            print(f"DEBUG: Metadato extraído - {key}: {value}")
-        
-        # Predecir evento si es imagen
-        if content_type.startswith('image/'):
-            print(f"DEBUG: Prediciendo evento para imagen")
-            event_type, confidence = media_processor.predict_event(str(file_path))
-            db_media.event_type = event_type
-            db_media.event_confidence = confidence
-            print(f"DEBUG: Evento predicho - {event_type} ({confidence})")
-        
-        # Ya no se crea automáticamente la copia procesada del archivo
-        # Esto ahora se hará a través del botón "Generar archivos" en la interfaz
-        
-        print(f"DEBUG: Guardando cambios en BD")
-        db.commit()
-        db.refresh(db_media)
-        print(f"DEBUG: Proceso completado exitosamente")
-        
-    except Exception as e:
-        print(f"DEBUG: ERROR procesando archivo - {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error procesando archivo: {str(e)}")
-    
-    return db_media
+        db.close()
+
+@router.on_event("startup")
+def invalidate_classification_cache():
+    # Entradas de conjuntos de etiquetas que ya no existen (nunca volverían a acertar)
+    classification_cache.invalidate_stale()
+
+@router.on_event("shutdown")
+def stop_ingest_queue():
+    ingest_queue.shutdown()
+    model_memory_sweeper.stop()
+    save_similarity_indexes()
 
 @router.get("/", response_model=List[Media])
 def list_media(
@@ -193,6 +389,7 @@ def list_media(
             'creation_date': m.creation_date.isoformat() if m.creation_date else None,
             'event_type': m.event_type,
             'event_confidence': m.event_confidence,
+            'classified_by': m.classified_by,
             'uploaded_at': m.uploaded_at.isoformat() if m.uploaded_at else None,
             'updated_at': m.updated_at.isoformat() if m.updated_at else None
         }
@@ -204,6 +401,28 @@ def list_media(
         headers=headers
     )
 
+@router.get("/search", response_model=List[MediaSearchResult])
+def search_media_by_text(
+    q: str = Query(..., min_length=1, description="Descripción en lenguaje natural de lo que se busca"),
+    limit: int = Query(50, ge=1, le=500),
+    event_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Búsqueda semántica: ordena las imágenes por similitud coseno entre la consulta
+    y sus embeddings CLIP almacenados. Los filtros se combinan con las columnas de Media.
+    """
+    results = search_media(
+        db, media_processor, q,
+        limit=limit, event_type=event_type, date_from=date_from, date_to=date_to
+    )
+    return [
+        {**Media.model_validate(media).model_dump(), "score": score}
+        for media, score in results
+    ]
+
 @router.get("/{media_id}", response_model=Media)
 def get_media(
     media_id: int,
@@ -214,6 +433,30 @@ def get_media(
         raise HTTPException(status_code=404, detail="Media not found")
     return db_media
 
+@router.get("/{media_id}/similar", response_model=List[MediaSearchResult])
+def get_similar_media(
+    media_id: int,
+    k: int = Query(12, ge=1, le=200),
+    nprobe: Optional[int] = Query(None, ge=1, le=4096, description="Particiones a recorrer: más recall, más latencia"),
+    db: Session = Depends(get_db)
+):
+    """
+    Imágenes visualmente parecidas a un medio, usando el índice aproximado IVF
+    sobre los embeddings CLIP almacenados.
+    """
+    if media_crud.get_media(db, media_id) is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    result = get_similarity_index().similar_to(media_id, k=k, nprobe=nprobe)
+    if result is None:
+        raise HTTPException(status_code=404, detail="El medio no tiene embedding CLIP almacenado")
+    ids, scores = result
+    media_by_id = {m.id: m for m in media_crud.get_media_by_ids(db, ids.tolist())}
+    return [
+        {**Media.model_validate(media_by_id[media_id]).model_dump(), "score": float(score)}
+        for media_id, score in zip(ids.tolist(), scores.tolist())
+        if media_id in media_by_id
+    ]
+
 @router.patch("/{media_id}", response_model=Media)
 def update_media(
     media_id: int,
@@ -300,3 +543,25 @@ def regenerate_processed_files(
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error regenerando archivos: {str(e)}")
+
+@router.post("/reclassify/", response_model=ReclassifyResult)
+def reclassify_media(
+    request: Optional[ReclassifyRequest] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Reclasifica todas las imágenes a partir de sus embeddings CLIP almacenados.
+
+    Permite probar un nuevo conjunto de etiquetas (prompt en inglés → etiqueta guardada)
+    sin volver a ejecutar el modelo de visión. Con `dry_run` solo devuelve la distribución.
+    Las etiquetas corregidas a mano (``PATCH /media/{id}``) se conservan salvo con
+    `skip_manual: false`.
+    """
+    request = request or ReclassifyRequest()
+    prompts = [item.prompt for item in request.labels] if request.labels else None
+    labels = [item.label for item in request.labels] if request.labels else None
+    try:
+        return reclassify_library(db, media_processor, prompts, labels, dry_run=request.dry_run,
+                                  skip_manual=request.skip_manual)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from fastapi import APIRouter
+
+from app.core.metrics import metrics
+from app.core.config import settings
+from app.services.model_pool import pool_stats, process_rss_bytes
+
+router = APIRouter()
+
+@router.get("/")
+def get_metrics(prefix: Optional[str] = None):
+    """
+    Métricas internas del proceso (histogramas de lotes de inferencia, esperas en cola, etc.).
+    
+    - **prefix**: Devuelve solo las métricas cuyo nombre empieza por este prefijo
+    """
+    return metrics.snapshot(prefix)
+
+@router.get("/models")
+def get_model_pools():
+    """
+    Réplicas de cada modelo (cargadas, ocupadas, en espera, utilización, memoria
+    residente y descargas) junto a la memoria del proceso y el presupuesto configurado.
+    """
+    rss = process_rss_bytes()
+    return {
+        "rss_mb": round(rss / 1024 / 1024, 1) if rss is not None else None,
+        "budget_mb": settings.MODEL_MEMORY_BUDGET_MB or None,
+        "idle_ttl_seconds": settings.MODEL_IDLE_TTL_SECONDS or None,
+        "pools": pool_stats(),
+    }
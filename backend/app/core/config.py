@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List, Literal
+from typing import List, Literal, get_args
 from pydantic_settings import BaseSettings
 import json
 import os
@@ -14,19 +14,100 @@ def get_base_dir():
         # Obtener la ruta del proyecto (dos niveles arriba desde config.py)
         return str(Path(__file__).parent.parent.parent.parent)
 
+# Valores válidos de AI_MODEL; las variantes clip_* comparten etiquetas y embeddings de texto
+# y solo cambian el backend del codificador de imagen; cascade combina YOLO y CLIP
+AIModelName = Literal["clip", "clip_onnx", "clip_int8", "opencv_dnn", "opencv_yolo", "cascade"]
+AI_MODELS = get_args(AIModelName)
+CLIP_AI_MODELS = ("clip", "clip_onnx", "clip_int8")
+
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "ClasificadorV2"
     
     # Configuración del modelo de IA
-    AI_MODEL: Literal["clip", "opencv_dnn", "opencv_yolo"] = "clip"
+    AI_MODEL: AIModelName = "clip"
+    CLIP_MODEL_NAME: str = os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
+    
+    # Variante de YOLO (par <variante>.cfg/.weights en storage/models/opencv_dnn) y lado de la entrada
+    # (múltiplo de 32; yolov4-tiny a 320 o 288 es varias veces más rápido que yolov4 a 416)
+    YOLO_VARIANT: str = os.getenv("YOLO_VARIANT", "yolov4")
+    YOLO_INPUT_SIZE: int = int(os.getenv("YOLO_INPUT_SIZE", "416"))
+    
+    # Post-procesado de YOLO: confianza mínima por detección y solapamiento (IoU) para la supresión de no máximos
+    YOLO_CONF_THRESHOLD: float = float(os.getenv("YOLO_CONF_THRESHOLD", "0.5"))
+    YOLO_NMS_THRESHOLD: float = float(os.getenv("YOLO_NMS_THRESHOLD", "0.4"))
+    
+    # Clasificación en cascada (AI_MODEL=cascade): YOLO ligero primero y CLIP solo si el margen relativo
+    # entre los dos mejores eventos ((p1 - p2) / p1, de 0 a 1) no llega a CASCADE_MARGIN_THRESHOLD
+    CASCADE_YOLO_VARIANT: str = os.getenv("CASCADE_YOLO_VARIANT", "yolov4-tiny")
+    CASCADE_YOLO_INPUT_SIZE: int = int(os.getenv("CASCADE_YOLO_INPUT_SIZE", "320"))
+    CASCADE_MARGIN_THRESHOLD: float = float(os.getenv("CASCADE_MARGIN_THRESHOLD", "0.5"))
+    CASCADE_CLIP_VARIANT: str = os.getenv("CASCADE_CLIP_VARIANT", "clip")  # clip, clip_onnx o clip_int8
+    
+    # Preprocesado propio de CLIP (uint8, recorte antes de redimensionar, normalización fusionada);
+    # False vuelve a CLIPProcessor de transformers
+    CLIP_FAST_PREPROCESS: bool = os.getenv("CLIP_FAST_PREPROCESS", "True").lower() in ("true", "1", "yes")
+    
+    # Codificador de imagen optimizado para CPU (clip_onnx: ONNX Runtime, clip_int8: cuantización dinámica)
+    ONNX_INTRA_OP_THREADS: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = núcleos / réplicas
+    ONNX_OPSET: int = int(os.getenv("ONNX_OPSET", "14"))
+    
+    # Micro-lotes de inferencia CLIP (peticiones concurrentes se agrupan en una pasada)
+    CLIP_BATCH_MAX_SIZE: int = int(os.getenv("CLIP_BATCH_MAX_SIZE", "16"))
+    CLIP_BATCH_MAX_WAIT_MS: float = float(os.getenv("CLIP_BATCH_MAX_WAIT_MS", "10"))
+    
+    # Caché persistente de resultados por (hash del contenido, modelo, versión de etiquetas),
+    # con desalojo LRU por encima de este número de entradas (0 = desactivada)
+    CLASSIFICATION_CACHE_MAX_ENTRIES: int = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "100000"))
+    
+    # Artefactos de modelos (storage/models + manifest.json): sin red, los modelos que falten fallan al
+    # momento en lugar de descargarse; la verificación de SHA-256 se hace una vez por archivo
+    MODEL_OFFLINE: bool = os.getenv("MODEL_OFFLINE", "False").lower() in ("true", "1", "yes")
+    MODEL_VERIFY_CHECKSUMS: bool = os.getenv("MODEL_VERIFY_CHECKSUMS", "False").lower() in ("true", "1", "yes")
+    
+    # Precarga en segundo plano de los modelos de AI_MODEL al arrancar (estado en GET /ready)
+    MODEL_PRELOAD: bool = os.getenv("MODEL_PRELOAD", "True").lower() in ("true", "1", "yes")
+    MODEL_WARMUP_RUNS: int = int(os.getenv("MODEL_WARMUP_RUNS", "2"))  # inferencias sobre una imagen sintética
+    
+    # Réplicas por modelo prestadas en exclusiva (cada una ocupa la memoria de un modelo completo)
+    CLIP_POOL_REPLICAS: int = int(os.getenv("CLIP_POOL_REPLICAS", "1"))
+    YOLO_POOL_REPLICAS: int = int(os.getenv("YOLO_POOL_REPLICAS", "1"))
+    MODEL_POOL_TIMEOUT: float = float(os.getenv("MODEL_POOL_TIMEOUT", "30"))  # espera máxima por una réplica, segundos
+    
+    # Presupuesto de memoria de los modelos cargados (0 = sin límite) y descarga por inactividad (0 = nunca)
+    MODEL_MEMORY_BUDGET_MB: int = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+    MODEL_IDLE_TTL_SECONDS: float = float(os.getenv("MODEL_IDLE_TTL_SECONDS", "1800"))
+    
+    # Servidor de inferencia dedicado (socket Unix; vacío = cada proceso carga sus modelos)
+    INFERENCE_SERVER_ADDRESS: str = os.getenv("INFERENCE_SERVER_ADDRESS", "")
+    # Clave de los clientes; vacía = se genera en CONFIG_DIR/inference.key (0600)
+    INFERENCE_AUTHKEY: str = os.getenv("INFERENCE_AUTHKEY", "")
+    INFERENCE_SHM_SLOTS: int = int(os.getenv("INFERENCE_SHM_SLOTS", "4"))  # peticiones en vuelo por proceso
+    INFERENCE_SHM_SLOT_MB: int = int(os.getenv("INFERENCE_SHM_SLOT_MB", "16"))  # un lote CLIP de 16 ocupa ~9.6 MB
+    INFERENCE_TIMEOUT: float = float(os.getenv("INFERENCE_TIMEOUT", "60"))  # segundos
+    INFERENCE_SERVER_THREADS: int = int(os.getenv("INFERENCE_SERVER_THREADS", "4"))
+    
+    # Copia float32 en RAM de los embeddings para búsquedas en milisegundos (~2 KB por imagen)
+    EMBEDDINGS_DENSE_CACHE: bool = os.getenv("EMBEDDINGS_DENSE_CACHE", "True").lower() in ("true", "1", "yes")
+    
+    # Índice aproximado (IVF) para "imágenes similares"
+    ANN_NLIST: int = int(os.getenv("ANN_NLIST", "256"))  # particiones máximas
+    ANN_NPROBE: int = int(os.getenv("ANN_NPROBE", "8"))  # particiones por consulta (recall vs latencia)
+    ANN_PQ_M: int = int(os.getenv("ANN_PQ_M", "0"))  # subespacios PQ (0 = sin compresión)
+    ANN_RERANK: int = int(os.getenv("ANN_RERANK", "4"))  # candidatos PQ re-puntuados por resultado
+    ANN_MIN_TRAIN: int = int(os.getenv("ANN_MIN_TRAIN", "2048"))  # por debajo, búsqueda exacta
+    ANN_SAVE_EVERY: int = int(os.getenv("ANN_SAVE_EVERY", "200"))  # cambios entre guardados
     
     # Directorios de almacenamiento
     BASE_DIR: str = os.getenv("CLASIFICADOR_BASE_DIR", get_base_dir())
     STORAGE_DIR: Path = Path(BASE_DIR) / "storage"
     UPLOADS_DIR: Path = STORAGE_DIR / "uploads"
+    # Subidas en curso (mismo sistema de archivos que uploads: se mueven con un rename atómico)
+    INCOMING_DIR: Path = STORAGE_DIR / "incoming"
     THUMBNAILS_DIR: Path = STORAGE_DIR / "thumbnails"
     PROCESSED_DIR: Path = STORAGE_DIR / "processed"
+    EMBEDDINGS_DIR: Path = STORAGE_DIR / "embeddings"
+    ANN_INDEX_DIR: Path = STORAGE_DIR / "ann"
     CONFIG_DIR: Path = Path(BASE_DIR) / "config"
     LOG_DIR: Path = Path(BASE_DIR) / "logs"
     
@@ -48,6 +129,11 @@ class Settings(BaseSettings):
     
     # Configuración de archivos
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
+    # Archivos máximos por petición en /media/upload/batch
+    UPLOAD_BATCH_MAX_FILES: int = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "1000"))
+    # Subidas reanudables por bloques (vídeos grandes)
+    MAX_RESUMABLE_FILE_SIZE: int = int(os.getenv("MAX_RESUMABLE_FILE_SIZE", str(4 * 1024 * 1024 * 1024)))  # 4GB
+    UPLOAD_SESSION_TTL_HOURS: float = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/heic"]
     ALLOWED_VIDEO_TYPES: List[str] = ["video/mp4", "video/quicktime"]
     
@@ -56,6 +142,18 @@ class Settings(BaseSettings):
     # La única estrategia soportada es el directorio dedicado (/thumbnails)
     THUMBNAIL_STORAGE_STRATEGY: str = "dedicated_dir"
     
+    # Lado máximo de la imagen decodificada que comparten miniatura, metadatos y clasificación
+    MEDIA_DECODE_MAX_SIDE: int = int(os.getenv("MEDIA_DECODE_MAX_SIDE", "1024"))
+    
+    # Cola de ingesta asíncrona
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))
+    INGEST_MAX_ATTEMPTS: int = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+    INGEST_RETRY_DELAY: float = float(os.getenv("INGEST_RETRY_DELAY", "5.0"))  # segundos, se multiplica por el intento
+    # Un trabajo en curso sin actualizar durante este tiempo se da por abandonado (proceso caído) y se reencola
+    INGEST_JOB_LEASE_SECONDS: float = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "600"))
+    # Procesos para las etapas CPU de la ingesta (0 = se ejecutan en los hilos de la cola)
+    MEDIA_PROCESS_WORKERS: int = int(os.getenv("MEDIA_PROCESS_WORKERS", "0"))
+    
     class Config:
         case_sensitive = True
 
@@ -35,6 +35,11 @@ class ValidationException(AppException):
     def __init__(self, message: str = "Error de validación de datos", detail: dict = None):
         super().__init__(message, status.HTTP_422_UNPROCESSABLE_ENTITY, detail)
         
+class ConflictException(AppException):
+    """Excepción para peticiones incompatibles con el estado actual del recurso."""
+    def __init__(self, message: str = "Conflicto con el estado del recurso", detail: dict = None):
+        super().__init__(message, status.HTTP_409_CONFLICT, detail)
+        
 class DatabaseException(AppException):
     """Excepción para errores de base de datos."""
     def __init__(self, message: str = "Error en la base de datos", detail: dict = None):
@@ -50,6 +55,11 @@ class ForbiddenException(AppException):
     def __init__(self, message: str = "Acceso prohibido", detail: dict = None):
         super().__init__(message, status.HTTP_403_FORBIDDEN, detail)
 
+class ModelUnavailableException(AppException):
+    """Excepción para modelos cuyos archivos faltan o no superan la verificación."""
+    def __init__(self, message: str = "Modelo no disponible", detail: dict = None):
+        super().__init__(message, status.HTTP_503_SERVICE_UNAVAILABLE, detail)
+
 async def app_exception_handler(request: Request, exc: AppException):
     """Manejador para excepciones personalizadas de la aplicación."""
     logger.error(f"AppException: {exc.message} - Status {exc.status_code}")
@@ -0,0 +1,113 @@
+"""
+Métricas internas en memoria (histogramas y contadores).
+
+No dependen de ningún sistema externo: cada proceso mantiene sus propios
+valores y se exponen en JSON a través de ``GET /api/v1/metrics/``.
+"""
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence
+
+class Histogram:
+    """
+    Histograma acumulativo con límites de cubeta fijos.
+
+    Args:
+        name: Nombre de la métrica
+        buckets: Límites superiores de las cubetas, en orden creciente
+        unit: Unidad de los valores observados (solo informativa)
+    """
+
+    def __init__(self, name: str, buckets: Sequence[float], unit: str = ""):
+        self.name = name
+        self.unit = unit
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # la última cubeta es +Inf
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Registra un valor."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self) -> dict:
+        """Copia serializable del estado actual."""
+        with self._lock:
+            labels = [str(b) for b in self.buckets] + ["+Inf"]
+            return {
+                "unit": self.unit,
+                "count": self._count,
+                "sum": self._sum,
+                "mean": self._sum / self._count if self._count else 0.0,
+                "max": self._max,
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+class Counter:
+    """Contador monótono seguro entre hilos."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+class MetricsRegistry:
+    """Registro de métricas del proceso, indexadas por nombre."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, buckets: Sequence[float], unit: str = "") -> Histogram:
+        """Devuelve el histograma ``name``, creándolo si no existe."""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, buckets, unit)
+            return self._histograms[name]
+
+    def counter(self, name: str) -> Counter:
+        """Devuelve el contador ``name``, creándolo si no existe."""
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter(name)
+            return self._counters[name]
+
+    def snapshot(self, prefix: Optional[str] = None) -> dict:
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "histograms": {
+                name: h.snapshot() for name, h in sorted(histograms.items())
+                if prefix is None or name.startswith(prefix)
+            },
+            "counters": {
+                name: c.value for name, c in sorted(counters.items())
+                if prefix is None or name.startswith(prefix)
+            },
+        }
+
+metrics = MetricsRegistry()
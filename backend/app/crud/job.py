@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.models.job import IngestJob, JOB_QUEUED, JOB_RUNNING, JOB_RETRYING, CLAIMABLE_JOB_STATES, PENDING_JOB_STATES
+from app.core.config import settings
+
+def get_job(db: Session, job_id: int) -> Optional[IngestJob]:
+    return db.query(IngestJob).filter(IngestJob.id == job_id).first()
+
+def get_jobs_for_media(db: Session, media_id: int) -> List[IngestJob]:
+    return db.query(IngestJob).filter(IngestJob.media_id == media_id).order_by(IngestJob.id).all()
+
+def get_pending_jobs(db: Session) -> List[IngestJob]:
+    return db.query(IngestJob).filter(IngestJob.status.in_(PENDING_JOB_STATES)).order_by(IngestJob.id).all()
+
+def get_claimable_jobs(db: Session) -> List[IngestJob]:
+    return db.query(IngestJob).filter(IngestJob.status.in_(CLAIMABLE_JOB_STATES)).order_by(IngestJob.id).all()
+
+def claim_job(db: Session, job_id: int) -> bool:
+    """
+    Pasa el trabajo a ``running`` solo si sigue en espera, con un UPDATE condicional.
+
+    Con varios procesos de la API todos reencolan los mismos trabajos pendientes:
+    solo el que consigue el UPDATE (``rowcount == 1``) lo ejecuta.
+    """
+    claimed = db.query(IngestJob).filter(
+        IngestJob.id == job_id,
+        IngestJob.status.in_(CLAIMABLE_JOB_STATES)
+    ).update({
+        IngestJob.status: JOB_RUNNING,
+        IngestJob.attempts: IngestJob.attempts + 1,
+        IngestJob.error: None,
+        IngestJob.started_at: func.coalesce(IngestJob.started_at, datetime.now(timezone.utc)),
+        IngestJob.updated_at: func.now()
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def requeue_abandoned_jobs(db: Session, older_than: datetime) -> List[int]:
+    """
+    Devuelve a ``retrying`` los trabajos en curso sin actualizar desde ``older_than``
+    (su proceso terminó sin cerrarlos). Cada uno se cambia con un UPDATE condicional,
+    así que solo un proceso recupera cada trabajo.
+
+    Returns:
+        List[int]: Identificadores de los trabajos recuperados
+    """
+    last_update = func.coalesce(IngestJob.updated_at, IngestJob.started_at, IngestJob.created_at)
+    candidates = [job_id for (job_id,) in db.query(IngestJob.id).filter(
+        IngestJob.status == JOB_RUNNING, last_update < older_than
+    ).all()]
+    requeued = []
+    for job_id in candidates:
+        if db.query(IngestJob).filter(
+            IngestJob.id == job_id, IngestJob.status == JOB_RUNNING, last_update < older_than
+        ).update({IngestJob.status: JOB_RETRYING, IngestJob.updated_at: func.now()}, synchronize_session=False):
+            requeued.append(job_id)
+    db.commit()
+    return requeued
+
+def create_job(db: Session, media_id: int) -> IngestJob:
+    db_job = IngestJob(
+        media_id=media_id,
+        status=JOB_QUEUED,
+        progress=0.0,
+        attempts=0,
+        max_attempts=settings.INGEST_MAX_ATTEMPTS
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def create_jobs(db: Session, media_ids: List[int]) -> List[IngestJob]:
+    """Crea los trabajos de ingesta de varios medios en un único commit."""
+    db_jobs = [
+        IngestJob(
+            media_id=media_id,
+            status=JOB_QUEUED,
+            progress=0.0,
+            attempts=0,
+            max_attempts=settings.INGEST_MAX_ATTEMPTS
+        )
+        for media_id in media_ids
+    ]
+    db.add_all(db_jobs)
+    db.commit()
+    return db_jobs
+
+def update_job(db: Session, db_job: IngestJob, **fields) -> IngestJob:
+    for key, value in fields.items():
+        setattr(db_job, key, value)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def delete_jobs_for_media(db: Session, media_id: int) -> int:
+    return db.query(IngestJob).filter(IngestJob.media_id == media_id).delete()
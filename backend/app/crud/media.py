@@ -1,14 +1,31 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
 from pathlib import Path
-from app.models.media import Media
+from app.models.media import Media, CLASSIFIED_MANUALLY
 from app.schemas.media import MediaCreate, MediaUpdate
 from app.core.config import settings
+from app.crud.job import delete_jobs_for_media
+from app.services.embedding_store import get_embedding_store
+from app.services.similarity_index import get_similarity_index
 
 def get_media(db: Session, media_id: int) -> Optional[Media]:
     return db.query(Media).filter(Media.id == media_id).first()
 
+def get_media_by_hash(db: Session, content_hash: str) -> Optional[Media]:
+    return db.query(Media).filter(Media.content_hash == content_hash).first()
+
+def get_media_by_hashes(db: Session, content_hashes: List[str], chunk_size: int = 500) -> List[Media]:
+    # Consultas por bloques para no superar el límite de parámetros de SQLite
+    result = []
+    for start in range(0, len(content_hashes), chunk_size):
+        chunk = content_hashes[start:start + chunk_size]
+        result.extend(db.query(Media).filter(Media.content_hash.in_(chunk)).all())
+    return result
+
+def get_media_by_ids(db: Session, media_ids: List[int]) -> List[Media]:
+    return db.query(Media).filter(Media.id.in_(media_ids)).all()
+
 def get_all_media(db: Session, skip: int = 0, limit: int = 100) -> List[Media]:
     return db.query(Media).offset(skip).limit(limit).all()
 
@@ -17,13 +34,37 @@ def create_media(db: Session, media: MediaCreate, file_path: str) -> Media:
         filename=media.filename,
         file_path=file_path,
         mime_type=media.mime_type,
-        file_size=media.file_size
+        file_size=media.file_size,
+        content_hash=media.content_hash
     )
     db.add(db_media)
     db.commit()
     db.refresh(db_media)
     return db_media
 
+def store_media_embedding(media_id: int, vector) -> None:
+    """Guarda el embedding CLIP de un medio y lo inserta en el índice de similitud."""
+    get_embedding_store().add(media_id, vector)
+    get_similarity_index().add(media_id, vector)
+
+def create_media_batch(db: Session, items: List[Tuple[MediaCreate, str]], commit: bool = True) -> List[Media]:
+    """Inserta varios medios en una sola transacción (un único commit)."""
+    db_media_list = [
+        Media(
+            filename=media.filename,
+            file_path=file_path,
+            mime_type=media.mime_type,
+            file_size=media.file_size,
+            content_hash=media.content_hash
+        )
+        for media, file_path in items
+    ]
+    db.add_all(db_media_list)
+    db.flush()
+    if commit:
+        db.commit()
+    return db_media_list
+
 def update_media(db: Session, media_id: int, media_update: MediaUpdate) -> Optional[Media]:
     db_media = get_media(db, media_id)
     if not db_media:
@@ -32,6 +73,9 @@ def update_media(db: Session, media_id: int, media_update: MediaUpdate) -> Optio
     update_data = media_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_media, key, value)
+    if "event_type" in update_data:
+        # Las reclasificaciones respetan las etiquetas corregidas a mano
+        db_media.classified_by = CLASSIFIED_MANUALLY
     
     db.commit()
     db.refresh(db_media)
@@ -84,7 +128,15 @@ def delete_media(db: Session, media_id: int) -> bool:
         except Exception as e:
             print(f"Error eliminando archivo procesado {processed_path}: {e}")
     
-    # Eliminar registro de base de datos
+    # Eliminar el embedding almacenado (queda marcado como borrado hasta la compactación)
+    try:
+        get_similarity_index().remove(media_id)
+        get_embedding_store().delete(media_id)
+    except Exception as e:
+        print(f"Error eliminando embedding del medio {media_id}: {e}")
+
+    # Eliminar registro de base de datos junto con sus trabajos de ingesta
+    delete_jobs_for_media(db, media_id)
     db.delete(db_media)
     db.commit()
     return True
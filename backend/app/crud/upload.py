@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import uuid
+from app.models.upload import UploadSession, UPLOAD_OPEN
+
+def get_upload_session(db: Session, session_id: str) -> Optional[UploadSession]:
+    return db.query(UploadSession).filter(UploadSession.id == session_id).first()
+
+def create_upload_session(
+    db: Session, filename: str, mime_type: str, total_size: int, content_hash: str
+) -> UploadSession:
+    db_session = UploadSession(
+        id=uuid.uuid4().hex,
+        filename=filename,
+        mime_type=mime_type,
+        total_size=total_size,
+        received=0,
+        content_hash=content_hash.lower(),
+        status=UPLOAD_OPEN
+    )
+    db.add(db_session)
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+def update_upload_session(db: Session, db_session: UploadSession, **fields) -> UploadSession:
+    for key, value in fields.items():
+        setattr(db_session, key, value)
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+def get_stale_upload_sessions(db: Session, max_age_hours: float) -> List[UploadSession]:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+    return db.query(UploadSession).filter(
+        UploadSession.status == UPLOAD_OPEN,
+        func.coalesce(UploadSession.updated_at, UploadSession.created_at) < cutoff.replace(tzinfo=None)
+    ).all()
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, Depends
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -12,6 +13,7 @@ from app.core.logger import logger
 from app.core.errors import register_exception_handlers
 from app.core.middlewares import RequestLoggingMiddleware
 from app.api.v1 import router as api_router
+from app.services.model_registry import get_model_registry
 
 # Configurar directorio de logs si está habilitado
 if settings.LOG_TO_FILE:
@@ -62,6 +64,7 @@ app.add_middleware(
 directories = [
     settings.STORAGE_DIR, 
     settings.UPLOADS_DIR, 
+    settings.INCOMING_DIR,
     settings.THUMBNAILS_DIR, 
     settings.PROCESSED_DIR,
     settings.CONFIG_DIR,
@@ -111,6 +114,18 @@ async def health_check():
     except Exception as e:
         return {"status": "error", "detail": str(e)}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Disponibilidad para recibir tráfico.
+    
+    Devuelve 200 cuando los modelos del AI_MODEL activo están cargados y
+    calentados, y 503 mientras se cargan (o si fallaron), con el estado y los
+    tiempos de carga de cada modelo.
+    """
+    status = get_model_registry().status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.get("/")
 async def root():
     return {"message": f"Bienvenido a {settings.PROJECT_NAME}"}
\ No newline at end of file
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, LargeBinary, UniqueConstraint
+from app.core.database import Base
+
+class ClassificationCacheEntry(Base):
+    __tablename__ = "classification_cache"
+    __table_args__ = (
+        # Una consulta por imagen: (hash del contenido, modelo, versión de etiquetas)
+        UniqueConstraint("content_hash", "model_id", "label_version", name="uq_classification_cache_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    model_id = Column(String, nullable=False)
+    label_version = Column(String(16), nullable=False, index=True)
+
+    # Resultado de predict_event
+    event_type = Column(String, nullable=False)
+    event_confidence = Column(Float, nullable=False)
+    classified_by = Column(String, nullable=True)
+    scores = Column(LargeBinary, nullable=True)  # vector float32 de puntuaciones por etiqueta
+
+    # Segundos desde la época del último acierto, para el desalojo LRU
+    last_used_at = Column(Float, nullable=False, index=True)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# Estados posibles de un trabajo de ingesta
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_RETRYING = "retrying"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+PENDING_JOB_STATES = (JOB_QUEUED, JOB_RUNNING, JOB_RETRYING)
+# Estados desde los que un trabajador puede reclamar un trabajo
+CLAIMABLE_JOB_STATES = (JOB_QUEUED, JOB_RETRYING)
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    media_id = Column(Integer, ForeignKey("media.id"), nullable=False, index=True)
+
+    # Estado y progreso del procesamiento
+    status = Column(String, nullable=False, default=JOB_QUEUED, index=True)
+    stage = Column(String, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)
+
+    # Reintentos
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    error = Column(String, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -2,6 +2,10 @@ from sqlalchemy import Column, Integer, String, Float, DateTime
 from sqlalchemy.sql import func
 from app.core.database import Base
 
+# Valores de classified_by que no son un modelo
+CLASSIFIED_MANUALLY = "manual"  # etiqueta corregida con PATCH /media/{id}
+CLASSIFIED_BY_RECLASSIFY = "reclassify"  # asignada por POST /media/reclassify/
+
 class Media(Base):
     __tablename__ = "media"
 
@@ -11,6 +15,8 @@ class Media(Base):
     thumbnail_path = Column(String, nullable=True)
     mime_type = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
+    # SHA-256 del contenido: clave de almacenamiento y de deduplicación
+    content_hash = Column(String(64), nullable=True, unique=True, index=True)
     
     # Metadatos
     width = Column(Integer, nullable=True)
@@ -26,6 +32,7 @@ class Media(Base):
     # Datos CLIP
     event_type = Column(String, nullable=True)
     event_confidence = Column(Float, nullable=True)
+    classified_by = Column(String, nullable=True)  # AI_MODEL, cascade:yolo / cascade:clip, manual o reclassify
     
     # Timestamps
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# Estados de una sesión de subida reanudable
+UPLOAD_OPEN = "open"
+UPLOAD_COMPLETED = "completed"
+UPLOAD_EXPIRED = "expired"
+UPLOAD_REJECTED = "rejected"  # el contenido no es de un tipo permitido
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True, index=True)  # uuid4 en hexadecimal
+    filename = Column(String, nullable=False)
+    mime_type = Column(String, nullable=False)
+
+    # Tamaño total anunciado y bytes recibidos de forma contigua desde el inicio
+    total_size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, nullable=False, default=0)
+
+    # SHA-256 anunciado por el cliente; se verifica al finalizar
+    content_hash = Column(String(64), nullable=False)
+
+    status = Column(String, nullable=False, default=UPLOAD_OPEN, index=True)
+    media_id = Column(Integer, ForeignKey("media.id"), nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
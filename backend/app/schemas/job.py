@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+class IngestJob(BaseModel):
+    id: int
+    media_id: int
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class UploadAccepted(BaseModel):
+    """
+    Respuesta de una subida aceptada para procesamiento en segundo plano.
+
+    Si el contenido ya existía (``duplicate``), se devuelve el medio existente
+    y su último trabajo de ingesta, sin volver a procesarlo.
+    """
+    job_id: Optional[int] = None
+    media_id: int
+    status: str
+    status_url: Optional[str] = None
+    duplicate: bool = False
+
+class BatchUploadItem(BaseModel):
+    """Resultado de un archivo dentro de una subida por lotes."""
+    filename: str
+    status: str  # accepted | duplicate | error
+    media_id: Optional[int] = None
+    job_id: Optional[int] = None
+    status_url: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchUploadResult(BaseModel):
+    accepted: int
+    duplicates: int
+    failed: int
+    items: List[BatchUploadItem]
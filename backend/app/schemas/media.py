@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
 
 class MediaBase(BaseModel):
     filename: str
@@ -8,7 +8,7 @@ class MediaBase(BaseModel):
     file_size: int
     
 class MediaCreate(MediaBase):
-    pass
+    content_hash: Optional[str] = None
 
 class MediaUpdate(BaseModel):
     event_type: Optional[str] = None
@@ -18,6 +18,7 @@ class MediaUpdate(BaseModel):
 class Media(MediaBase):
     id: int
     file_path: str
+    content_hash: Optional[str] = None
     thumbnail_path: Optional[str] = None
     processed_file_path: Optional[str] = None
     width: Optional[int] = None
@@ -28,8 +29,45 @@ class Media(MediaBase):
     creation_date: Optional[datetime] = None
     event_type: Optional[str] = None
     event_confidence: Optional[float] = None
+    classified_by: Optional[str] = None
     uploaded_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MediaSearchResult(Media):
+    score: float
+
+class UploadCheckItem(BaseModel):
+    content_hash: str = Field(..., pattern=r'^[0-9a-fA-F]{64}$')
+    file_size: int = Field(..., ge=0)
+
+class UploadCheckRequest(BaseModel):
+    files: List[UploadCheckItem] = Field(..., max_length=10000)
+
+class UploadCheckMatch(BaseModel):
+    content_hash: str
+    media_id: int
+
+class UploadCheckResult(BaseModel):
+    """Hashes ya almacenados (con su medio) y hashes que el cliente debe subir."""
+    existing: List[UploadCheckMatch]
+    missing: List[str]
+
+class ReclassifyLabel(BaseModel):
+    prompt: str
+    label: str
+
+class ReclassifyRequest(BaseModel):
+    labels: Optional[List[ReclassifyLabel]] = None
+    dry_run: bool = False
+    skip_manual: bool = True  # no tocar las etiquetas corregidas a mano
+
+class ReclassifyResult(BaseModel):
+    updated: int
+    matched: int = 0
+    skipped_manual: int = 0
+    distribution: Dict[str, int]
+    score_seconds: float
+    total_seconds: float
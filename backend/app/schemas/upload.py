@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1)
+    mime_type: str
+    total_size: int = Field(..., gt=0)
+    content_hash: str = Field(..., pattern=r'^[0-9a-fA-F]{64}$')
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    mime_type: str
+    total_size: int
+    received: int
+    content_hash: str
+    status: str
+    media_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,274 @@
+"""
+Índice aproximado de vecinos más cercanos (IVF con cuantización de producto opcional).
+
+Implementado solo con NumPy:
+
+- **IVF**: k-means esférico reparte los vectores en ``nlist`` particiones; una
+  consulta solo recorre las ``nprobe`` particiones cuyos centroides son más
+  parecidos, en lugar de toda la colección.
+- **PQ** (opcional, ``pq_m > 0``): el residuo de cada vector respecto a su
+  centroide se divide en ``pq_m`` subvectores y cada uno se codifica con un
+  byte. El producto escalar se estima con tablas precalculadas por consulta
+  (ADC), y los mejores candidatos pueden re-puntuarse con los vectores exactos.
+
+Sin PQ las listas guardan los vectores en float16. El índice admite
+inserciones y borrados incrementales y se guarda en un único ``.npz``.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.vectors import normalize_rows, top_k
+
+PQ_KSUB = 256  # centroides por subespacio (un byte por código)
+
+def _assign(data: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Índice del centroide más cercano (distancia L2) de cada fila."""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    result = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], chunk):
+        block = data[start:start + chunk]
+        distances = centroid_norms[None, :] - 2.0 * (block @ centroids.T)
+        result[start:start + chunk] = distances.argmin(axis=1)
+    return result
+
+def kmeans(data: np.ndarray, k: int, n_iter: int = 20, spherical: bool = False, seed: int = 0) -> np.ndarray:
+    """
+    k-means de Lloyd vectorizado.
+
+    Args:
+        data: Matriz (n, d) float32
+        k: Número de centroides (se limita a n)
+        n_iter: Iteraciones
+        spherical: Normalizar los centroides en cada iteración (para similitud coseno)
+        seed: Semilla de la inicialización
+
+    Returns:
+        np.ndarray: Centroides (k, d)
+    """
+    rng = np.random.default_rng(seed)
+    n = data.shape[0]
+    k = max(1, min(k, n))
+    centroids = data[rng.choice(n, k, replace=False)].astype(np.float32, copy=True)
+    for _ in range(n_iter):
+        assignment = _assign(data, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # Reubicar los centroides vacíos en puntos aleatorios
+            centroids[empty] = data[rng.choice(n, empty.size, replace=False)]
+        if spherical:
+            centroids = normalize_rows(centroids)
+    return centroids
+
+class IVFIndex:
+    """
+    Índice IVF / IVF-PQ por producto escalar sobre vectores normalizados.
+
+    Args:
+        dim: Dimensión de los vectores
+        nlist: Número de particiones
+        pq_m: Número de subespacios de PQ (0 = sin PQ); debe dividir a ``dim``
+    """
+
+    def __init__(self, dim: int, nlist: int = 256, pq_m: int = 0):
+        if pq_m and dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} debe dividir a la dimensión {dim}")
+        self.dim = dim
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.trained_on = 0  # vectores usados en el entrenamiento
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (pq_m, PQ_KSUB, dim / pq_m)
+        self._list_ids: List[np.ndarray] = []
+        self._list_data: List[np.ndarray] = []
+        self._where: Dict[int, int] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._where
+
+    def ids(self) -> np.ndarray:
+        return np.fromiter(self._where.keys(), dtype=np.int64, count=len(self._where))
+
+    def train(self, vectors: np.ndarray, n_iter: int = 20, max_train: int = 65536, seed: int = 0):
+        """Entrena los centroides (y los codebooks de PQ) con una muestra de vectores."""
+        vectors = normalize_rows(vectors)
+        self.trained_on = int(vectors.shape[0])
+        rng = np.random.default_rng(seed)
+        if vectors.shape[0] > max_train:
+            vectors = vectors[rng.choice(vectors.shape[0], max_train, replace=False)]
+
+        self.centroids = kmeans(vectors, self.nlist, n_iter=n_iter, spherical=True, seed=seed)
+        self.nlist = self.centroids.shape[0]
+        if self.pq_m:
+            residuals = vectors - self.centroids[_assign(vectors, self.centroids)]
+            dsub = self.dim // self.pq_m
+            self.codebooks = np.stack([
+                self._pad_codebook(kmeans(residuals[:, m * dsub:(m + 1) * dsub], PQ_KSUB, n_iter=n_iter, seed=seed + m))
+                for m in range(self.pq_m)
+            ])
+        self._list_ids = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._list_data = [self._empty_data() for _ in range(self.nlist)]
+        self._where = {}
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """Inserta (o reemplaza) vectores."""
+        centroids = self.centroids
+        if centroids is None:
+            raise RuntimeError("El índice no está entrenado")
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        vectors = normalize_rows(np.asarray(vectors).reshape(ids.shape[0], self.dim))
+        for item_id in ids:
+            if int(item_id) in self._where:
+                self.remove(int(item_id))
+
+        lists = _assign(vectors, centroids)
+        data = self._encode(vectors, lists) if self.pq_m else vectors.astype(np.float16)
+        for list_no in np.unique(lists):
+            mask = lists == list_no
+            self._list_ids[list_no] = np.concatenate([self._list_ids[list_no], ids[mask]])
+            self._list_data[list_no] = np.concatenate([self._list_data[list_no], data[mask]])
+        self._where.update(zip(ids.tolist(), lists.tolist()))
+
+    def remove(self, item_id: int) -> bool:
+        """Elimina un vector del índice."""
+        list_no = self._where.pop(int(item_id), None)
+        if list_no is None:
+            return False
+        keep = self._list_ids[list_no] != item_id
+        self._list_ids[list_no] = self._list_ids[list_no][keep]
+        self._list_data[list_no] = self._list_data[list_no][keep]
+        return True
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        nprobe: int = 8,
+        rerank: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+        rerank_factor: int = 4
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Los ``k`` vecinos más parecidos a ``query``.
+
+        Args:
+            query: Vector de consulta (se normaliza)
+            k: Número de resultados
+            nprobe: Particiones a recorrer (más = mejor recall, más latencia)
+            rerank: Función ids → vectores exactos para re-puntuar candidatos de PQ
+            rerank_factor: Candidatos re-puntuados por cada resultado pedido
+
+        Returns:
+            (ids, scores) ordenados de mayor a menor similitud
+        """
+        centroids = self.centroids
+        if centroids is None:
+            raise RuntimeError("El índice no está entrenado")
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        coarse = centroids @ query
+        probe = top_k(np.arange(self.nlist), coarse, min(nprobe, self.nlist))[0]
+
+        table = None
+        if self.pq_m:
+            assert self.codebooks is not None
+            dsub = self.dim // self.pq_m
+            table = np.einsum("md,mkd->mk", query.reshape(self.pq_m, dsub), self.codebooks)
+            subspaces = np.arange(self.pq_m)[None, :]
+
+        all_ids, all_scores = [], []
+        for list_no in probe:
+            list_ids = self._list_ids[list_no]
+            if list_ids.shape[0] == 0:
+                continue
+            data = self._list_data[list_no]
+            if table is not None:
+                scores = coarse[list_no] + table[subspaces, data].sum(axis=1)
+            else:
+                scores = data.astype(np.float32) @ query
+            all_ids.append(list_ids)
+            all_scores.append(scores)
+        if not all_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores).astype(np.float32)
+        if table is not None and rerank is not None:
+            ids, _ = top_k(ids, scores, k * rerank_factor)
+            exact = normalize_rows(rerank(ids))
+            scores = exact @ query
+        return top_k(ids, scores, k)
+
+    def save(self, path: Path):
+        """Guarda el índice en un ``.npz`` (reemplazo atómico)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sizes = np.array([ids.shape[0] for ids in self._list_ids], dtype=np.int64)
+        params = {"dim": self.dim, "nlist": self.nlist, "pq_m": self.pq_m, "trained_on": self.trained_on}
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                params=np.array(json.dumps(params)),
+                centroids=self.centroids if self.centroids is not None else np.empty(0, np.float32),
+                codebooks=self.codebooks if self.codebooks is not None else np.empty(0, np.float32),
+                sizes=sizes,
+                ids=np.concatenate(self._list_ids) if self._list_ids else np.empty(0, np.int64),
+                data=np.concatenate(self._list_data) if self._list_data else self._empty_data(),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        """Carga un índice guardado con ``save``."""
+        with np.load(path, allow_pickle=False) as archive:
+            params = json.loads(str(archive["params"]))
+            index = cls(params["dim"], params["nlist"], params["pq_m"])
+            index.trained_on = params.get("trained_on", 0)
+            if archive["centroids"].size:
+                index.centroids = archive["centroids"]
+            if archive["codebooks"].size:
+                index.codebooks = archive["codebooks"]
+            if index.is_trained:
+                bounds = np.cumsum(archive["sizes"])[:-1]
+                index._list_ids = np.split(archive["ids"], bounds)
+                index._list_data = np.split(archive["data"], bounds)
+                for list_no, list_ids in enumerate(index._list_ids):
+                    index._where.update(dict.fromkeys(list_ids.tolist(), list_no))
+        return index
+
+    def _encode(self, vectors: np.ndarray, lists: np.ndarray) -> np.ndarray:
+        assert self.centroids is not None and self.codebooks is not None
+        residuals = vectors - self.centroids[lists]
+        dsub = self.dim // self.pq_m
+        codes = np.empty((vectors.shape[0], self.pq_m), dtype=np.uint8)
+        for m in range(self.pq_m):
+            codes[:, m] = _assign(residuals[:, m * dsub:(m + 1) * dsub], self.codebooks[m])
+        return codes
+
+    def _empty_data(self) -> np.ndarray:
+        if self.pq_m:
+            return np.empty((0, self.pq_m), dtype=np.uint8)
+        return np.empty((0, self.dim), dtype=np.float16)
+
+    @staticmethod
+    def _pad_codebook(codebook: np.ndarray) -> np.ndarray:
+        # Con pocos datos de entrenamiento k-means devuelve menos de PQ_KSUB centroides
+        if codebook.shape[0] < PQ_KSUB:
+            padding = np.repeat(codebook[-1:], PQ_KSUB - codebook.shape[0], axis=0)
+            codebook = np.concatenate([codebook, padding])
+        return codebook
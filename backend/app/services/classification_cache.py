@@ -0,0 +1,193 @@
+"""
+Caché persistente de resultados de clasificación.
+
+``predict_event`` repetía el trabajo completo en cada reproceso del mismo
+archivo (trabajos reencolados, reprocesos por lotes, cambios de modelo de ida y
+vuelta). La tabla ``classification_cache`` guarda el evento, la confianza, el
+modelo o etapa que decidió y el vector completo de puntuaciones por etiqueta,
+con clave única (hash SHA-256 del contenido, modelo, versión de etiquetas): un
+acierto es una sola consulta por índice.
+
+- La versión de etiquetas es un hash del conjunto de etiquetas del modelo, así
+  que cambiar las etiquetas deja de acertar las entradas antiguas al momento;
+  ``invalidate_stale`` las borra (se llama al arrancar).
+- ``CLASSIFICATION_CACHE_MAX_ENTRIES`` limita la tabla: cada
+  ``EVICTION_CHECK_EVERY`` escrituras se comprueba el tamaño y, si lo supera, se
+  borran las entradas usadas hace más tiempo hasta dejarla al 90%.
+- Los aciertos solo actualizan ``last_used_at`` si tiene más de
+  ``TOUCH_INTERVAL_SECONDS``: la mayoría de lecturas no escriben.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import CLIP_AI_MODELS, settings
+from app.core.database import SessionLocal
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.models.classification import ClassificationCacheEntry
+from app.services.event_labels import (
+    CLIP_LABEL_SET_VERSION, YOLO_LABEL_SET_VERSION, YOLO_TO_CLIP_EVENT, label_set_version
+)
+from app.services.yolo_models import yolo_input_size
+
+EVICTION_CHECK_EVERY = 64
+TOUCH_INTERVAL_SECONDS = 3600.0
+
+CacheKey = Tuple[str, str, str]  # (content_hash, model_id, label_version)
+
+@dataclass(frozen=True)
+class CachedClassification:
+    event_type: str
+    confidence: float
+    classified_by: Optional[str]
+    scores: Optional[np.ndarray]
+
+def cascade_label_version() -> str:
+    return label_set_version([CLIP_LABEL_SET_VERSION, YOLO_LABEL_SET_VERSION, sorted(YOLO_TO_CLIP_EVENT.items())])
+
+def current_label_versions() -> Tuple[str, ...]:
+    return (CLIP_LABEL_SET_VERSION, YOLO_LABEL_SET_VERSION, cascade_label_version())
+
+def _yolo_model_id(variant: str, input_size: int) -> str:
+    # Umbrales incluidos: cambian las detecciones y, con ellas, el evento
+    return (f"yolo/{variant}@{yolo_input_size(input_size)}"
+            f"/conf{settings.YOLO_CONF_THRESHOLD:g}/nms{settings.YOLO_NMS_THRESHOLD:g}")
+
+def classification_model_id(ai_model: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Identificador del modelo y versión de etiquetas de ``ai_model`` (por defecto
+    ``AI_MODEL``) con la configuración actual.
+
+    opencv_dnn y opencv_yolo ejecutan el mismo código y comparten entradas.
+    """
+    ai_model = ai_model or settings.AI_MODEL
+    if ai_model in CLIP_AI_MODELS:
+        return f"{ai_model}/{settings.CLIP_MODEL_NAME}", CLIP_LABEL_SET_VERSION
+    if ai_model == "cascade":
+        return (f"cascade/{_yolo_model_id(settings.CASCADE_YOLO_VARIANT, settings.CASCADE_YOLO_INPUT_SIZE)}"
+                f"/{settings.CASCADE_CLIP_VARIANT}/{settings.CLIP_MODEL_NAME}"
+                f"/margin{settings.CASCADE_MARGIN_THRESHOLD:g}"), cascade_label_version()
+    return _yolo_model_id(settings.YOLO_VARIANT, settings.YOLO_INPUT_SIZE), YOLO_LABEL_SET_VERSION
+
+class ClassificationCache:
+    """
+    Resultados de clasificación en la tabla ``classification_cache``.
+
+    Los errores de base de datos se registran y se tratan como fallo de caché:
+    nunca impiden clasificar.
+
+    Args:
+        session_factory: Fábrica de sesiones (por defecto ``SessionLocal``)
+        max_entries: Tamaño máximo (por defecto ``CLASSIFICATION_CACHE_MAX_ENTRIES``; 0 = desactivada)
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, max_entries: Optional[int] = None):
+        self.session_factory = session_factory
+        self._max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        return settings.CLASSIFICATION_CACHE_MAX_ENTRIES if self._max_entries is None else self._max_entries
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, content_hash: str, ai_model: Optional[str] = None) -> CacheKey:
+        return (content_hash.lower(), *classification_model_id(ai_model))
+
+    def get(self, key: CacheKey) -> Optional[CachedClassification]:
+        content_hash, model_id, label_version = key
+        try:
+            with self.session_factory() as db:
+                entry = db.query(ClassificationCacheEntry).filter(
+                    ClassificationCacheEntry.content_hash == content_hash,
+                    ClassificationCacheEntry.model_id == model_id,
+                    ClassificationCacheEntry.label_version == label_version
+                ).first()
+                if entry is None:
+                    metrics.counter("classification_cache.miss").inc()
+                    return None
+                now = time.time()
+                if now - entry.last_used_at > TOUCH_INTERVAL_SECONDS:
+                    entry.last_used_at = now
+                    db.commit()
+                metrics.counter("classification_cache.hit").inc()
+                scores = np.frombuffer(entry.scores, dtype=np.float32) if entry.scores is not None else None
+                return CachedClassification(entry.event_type, entry.event_confidence, entry.classified_by, scores)
+        except Exception as e:
+            logger.warning(f"Caché de clasificación no disponible: {e}")
+            return None
+
+    def put(self, key: CacheKey, event_type: str, confidence: float,
+            classified_by: Optional[str] = None, scores: Optional[np.ndarray] = None):
+        content_hash, model_id, label_version = key
+        payload = np.asarray(scores, dtype=np.float32).tobytes() if scores is not None else None
+        fields = dict(event_type=event_type, event_confidence=float(confidence), classified_by=classified_by,
+                      scores=payload, last_used_at=time.time())
+        try:
+            with self.session_factory() as db:
+                entry = db.query(ClassificationCacheEntry).filter(
+                    ClassificationCacheEntry.content_hash == content_hash,
+                    ClassificationCacheEntry.model_id == model_id,
+                    ClassificationCacheEntry.label_version == label_version
+                ).first()
+                if entry is None:
+                    db.add(ClassificationCacheEntry(content_hash=content_hash, model_id=model_id,
+                                                    label_version=label_version, **fields))
+                else:
+                    for name, value in fields.items():
+                        setattr(entry, name, value)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()  # otro trabajador guardó la misma clave a la vez
+                    return
+                with self._lock:
+                    self._writes += 1
+                    check = (self._writes - 1) % EVICTION_CHECK_EVERY == 0  # la primera y cada N
+                if check:
+                    self._evict(db)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar en la caché de clasificación: {e}")
+
+    def _evict(self, db: Session) -> int:
+        total = db.query(func.count(ClassificationCacheEntry.id)).scalar()
+        if total <= self.max_entries:
+            return 0
+        excess = total - int(self.max_entries * 0.9)
+        oldest = db.query(ClassificationCacheEntry.id).order_by(
+            ClassificationCacheEntry.last_used_at.asc()
+        ).limit(excess).subquery()
+        evicted = db.query(ClassificationCacheEntry).filter(
+            ClassificationCacheEntry.id.in_(db.query(oldest.c.id))
+        ).delete(synchronize_session=False)
+        db.commit()
+        metrics.counter("classification_cache.evicted").inc(evicted)
+        return evicted
+
+    def invalidate_stale(self) -> int:
+        """Borra las entradas de conjuntos de etiquetas que ya no existen."""
+        try:
+            with self.session_factory() as db:
+                removed = db.query(ClassificationCacheEntry).filter(
+                    ClassificationCacheEntry.label_version.notin_(current_label_versions())
+                ).delete(synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché de clasificación: {e}")
+            return 0
+        if removed:
+            logger.info(f"Caché de clasificación: {removed} entradas de etiquetas antiguas eliminadas")
+        return removed
+
+classification_cache = ClassificationCache()
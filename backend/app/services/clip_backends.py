@@ -0,0 +1,187 @@
+"""
+Codificadores de imagen de CLIP optimizados para CPU.
+
+Los embeddings de texto se calculan una sola vez por conjunto de etiquetas
+(``clip_text_embeddings``), así que el coste por imagen es solo el codificador
+de visión. Estas variantes lo sustituyen manteniendo el mismo espacio de
+embeddings, de modo que etiquetas, caché de texto y almacén de embeddings se
+comparten con el modelo fp32:
+
+- ``clip_onnx``: el codificador de visión se exporta una vez a ONNX
+  (``storage/models/clip_onnx``) y se ejecuta con ONNX Runtime, con la
+  optimización de grafo completa y los hilos repartidos entre réplicas.
+- ``clip_int8``: cuantización dinámica int8 de las capas lineales (pesos int8,
+  activaciones cuantizadas al vuelo), sin datos de calibración.
+
+``clip_parity_report`` compara cada variante con el modelo fp32 sobre una
+muestra de imágenes: latencia, aceleración, coincidencia del top-1 y, si la
+muestra está etiquetada, precisión.
+"""
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.event_labels import CLIP_EVENT_TEXTS, clip_event_label
+from app.services.model_artifacts import load_pretrained, require_artifact
+
+# Dos réplicas que arrancan a la vez no deben exportar el mismo archivo
+_export_lock = threading.Lock()
+
+def onnx_vision_path(model_name: Optional[str] = None) -> Path:
+    """Ruta del codificador de visión exportado para ``model_name``."""
+    slug = re.sub(r'[^a-zA-Z0-9._-]', '_', model_name or settings.CLIP_MODEL_NAME)
+    return settings.STORAGE_DIR / "models" / "clip_onnx" / f"{slug}-vision.onnx"
+
+def load_vision_model(model_name: Optional[str] = None):
+    """Codificador de visión fp32 con su proyección (sin la torre de texto)."""
+    from transformers import CLIPVisionModelWithProjection
+    model = load_pretrained(CLIPVisionModelWithProjection, model_name)
+    model.eval()
+    return model
+
+def export_vision_onnx(model_name: Optional[str] = None, path: Optional[Path] = None) -> Path:
+    """
+    Exporta el codificador de visión a ONNX (lote dinámico) si aún no existe.
+
+    Returns:
+        Path: Ruta del modelo exportado
+    """
+    import torch
+
+    path = path or onnx_vision_path(model_name)
+    with _export_lock:
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.monotonic()
+        model = load_vision_model(model_name)
+        model.config.return_dict = False  # salida en tupla: image_embeds es la primera
+        size = model.config.image_size
+        dummy = torch.zeros(1, 3, size, size)
+        tmp_path = path.with_suffix(".tmp.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                model, (dummy,), str(tmp_path),
+                input_names=["pixel_values"],
+                output_names=["image_embeds"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+                opset_version=settings.ONNX_OPSET,
+                do_constant_folding=True
+            )
+        tmp_path.replace(path)
+        logger.info(f"Codificador de visión de CLIP exportado a {path} en {time.monotonic() - started:.1f}s")
+        return path
+
+def _normalize(features):
+    return features / features.norm(dim=-1, keepdim=True)
+
+class OnnxVisionEncoder:
+    """Réplica ``clip_onnx``: una sesión de ONNX Runtime sobre el modelo exportado."""
+
+    def __init__(self, path: Path, intra_op_threads: int):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("AI_MODEL=clip_onnx requiere el paquete onnxruntime") from e
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # El paralelismo entre peticiones ya lo dan las réplicas y los micro-lotes
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.path = path
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.output_name = self.session.get_outputs()[0].name
+
+    def __call__(self, pixel_values):
+        import torch
+        embeds = self.session.run([self.output_name], {"pixel_values": pixel_values.numpy()})[0]
+        return _normalize(torch.from_numpy(embeds))
+
+class TorchVisionEncoder:
+    """Réplica ``clip_int8``: codificador de visión de torch (cuantizado)."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, pixel_values):
+        import torch
+        with torch.no_grad():
+            embeds = self.model(pixel_values=pixel_values).image_embeds
+        return _normalize(embeds)
+
+def create_onnx_encoder() -> OnnxVisionEncoder:
+    threads = settings.ONNX_INTRA_OP_THREADS
+    if threads <= 0:
+        threads = max(1, (os.cpu_count() or 1) // max(1, settings.CLIP_POOL_REPLICAS))
+    return OnnxVisionEncoder(require_artifact(export_vision_onnx()), threads)
+
+def create_int8_encoder() -> TorchVisionEncoder:
+    import torch
+    model = torch.ao.quantization.quantize_dynamic(load_vision_model(), {torch.nn.Linear}, dtype=torch.qint8)
+    return TorchVisionEncoder(model)
+
+def encoder_bytes(encoder: Any) -> int:
+    """Tamaño residente estimado de una réplica ``clip_onnx``/``clip_int8``."""
+    if isinstance(encoder, OnnxVisionEncoder):
+        return encoder.path.stat().st_size
+    from app.services.model_pool import torch_state_bytes
+    return torch_state_bytes(encoder.model)
+
+def clip_parity_report(
+    processor,
+    images: Sequence[Any],
+    labels: Optional[Sequence[Optional[str]]] = None,
+    variants: Sequence[str] = ("clip_onnx", "clip_int8"),
+    batch_size: int = 8
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compara las variantes con el codificador fp32 (``clip``) sobre ``images``.
+
+    Args:
+        processor: ``MediaProcessor`` con modelos locales
+        images: Imágenes PIL RGB
+        labels: Etiqueta de evento esperada por imagen (None = sin etiquetar)
+        variants: Variantes a comparar
+        batch_size: Imágenes por pasada del codificador
+
+    Returns:
+        dict: Por variante, ms por imagen, aceleración respecto a fp32, coincidencia
+        del top-1 con fp32, similitud coseno mínima y media, y precisión si hay etiquetas
+    """
+    import torch
+
+    processor._load_clip_model("clip")
+    text_features = torch.from_numpy(processor.clip_text_features(CLIP_EVENT_TEXTS))
+    batches = [processor.preprocess_clip_images(images[i:i + batch_size]) for i in range(0, len(images), batch_size)]
+    report: Dict[str, Dict[str, Any]] = {}
+    reference = None
+    for variant in ("clip", *variants):
+        processor._encode_clip_images(variant, batches[0][:1])  # carga y calentamiento fuera de la medida
+        started = time.perf_counter()
+        features = torch.cat([processor._encode_clip_images(variant, batch) for batch in batches])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        top1 = (features @ text_features.T).argmax(dim=-1)
+        entry: Dict[str, Any] = {"ms_per_image": round(elapsed_ms / len(images), 2)}
+        if reference is None:
+            reference = (features, top1, elapsed_ms)
+        else:
+            cosine = (features * reference[0]).sum(dim=-1)
+            entry.update(
+                speedup=round(reference[2] / elapsed_ms, 2),
+                top1_agreement=round(float((top1 == reference[1]).float().mean()), 4),
+                min_cosine=round(float(cosine.min()), 4),
+                mean_cosine=round(float(cosine.mean()), 4)
+            )
+        if labels is not None:
+            predicted: List[str] = [clip_event_label(CLIP_EVENT_TEXTS[i]) for i in top1.tolist()]
+            scored = [(p, l) for p, l in zip(predicted, labels) if l]
+            if scored:
+                entry["accuracy"] = round(sum(p == l for p, l in scored) / len(scored), 4)
+        report[variant] = entry
+    return report
@@ -0,0 +1,92 @@
+"""
+Preprocesado de imágenes para CLIP sin pasar por ``CLIPProcessor``.
+
+El procesador de HuggingFace convierte cada imagen a arrays intermedios varias
+veces (PIL → numpy → PIL → numpy float64), redimensiona la imagen completa
+aunque la mayor parte se recorta después y normaliza en varias pasadas.
+``ClipPreprocessor`` produce el mismo tensor con menos trabajo:
+
+- parte de la imagen ya decodificada a resolución reducida por ``MediaContext``
+  (modo *draft* de JPEG);
+- redimensiona con PIL sobre uint8 solo la región que sobrevive al recorte
+  central (``resize(box=...)``, mismas posiciones de muestreo que redimensionar
+  y recortar);
+- reescala y normaliza en una sola pasada con una tabla uint8 → float32 por
+  canal, escribiendo directamente en un tensor de lote reservado de antemano.
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Valores de openai/clip-vit-*; from_image_processor lee los del modelo configurado
+CLIP_IMAGE_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_IMAGE_STD = (0.26862954, 0.26130258, 0.27577711)
+
+class ClipPreprocessor:
+    """
+    Convierte imágenes PIL en el tensor ``pixel_values`` (N, 3, crop, crop) de CLIP.
+
+    Args:
+        size: Lado corto tras redimensionar
+        crop_size: Lado del recorte central
+        mean: Media por canal (escala 0-1)
+        std: Desviación típica por canal
+    """
+
+    def __init__(self, size: int = 224, crop_size: int = 224,
+                 mean: Sequence[float] = CLIP_IMAGE_MEAN, std: Sequence[float] = CLIP_IMAGE_STD):
+        self.size = size
+        self.crop_size = crop_size
+        levels = np.arange(256, dtype=np.float64)[:, None] / 255.0
+        # Reescalado y normalización fusionados: valor normalizado de cada nivel uint8, por canal
+        self._lut = np.ascontiguousarray(((levels - np.asarray(mean)) / np.asarray(std)).T.astype(np.float32))
+
+    @classmethod
+    def from_image_processor(cls, image_processor) -> "ClipPreprocessor":
+        """Configuración de un ``CLIPImageProcessor`` (tamaños, media y desviación)."""
+        size = image_processor.size
+        crop = image_processor.crop_size
+        return cls(
+            size=size["shortest_edge"] if isinstance(size, dict) else int(size),
+            crop_size=crop["height"] if isinstance(crop, dict) else int(crop),
+            mean=image_processor.image_mean,
+            std=image_processor.image_std
+        )
+
+    def crop_box(self, width: int, height: int) -> Tuple[float, float, float, float]:
+        """Región de la imagen original que queda tras redimensionar el lado corto y recortar el centro."""
+        short, long = (width, height) if width <= height else (height, width)
+        resized_long = int(self.size * long / short)
+        resized_w, resized_h = (self.size, resized_long) if width <= height else (resized_long, self.size)
+        left = (resized_w - self.crop_size) // 2
+        top = (resized_h - self.crop_size) // 2
+        scale_x, scale_y = width / resized_w, height / resized_h
+        return (left * scale_x, top * scale_y,
+                (left + self.crop_size) * scale_x, (top + self.crop_size) * scale_y)
+
+    def resize_and_crop(self, image: Image.Image) -> np.ndarray:
+        """Recorte central redimensionado como array uint8 (crop, crop, 3)."""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        resized = image.resize((self.crop_size, self.crop_size), Image.Resampling.BICUBIC, box=self.crop_box(*image.size))
+        return np.asarray(resized)
+
+    def __call__(self, images: Sequence[Image.Image], out=None):
+        """
+        Preprocesa ``images`` en un único tensor float32.
+
+        Args:
+            images: Imágenes PIL
+            out: Tensor (N, 3, crop, crop) float32 contiguo donde escribir (opcional)
+        """
+        import torch
+
+        if out is None:
+            out = torch.empty((len(images), 3, self.crop_size, self.crop_size), dtype=torch.float32)
+        batch = out.numpy()
+        for i, image in enumerate(images):
+            pixels = self.resize_and_crop(image)
+            for channel in range(3):
+                np.take(self._lut[channel], pixels[..., channel], out=batch[i, channel])
+        return out
@@ -0,0 +1,109 @@
+"""
+Caché de embeddings de texto de CLIP.
+
+Los prompts de eventos no cambian entre imágenes, así que su matriz de
+embeddings normalizados se calcula una sola vez por (modelo, conjunto de
+etiquetas), se mantiene en memoria y se persiste en disco para que un reinicio
+no vuelva a ejecutar el codificador de texto.
+"""
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.event_labels import label_set_version
+
+def encode_texts(model, processor, texts: Sequence[str]) -> np.ndarray:
+    """
+    Ejecuta el codificador de texto de CLIP y devuelve embeddings normalizados.
+
+    Returns:
+        np.ndarray: Matriz float32 de forma (len(texts), dim) con filas de norma 1
+    """
+    import torch
+
+    text_inputs = processor(text=list(texts), return_tensors="pt", padding=True)
+    with torch.no_grad():
+        text_features = model.get_text_features(**text_inputs)
+    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+    return text_features.cpu().numpy().astype(np.float32)
+
+class ClipTextEmbeddingCache:
+    """
+    Matrices de embeddings de texto indexadas por (modelo, versión de etiquetas).
+
+    Args:
+        cache_dir: Directorio donde se guardan las matrices (.npy)
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = cache_dir or settings.STORAGE_DIR / "models" / "clip_text"
+        self._memory: Dict[Tuple[str, str], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model_name: str,
+        texts: Sequence[str],
+        encoder: Callable[[Sequence[str]], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Devuelve la matriz normalizada de ``texts``.
+
+        ``encoder`` solo se invoca (y por tanto el modelo solo se carga) si la
+        matriz no está ni en memoria ni en disco.
+        """
+        key = (model_name, label_set_version(texts))
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                return cached
+
+            path = self._path_for(*key)
+            matrix = self._load(path, len(texts))
+            if matrix is None:
+                matrix = np.asarray(encoder(texts), dtype=np.float32)
+                self._save(path, matrix)
+                logger.info(f"Embeddings de texto calculados para {len(texts)} etiquetas ({model_name})")
+            self._memory[key] = matrix
+            return matrix
+
+    def clear(self):
+        """Vacía la caché en memoria (los archivos en disco se conservan)."""
+        with self._lock:
+            self._memory.clear()
+
+    def _path_for(self, model_name: str, version: str) -> Path:
+        slug = re.sub(r'[^a-zA-Z0-9._-]', '_', model_name)
+        return self.cache_dir / f"{slug}-{version}.npy"
+
+    def _load(self, path: Path, expected_rows: int) -> Optional[np.ndarray]:
+        if not path.exists():
+            return None
+        try:
+            matrix = np.load(path)
+            if matrix.ndim == 2 and matrix.shape[0] == expected_rows:
+                return matrix.astype(np.float32, copy=False)
+            logger.warning(f"Caché de embeddings de texto con forma inesperada, se recalcula: {path}")
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché de embeddings de texto {path}: {e}")
+        return None
+
+    def _save(self, path: Path, matrix: np.ndarray):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp.npy")
+            np.save(tmp_path, matrix)
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché de embeddings de texto {path}: {e}")
+
+clip_text_cache = ClipTextEmbeddingCache()
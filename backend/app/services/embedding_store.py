@@ -0,0 +1,358 @@
+"""
+Almacén persistente de embeddings de imagen de CLIP.
+
+Los embeddings normalizados se guardan en una matriz float16 de solo-anexado
+mapeada en memoria, con un índice pequeño que asocia cada fila a un
+``Media.id``. Así, reclasificar toda la biblioteca con otro conjunto de
+etiquetas es una multiplicación de matrices en lugar de volver a ejecutar el
+codificador de imagen.
+
+Estructura en disco (un directorio por modelo)::
+
+    meta.json     # dimensión, modelo y número de filas
+    vectors.f16   # filas float16 de tamaño ``dim``, anexadas en orden
+    ids.i64       # Media.id de cada fila (-1 = fila borrada, "tombstone")
+    .lock         # cerrojo ``fcntl`` de los escritores
+
+Cada proceso de la API (y su cola de ingesta) escribe en el mismo directorio:
+las escrituras toman el cerrojo exclusivo del archivo ``.lock``, de modo que
+vectores e ids se anexan siempre juntos, y cada escritura reemplaza
+``meta.json``. Las lecturas comparan ``meta.json`` con la última versión vista y
+vuelven a cargar ``ids.i64`` si otro proceso lo ha cambiado. Sin ``fcntl``
+(Windows) el almacén supone un único proceso escritor.
+"""
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: un único proceso escritor
+    fcntl = None
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+
+TOMBSTONE = -1
+
+class EmbeddingStore:
+    """
+    Matriz de embeddings indexada por ``Media.id``.
+
+    Args:
+        directory: Directorio del almacén
+        dim: Dimensión de los embeddings (se toma de ``meta.json`` si ya existe)
+        model_name: Modelo que generó los embeddings (solo informativo)
+        compact_ratio: Fracción de filas borradas a partir de la cual se compacta automáticamente
+        dense_cache: Mantener además una copia float32 en RAM para puntuar consultas en milisegundos
+    """
+
+    def __init__(self, directory: Path, dim: Optional[int] = None, model_name: str = "",
+                 compact_ratio: float = 0.5, dense_cache: bool = False):
+        self.directory = Path(directory)
+        self.model_name = model_name
+        self.compact_ratio = compact_ratio
+        self.dense_cache = dense_cache
+        self._dense: Optional[np.ndarray] = None
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._rows: Dict[int, int] = {}
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors: Optional[np.memmap] = None
+        self._disk_version: Optional[Tuple[int, int]] = None
+        if self.meta_path.exists():
+            with self._file_lock():
+                self._load(repair=True)
+
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.directory / "vectors.f16"
+
+    @property
+    def ids_path(self) -> Path:
+        return self.directory / "ids.i64"
+
+    @property
+    def lock_path(self) -> Path:
+        return self.directory / ".lock"
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def __contains__(self, media_id: int) -> bool:
+        with self._lock:
+            self._refresh()
+            return media_id in self._rows
+
+    @property
+    def total_rows(self) -> int:
+        return int(self._ids.shape[0])
+
+    @property
+    def tombstones(self) -> int:
+        return self.total_rows - len(self._rows)
+
+    def add(self, media_id: int, vector: np.ndarray):
+        """Anexa (o reemplaza) el embedding de un medio."""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector = vector / norm
+        with self._lock, self._file_lock():
+            self._refresh(locked=True)
+            if self.dim is None:
+                self.dim = int(vector.shape[0])
+            if vector.shape[0] != self.dim:
+                raise ValueError(f"Dimensión {vector.shape[0]} distinta de la del almacén ({self.dim})")
+            if media_id in self._rows:
+                self._tombstone(self._rows.pop(media_id))
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(vector.astype(np.float16).tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.write(np.int64(media_id).tobytes())
+
+            self._rows[media_id] = self.total_rows
+            self._ids = np.append(self._ids, np.int64(media_id))
+            self._vectors = None  # se vuelve a mapear con el nuevo tamaño
+            if self._dense is not None:
+                self._append_dense(vector.astype(np.float16).astype(np.float32))
+            self._write_meta()
+
+    def delete(self, media_id: int) -> bool:
+        """Marca como borrado el embedding de un medio."""
+        with self._lock, self._file_lock():
+            self._refresh(locked=True)
+            row = self._rows.pop(media_id, None)
+            if row is None:
+                return False
+            self._tombstone(row)
+            self._write_meta()
+            if self.total_rows and self.tombstones / self.total_rows >= self.compact_ratio:
+                self._compact()
+            return True
+
+    def get(self, media_id: int) -> Optional[np.ndarray]:
+        """Embedding (float32) de un medio, o None si no está almacenado."""
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(media_id)
+            if row is None:
+                return None
+            return np.asarray(self._mapped()[row], dtype=np.float32)
+
+    def live(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Devuelve (ids, vectores) de las filas vivas.
+
+        Si no hay filas borradas los vectores son la propia matriz mapeada (sin copia).
+        """
+        with self._lock:
+            self._refresh()
+            vectors = self._mapped()
+            if self.tombstones == 0:
+                return self._ids.copy(), vectors
+            mask = self._ids != TOMBSTONE
+            return self._ids[mask], vectors[mask]
+
+    def iter_scores(self, queries: np.ndarray, chunk_rows: int = 65536) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Similitud coseno de todas las filas vivas contra ``queries`` (k × dim), por bloques.
+
+        Yields:
+            (ids, scores): ids del bloque y matriz float32 de forma (filas, k)
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        with self._lock:
+            self._refresh()
+            ids = self._ids.copy()
+            vectors = self._dense_matrix() if self.dense_cache else self._mapped()
+        if self.dense_cache:
+            # Copia float32 residente: una sola multiplicación sin conversiones
+            mask = ids != TOMBSTONE
+            if mask.any():
+                scores = vectors[:ids.shape[0]] @ queries.T
+                yield ids[mask], scores[mask]
+            return
+        for start in range(0, ids.shape[0], chunk_rows):
+            block_ids = ids[start:start + chunk_rows]
+            mask = block_ids != TOMBSTONE
+            if not mask.any():
+                continue
+            block = np.asarray(vectors[start:start + chunk_rows], dtype=np.float32)
+            scores = block @ queries.T
+            yield block_ids[mask], scores[mask]
+
+    def scores(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Igual que ``iter_scores`` pero concatenando todos los bloques."""
+        parts = list(self.iter_scores(queries))
+        k = 1 if np.ndim(queries) == 1 else np.shape(queries)[0]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty((0, k), dtype=np.float32)
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def compact(self):
+        """Reescribe el almacén sin las filas borradas (reemplazo atómico de archivos)."""
+        with self._lock, self._file_lock():
+            self._refresh(locked=True)
+            self._compact()
+
+    def _compact(self):
+        if self.tombstones == 0:
+            return
+        ids, vectors = self.live()
+        tmp_vectors = self.vectors_path.with_suffix(".f16.tmp")
+        tmp_ids = self.ids_path.with_suffix(".i64.tmp")
+        np.ascontiguousarray(vectors, dtype=np.float16).tofile(tmp_vectors)
+        ids.astype(np.int64).tofile(tmp_ids)
+        self._vectors = None
+        self._dense = None
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_ids, self.ids_path)
+        removed = self.tombstones
+        self._ids = ids.astype(np.int64)
+        self._rows = {int(media_id): row for row, media_id in enumerate(self._ids)}
+        self._write_meta()
+        logger.info(f"Almacén de embeddings compactado: {removed} filas eliminadas, {len(self._rows)} vivas")
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False) -> Iterator[None]:
+        """Cerrojo entre procesos: exclusivo para escribir, compartido para recargar."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _meta_version(self) -> Optional[Tuple[int, int]]:
+        # meta.json se reemplaza (archivo nuevo) en cada escritura de cualquier proceso
+        try:
+            st = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _refresh(self, locked: bool = False):
+        """
+        Vuelve a cargar el índice si otro proceso ha escrito desde la última lectura.
+        ``locked`` indica que ya se tiene el cerrojo exclusivo de archivo.
+        """
+        if self._meta_version() == self._disk_version:
+            return
+        if locked:
+            self._load()
+        else:
+            with self._file_lock(shared=True):
+                self._load()
+
+    def _tombstone(self, row: int):
+        with open(self.ids_path, "r+b") as f:
+            f.seek(row * 8)
+            f.write(np.int64(TOMBSTONE).tobytes())
+        self._ids[row] = TOMBSTONE
+
+    def _dense_matrix(self) -> np.ndarray:
+        if self._dense is None:
+            if self.dim is None:
+                return np.empty((0, 0), dtype=np.float32)
+            mapped = self._mapped()
+            capacity = max(1024, mapped.shape[0] * 2)
+            self._dense = np.empty((capacity, self.dim), dtype=np.float32)
+            self._dense[:mapped.shape[0]] = mapped
+        return self._dense
+
+    def _append_dense(self, vector: np.ndarray):
+        dense = self._dense
+        assert dense is not None and self.dim is not None
+        row = self.total_rows - 1
+        if row >= dense.shape[0]:
+            grown = np.empty((dense.shape[0] * 2, self.dim), dtype=np.float32)
+            grown[:row] = dense[:row]
+            self._dense = dense = grown
+        dense[row] = vector
+
+    def _mapped(self) -> np.ndarray:
+        if self.total_rows == 0 or self.dim is None:
+            return np.empty((0, self.dim or 0), dtype=np.float16)
+        if self._vectors is None:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r",
+                                      shape=(self.total_rows, self.dim))
+        return self._vectors
+
+    def _write_meta(self):
+        tmp_path = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "model": self.model_name, "rows": self.total_rows}, f)
+        os.replace(tmp_path, self.meta_path)
+        self._disk_version = self._meta_version()
+
+    def _load(self, repair: bool = False):
+        """
+        Lee el índice de disco. Con ``repair`` (solo con el cerrojo de archivo tomado)
+        trunca los archivos desalineados por una escritura interrumpida.
+        """
+        self._disk_version = self._meta_version()
+        self._vectors = None
+        self._dense = None
+        if self._disk_version is None:
+            return
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            dim = meta.get("dim") or self.dim
+            if dim is None:
+                raise ValueError("meta.json no indica la dimensión")
+            self.dim = dim
+            self.model_name = meta.get("model") or self.model_name
+            ids = np.fromfile(self.ids_path, dtype=np.int64) if self.ids_path.exists() else np.empty(0, np.int64)
+            vector_rows = self.vectors_path.stat().st_size // (2 * dim) if self.vectors_path.exists() else 0
+            # Una escritura interrumpida puede dejar los archivos desalineados: usar el mínimo común
+            rows = min(ids.shape[0], vector_rows)
+            if repair and (ids.shape[0] != rows or vector_rows != rows):
+                logger.warning(f"Almacén de embeddings desalineado en {self.directory}, truncando a {rows} filas")
+                os.truncate(self.ids_path, rows * 8)
+                os.truncate(self.vectors_path, rows * 2 * dim)
+            self._ids = ids[:rows].copy()
+            self._rows = {int(media_id): row for row, media_id in enumerate(self._ids) if media_id != TOMBSTONE}
+            # Se mapea ya, con el cerrojo tomado: una compactación posterior reemplaza los
+            # archivos y este mapa sigue apuntando a los que corresponden a estos ids
+            self._mapped()
+        except Exception as e:
+            logger.error(f"No se pudo cargar el almacén de embeddings {self.directory}: {e}")
+            self._ids = np.empty(0, dtype=np.int64)
+            self._rows = {}
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(model_name: Optional[str] = None) -> EmbeddingStore:
+    """Almacén de embeddings del modelo indicado (por defecto, el modelo CLIP configurado)."""
+    model_name = model_name or settings.CLIP_MODEL_NAME
+    with _stores_lock:
+        if model_name not in _stores:
+            slug = re.sub(r'[^a-zA-Z0-9._-]', '_', model_name)
+            _stores[model_name] = EmbeddingStore(
+                settings.EMBEDDINGS_DIR / slug,
+                model_name=model_name,
+                dense_cache=settings.EMBEDDINGS_DENSE_CACHE
+            )
+        return _stores[model_name]
@@ -0,0 +1,163 @@
+"""
+Conjuntos de etiquetas de eventos usados por los clasificadores.
+
+Las etiquetas están centralizadas aquí para que las cachés que dependen de ellas
+(embeddings de texto, resultados de clasificación) puedan invalidarse con una
+versión derivada de su contenido.
+"""
+import hashlib
+import json
+from typing import Iterable
+
+# Lista de eventos para clasificar (en inglés para el modelo CLIP)
+CLIP_EVENT_TEXTS = [
+    "a sports event or game",
+    "a conference or meeting",
+    "a party or celebration",
+    "a concert or musical performance",
+    "a wedding ceremony",
+    "a graduation ceremony",
+    "a protest or demonstration",
+    "a religious ceremony",
+    "a parade or festival",
+    "an exhibition or art show",
+    "a family gathering",
+    "a food event or dining",
+    "an outdoor activity or adventure",
+    "a business event",
+    "an educational event"
+]
+
+# Mapeo de eventos en inglés a español
+CLIP_EVENT_TRANSLATION = {
+    "sports event or game": "evento deportivo",
+    "conference or meeting": "conferencia",
+    "party or celebration": "fiesta",
+    "concert or musical performance": "concierto",
+    "wedding ceremony": "boda",
+    "graduation ceremony": "graduación",
+    "protest or demonstration": "protesta",
+    "religious ceremony": "ceremonia religiosa",
+    "parade or festival": "festival",
+    "exhibition or art show": "exhibición",
+    "family gathering": "reunión familiar",
+    "food event or dining": "evento gastronómico",
+    "outdoor activity or adventure": "actividad al aire libre",
+    "business event": "evento de negocios",
+    "educational event": "evento educativo"
+}
+
+# Objetos de COCO (YOLO) que indican cada evento y peso de la categoría
+YOLO_EVENT_CATEGORIES = {
+    # Categorías deportivas
+    "evento deportivo": {
+        "objects": ["sports ball", "baseball bat", "baseball glove", "tennis racket",
+                    "soccer ball", "football", "basketball", "baseball", "frisbee",
+                    "skis", "snowboard", "kite", "skateboard", "surfboard"],
+        "weight": 1.2
+    },
+
+    # Categorías de conferencias/eventos educativos
+    "conferencia": {
+        "objects": ["laptop", "tv", "book", "cell phone", "keyboard", "mouse",
+                    "microphone", "projector", "presentation", "whiteboard"],
+        "weight": 1.0
+    },
+
+    # Celebraciones y fiestas
+    "fiesta": {
+        "objects": ["wine glass", "cup", "cake", "bottle", "balloon",
+                    "fork", "knife", "spoon", "bowl", "chair"],
+        "weight": 1.1
+    },
+
+    # Conciertos y eventos musicales
+    "concierto": {
+        "objects": ["microphone", "chair", "person", "cell phone", "tv", "speaker"],
+        "weight": 1.15
+    },
+
+    # Bodas y ceremonias matrimoniales
+    "boda": {
+        "objects": ["person", "tie", "dress", "suit", "cake", "wine glass",
+                    "chair", "dining table", "flower", "candle"],
+        "weight": 1.3
+    },
+
+    # Graduaciones
+    "graduación": {
+        "objects": ["person", "book", "chair", "tie", "gown", "hat"],
+        "weight": 1.25
+    },
+
+    # Protestas y manifestaciones
+    "protesta": {
+        "objects": ["person", "sign", "banner", "flag", "backpack"],
+        "weight": 1.0
+    },
+
+    # Ceremonias religiosas
+    "ceremonia religiosa": {
+        "objects": ["person", "book", "chair", "vase", "candle"],
+        "weight": 1.0
+    },
+
+    # Desfiles y festivales
+    "desfile o festival": {
+        "objects": ["person", "flag", "umbrella", "balloon", "backpack", "handbag"],
+        "weight": 1.0
+    },
+
+    # Eventos gastronómicos
+    "evento gastronómico": {
+        "objects": ["dining table", "bottle", "wine glass", "cup", "fork", "knife",
+                    "spoon", "bowl", "banana", "apple", "sandwich", "orange", "broccoli",
+                    "carrot", "hot dog", "pizza", "donut", "cake", "chair", "food"],
+        "weight": 1.0
+    },
+
+    # Actividades al aire libre
+    "actividad al aire libre": {
+        "objects": ["bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck",
+                    "boat", "bird", "cat", "dog", "horse", "sheep", "cow", "backpack",
+                    "umbrella", "handbag", "suitcase", "frisbee", "skis", "snowboard",
+                    "kite", "skateboard", "surfboard", "tennis racket", "bottle", "tree",
+                    "mountain", "beach", "lake", "river"],
+        "weight": 1.0
+    },
+
+    # Reuniones familiares
+    "reunión familiar": {
+        "objects": ["person", "chair", "couch", "potted plant", "dining table", "tv",
+                    "laptop", "cell phone", "book", "clock", "vase"],
+        "weight": 1.0
+    },
+
+    # Grupo general de personas
+    "evento social": {
+        "objects": ["person"],
+        "weight": 0.8  # Menor peso ya que personas aparecen en muchos eventos
+    }
+}
+
+# Etiquetas de YOLO con otro nombre en el vocabulario de CLIP; en la cascada, un evento de
+# YOLO que no esté en el vocabulario de CLIP (p. ej. "evento social") se decide con CLIP
+YOLO_TO_CLIP_EVENT = {
+    "desfile o festival": "festival",
+}
+CLIP_EVENT_LABELS = frozenset(CLIP_EVENT_TRANSLATION.values())
+
+def clip_event_label(text: str) -> str:
+    """Traduce un prompt de CLIP a la etiqueta de evento en español."""
+    english_event = text.replace("a ", "").replace("an ", "")
+    return CLIP_EVENT_TRANSLATION.get(english_event, english_event)
+
+def label_set_version(labels: Iterable) -> str:
+    """Versión corta y estable de un conjunto de etiquetas (hash de su contenido)."""
+    payload = json.dumps(list(labels), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+CLIP_LABEL_SET_VERSION = label_set_version(CLIP_EVENT_TEXTS)
+YOLO_LABEL_SET_VERSION = label_set_version(
+    [event, data["objects"], data["weight"]] for event, data in YOLO_EVENT_CATEGORIES.items()
+)
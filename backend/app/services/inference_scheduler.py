@@ -0,0 +1,162 @@
+"""
+Planificador de inferencia por micro-lotes.
+
+Las peticiones concurrentes de inferencia (por ejemplo, varios trabajadores de
+ingesta clasificando a la vez) se agrupan hasta ``max_batch_size`` elementos o
+``max_wait_ms`` milisegundos, se ejecutan en una sola pasada de la red y los
+resultados se devuelven a cada llamante por separado. Con ``max_concurrency > 1``
+se ejecutan hasta ese número de lotes a la vez (uno por réplica del modelo);
+mientras todos están ocupados las peticiones nuevas se acumulan en la cola y
+forman el siguiente lote.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+# Límites de cubeta para los histogramas del planificador
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+_STOP = object()
+
+class _Request:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+class BatchScheduler:
+    """
+    Agrupa llamadas individuales en lotes para ``batch_fn``.
+
+    Args:
+        batch_fn: Función que recibe la lista de elementos del lote y devuelve
+            una lista de resultados del mismo tamaño y en el mismo orden
+        max_batch_size: Número máximo de elementos por lote
+        max_wait_ms: Tiempo máximo que espera el primer elemento del lote
+        name: Prefijo de las métricas del planificador
+        max_concurrency: Lotes en ejecución simultánea (p. ej. réplicas del modelo)
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        name: str = "inference",
+        max_concurrency: int = 1
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.batch_size_histogram = metrics.histogram(f"{name}.batch_size", BATCH_SIZE_BUCKETS, "items")
+        self.queue_wait_histogram = metrics.histogram(f"{name}.queue_wait_ms", QUEUE_WAIT_MS_BUCKETS, "ms")
+
+    def submit(self, item: Any) -> Future:
+        """Encola un elemento y devuelve un Future con su resultado."""
+        request = _Request(item)
+        if self.max_batch_size == 1:
+            # Sin agrupación posible: ejecutar directamente en el hilo llamante
+            self._run_batch([request])
+            return request.future
+        self._ensure_thread()
+        self._queue.put(request)
+        return request.future
+
+    def run(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Encola un elemento y espera su resultado."""
+        return self.submit(item).result(timeout=timeout)
+
+    def stop(self):
+        """Detiene el hilo del planificador tras procesar lo ya encolado."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(_STOP)
+                self._thread.join()
+                self._thread = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                if self.max_concurrency > 1 and self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix=f"{self.name}-batch")
+                self._thread = threading.Thread(
+                    target=self._loop, name=f"{self.name}-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            # Esperar a que haya un hueco antes de formar el lote: lo que llegue entretanto lo engorda
+            self._slots.acquire()
+            first = self._queue.get()
+            if first is _STOP:
+                self._slots.release()
+                return
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stop = True
+                    break
+                batch.append(request)
+            if self._executor is not None:
+                self._executor.submit(self._run_batch_in_slot, batch)
+            else:
+                self._run_batch_in_slot(batch)
+            if stop:
+                return
+
+    def _run_batch_in_slot(self, batch: List[_Request]):
+        try:
+            self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _run_batch(self, batch: List[_Request]):
+        started_at = time.monotonic()
+        for request in batch:
+            self.queue_wait_histogram.observe((started_at - request.enqueued_at) * 1000.0)
+        self.batch_size_histogram.observe(len(batch))
+
+        try:
+            results = self.batch_fn([request.item for request in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"El lote devolvió {len(results)} resultados para {len(batch)} elementos"
+                )
+        except Exception as e:
+            logger.error(f"Error ejecutando lote de inferencia '{self.name}' ({len(batch)} elementos): {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
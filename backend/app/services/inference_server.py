@@ -0,0 +1,413 @@
+"""
+Servidor de inferencia dedicado con transferencia por memoria compartida.
+
+Con varios workers de uvicorn (o el pool de procesos de ingesta) cada proceso
+cargaba su propia copia de CLIP (~600 MB) y de los pesos de YOLO. Con
+``INFERENCE_SERVER_ADDRESS`` configurado los modelos viven en un único proceso
+(``python -m app.services.inference_server``) y los demás solo preprocesan:
+
+- cada cliente crea un segmento ``multiprocessing.shared_memory`` dividido en
+  ``INFERENCE_SHM_SLOTS`` huecos de ``INFERENCE_SHM_SLOT_MB`` (un anillo);
+- para cada petición escribe el tensor en un hueco libre y envía por el socket
+  Unix solo (id, operación, hueco, forma, dtype);
+- el servidor lee el tensor del hueco, ejecuta la red (agrupando en lotes las
+  peticiones de todos los clientes con el ``BatchScheduler`` de su procesador)
+  y escribe el resultado en el mismo hueco.
+
+El servidor y sus clientes deben compartir la máquina (y ``/dev/shm``). El
+socket se crea con permisos 0600 y la conexión exige la clave
+``INFERENCE_AUTHKEY`` o, si no está definida, la de ``CONFIG_DIR/inference.key``,
+que se genera al azar (0600) la primera vez: no hay clave por defecto.
+"""
+import itertools
+import os
+import queue
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import CLIP_AI_MODELS, settings
+from app.core.logger import logger
+
+AUTHKEY_FILENAME = "inference.key"
+
+# Segmentos creados por este proceso (cliente y servidor pueden coincidir en pruebas)
+_created_segments: set = set()
+
+def inference_authkey() -> bytes:
+    """
+    Clave compartida por el servidor y sus clientes.
+
+    Usa ``INFERENCE_AUTHKEY`` si está definida; si no, lee ``CONFIG_DIR/inference.key``
+    y, si aún no existe, la genera con permisos 0600.
+
+    Raises:
+        PermissionError: Si el archivo de clave es legible por otros usuarios
+    """
+    if settings.INFERENCE_AUTHKEY:
+        return settings.INFERENCE_AUTHKEY.encode()
+    path = settings.CONFIG_DIR / AUTHKEY_FILENAME
+    if not path.exists():
+        settings.CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{AUTHKEY_FILENAME}.{os.getpid()}")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, path)  # atómico: si otro proceso se adelantó, se usa su clave
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    if path.stat().st_mode & 0o077:
+        raise PermissionError(f"La clave del servidor de inferencia {path} debe tener permisos 0600")
+    return path.read_text().strip().encode()
+
+class ShmRing:
+    """
+    Huecos de tamaño fijo sobre un segmento de memoria compartida.
+
+    Args:
+        slots: Número de huecos
+        slot_bytes: Tamaño de cada hueco
+        name: Nombre de un segmento existente (lado servidor); None lo crea
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = SharedMemory(create=True, size=slots * slot_bytes)
+            _created_segments.add(self.shm.name)
+        else:
+            self.shm = SharedMemory(name=name)
+            if name not in _created_segments:
+                # El segmento pertenece al cliente: el resource_tracker de este
+                # proceso no debe eliminarlo al salir (lo registra con la barra inicial de POSIX)
+                resource_tracker.unregister(f"/{self.shm.name}", "shared_memory")
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No hay huecos libres en la memoria compartida de inferencia")
+
+    def release(self, slot: int):
+        self._free.put(slot)
+
+    def write(self, slot: int, array: np.ndarray) -> Tuple[Tuple[int, ...], str]:
+        """Copia ``array`` en el hueco y devuelve su (forma, dtype)."""
+        array = np.ascontiguousarray(array)
+        if array.nbytes > self.slot_bytes:
+            raise ValueError(
+                f"El tensor ocupa {array.nbytes} bytes y el hueco {self.slot_bytes} "
+                "(aumentar INFERENCE_SHM_SLOT_MB)"
+            )
+        self.view(slot, array.shape, array.dtype.str)[...] = array
+        return array.shape, array.dtype.str
+
+    def read(self, slot: int, shape: Tuple[int, ...], dtype: str) -> np.ndarray:
+        """Copia del contenido del hueco (el hueco puede reutilizarse después)."""
+        return np.array(self.view(slot, shape, dtype))
+
+    def view(self, slot: int, shape: Tuple[int, ...], dtype: str) -> np.ndarray:
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # quedan vistas vivas; el sistema libera el mapeo al salir
+        if self.owner:
+            _created_segments.discard(self.shm.name)
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class InferenceClient:
+    """
+    Conexión de un proceso con el servidor de inferencia.
+
+    Es segura entre hilos: varias peticiones pueden estar en vuelo a la vez
+    (hasta el número de huecos del anillo).
+    """
+
+    def __init__(
+        self,
+        address: str,
+        slots: Optional[int] = None,
+        slot_bytes: Optional[int] = None,
+        authkey: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
+        self.timeout = timeout or settings.INFERENCE_TIMEOUT
+        self._conn: Connection = Client(address, family="AF_UNIX",
+                                        authkey=authkey.encode() if authkey else inference_authkey())
+        self.ring = ShmRing(slots or settings.INFERENCE_SHM_SLOTS,
+                            slot_bytes or settings.INFERENCE_SHM_SLOT_MB * 1024 * 1024)
+        self._conn.send(("attach", self.ring.name, self.ring.slots, self.ring.slot_bytes))
+        reply = self._conn.recv()
+        if reply[0] != "ok":
+            self.close()
+            raise ConnectionError(f"El servidor de inferencia rechazó la conexión: {reply[1]}")
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="inference-client", daemon=True)
+        self._reader.start()
+
+    def run(self, op: str, array: Optional[np.ndarray] = None, **extra) -> Any:
+        """
+        Ejecuta ``op`` en el servidor.
+
+        Returns:
+            El array resultante (copiado fuera de la memoria compartida) o el
+            valor devuelto directamente por la operación
+
+        Raises:
+            TimeoutError: Si no hay hueco libre o el servidor no responde a tiempo
+            ConnectionError: Si se pierde la conexión
+            RuntimeError: Si la operación falla en el servidor
+        """
+        if self.closed:
+            raise ConnectionError("La conexión con el servidor de inferencia está cerrada")
+        slot = self.ring.acquire(self.timeout)
+        request_id = next(self._ids)
+        future: Future = Future()
+        try:
+            shape = dtype = None
+            if array is not None:
+                shape, dtype = self.ring.write(slot, array)
+            with self._lock:
+                self._pending[request_id] = future
+            with self._send_lock:
+                self._conn.send(("infer", request_id, op, slot, shape, dtype, extra))
+            shape, dtype, value = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # El servidor aún puede escribir en el hueco: se libera cuando responda
+            future.add_done_callback(lambda _: self.ring.release(slot))
+            raise TimeoutError(f"El servidor de inferencia no respondió a '{op}' en {self.timeout}s")
+        except BaseException:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self.ring.release(slot)
+            raise
+        try:
+            return self.ring.read(slot, shape, dtype) if shape is not None else value
+        finally:
+            self.ring.release(slot)
+
+    def close(self):
+        self.closed = True
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+        self.ring.close()
+
+    def _read_loop(self):
+        error: BaseException = ConnectionError("Conexión con el servidor de inferencia perdida")
+        try:
+            while True:
+                kind, request_id, *payload = self._conn.recv()
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if kind == "result":
+                    future.set_result(tuple(payload))
+                else:
+                    future.set_exception(RuntimeError(payload[0]))
+        except (EOFError, OSError) as e:
+            error = ConnectionError(f"Conexión con el servidor de inferencia perdida: {e}")
+        finally:
+            self.closed = True
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(error)
+
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+
+def get_inference_client() -> InferenceClient:
+    """Cliente compartido por el proceso; se reconecta si la conexión se perdió."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.closed:
+            if _client is not None:
+                _client.close()
+            _client = InferenceClient(settings.INFERENCE_SERVER_ADDRESS)
+        return _client
+
+class InferenceServer:
+    """
+    Proceso que aloja los modelos y atiende a los clientes conectados.
+
+    Args:
+        address: Ruta del socket Unix
+        processor: ``MediaProcessor`` local que ejecuta las redes
+        authkey: Clave compartida con los clientes
+    """
+
+    def __init__(self, address: str, processor=None, authkey: Optional[str] = None):
+        if processor is None:
+            from app.services.media_processor import MediaProcessor
+            processor = MediaProcessor(use_inference_server=False)
+        self.address = address
+        self.processor = processor
+        self.authkey = authkey.encode() if authkey else inference_authkey()
+        self._executor = ThreadPoolExecutor(max_workers=settings.INFERENCE_SERVER_THREADS,
+                                            thread_name_prefix="inference")
+        self._listener: Optional[Listener] = None
+        self._thread: Optional[threading.Thread] = None
+        self.handlers: Dict[str, Callable[[Optional[np.ndarray], dict], Any]] = {
+            "clip_image": self._clip_image,
+            "clip_text": self._clip_text,
+            "yolo": self._yolo,
+            "yolo_classes": self._yolo_classes,
+        }
+
+    def preload(self, ai_model: Optional[str] = None):
+        """Carga los modelos de ``ai_model`` antes de aceptar conexiones."""
+        ai_model = ai_model or settings.AI_MODEL
+        if ai_model in CLIP_AI_MODELS:
+            self.processor._load_clip_model(ai_model)
+        elif ai_model == "cascade":
+            self.processor._load_opencv_dnn_model(settings.CASCADE_YOLO_VARIANT)
+            self.processor._load_clip_model(settings.CASCADE_CLIP_VARIANT)
+        else:
+            self.processor._load_opencv_dnn_model()
+
+    def start(self):
+        """Atiende conexiones en un hilo en segundo plano."""
+        self._bind()
+        self._thread = threading.Thread(target=self._accept_loop, name="inference-server", daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self._bind()
+        self._accept_loop()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _bind(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # socket de una ejecución anterior
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o600)  # solo el usuario del servidor puede conectarse
+        logger.info(f"Servidor de inferencia escuchando en {self.address}")
+
+    def _accept_loop(self):
+        while self._listener is not None:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError as e:
+                logger.warning(f"Cliente de inferencia rechazado: {e}")
+                continue
+            except OSError:
+                break  # listener cerrado
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def _serve_client(self, conn: Connection):
+        ring = None
+        send_lock = threading.Lock()
+        try:
+            kind, name, slots, slot_bytes = conn.recv()
+            if kind != "attach":
+                conn.send(("error", "Se esperaba el mensaje attach"))
+                return
+            ring = ShmRing(slots, slot_bytes, name=name)
+            conn.send(("ok",))
+            while True:
+                message = conn.recv()
+                self._executor.submit(self._handle, conn, send_lock, ring, message)
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"Error en la conexión de inferencia: {e}")
+        finally:
+            conn.close()
+            if ring is not None:
+                ring.close()
+
+    def _handle(self, conn: Connection, send_lock: threading.Lock, ring: ShmRing, message: tuple):
+        _, request_id, op, slot, shape, dtype, extra = message
+        try:
+            handler = self.handlers.get(op)
+            if handler is None:
+                raise ValueError(f"Operación de inferencia desconocida: {op}")
+            array = ring.read(slot, shape, dtype) if shape is not None else None
+            result = handler(array, extra)
+            if isinstance(result, np.ndarray):
+                reply = ("result", request_id, *ring.write(slot, result), None)
+            else:
+                reply = ("result", request_id, None, None, result)
+        except Exception as e:
+            logger.error(f"Error ejecutando '{op}' en el servidor de inferencia: {e}")
+            reply = ("error", request_id, str(e))
+        try:
+            with send_lock:
+                conn.send(reply)
+        except OSError:
+            pass  # el cliente se desconectó
+
+    def _clip_image(self, pixel_values: Optional[np.ndarray], extra: dict) -> np.ndarray:
+        import torch
+        if pixel_values is None:
+            raise ValueError("'clip_image' necesita un array de entrada")
+        variant = extra.get("variant", "clip")  # el AI_MODEL del cliente, no el del servidor
+        self.processor._load_clip_model(variant)
+        batch = torch.from_numpy(pixel_values)
+        # Cada fila pasa por el planificador para agruparse con las de otros clientes
+        futures = [self.processor.clip_scheduler.submit((variant, batch[i:i + 1])) for i in range(batch.shape[0])]
+        return torch.stack([future.result() for future in futures]).cpu().numpy().astype(np.float32)
+
+    def _clip_text(self, _: Optional[np.ndarray], extra: dict) -> np.ndarray:
+        return np.asarray(self.processor.encode_clip_texts(extra["texts"]), dtype=np.float32)
+
+    def _yolo(self, blob: Optional[np.ndarray], extra: dict) -> np.ndarray:
+        """Salida de YOLO filtrada a las filas con alguna clase por encima de ``min_score``."""
+        if blob is None:
+            raise ValueError("'yolo' necesita un array de entrada")
+        self.processor._load_opencv_dnn_model(extra.get("variant"))
+        outputs = self.processor._yolo_forward(blob, extra.get("variant"))
+        rows = np.concatenate([np.asarray(output).reshape(-1, output.shape[-1]) for output in outputs])
+        keep = rows[:, 5:].max(axis=1) > extra.get("min_score", 0.5)
+        return rows[keep].astype(np.float32)
+
+    def _yolo_classes(self, _: Optional[np.ndarray], extra: dict) -> list:
+        self.processor._load_opencv_dnn_model()
+        return list(self.processor.opencv_classes or [])
+
+if __name__ == "__main__":
+    if not settings.INFERENCE_SERVER_ADDRESS:
+        raise SystemExit("Define INFERENCE_SERVER_ADDRESS con la ruta del socket (en un directorio privado)")
+    server = InferenceServer(settings.INFERENCE_SERVER_ADDRESS)
+    try:
+        server.preload()
+    except Exception as e:
+        logger.error(f"No se pudo precargar el modelo {settings.AI_MODEL}: {e}")
+    server.serve_forever()
@@ -0,0 +1,254 @@
+"""
+Cola de ingesta asíncrona.
+
+Las subidas solo guardan el archivo y crean un trabajo en la tabla ``ingest_jobs``.
+Un pool de hilos ejecuta después las etapas de ``MediaProcessor`` (miniatura,
+metadatos y clasificación), actualiza el progreso del trabajo y reintenta los
+fallos hasta ``INGEST_MAX_ATTEMPTS`` veces. Con ``MEDIA_PROCESS_WORKERS > 0`` las
+etapas CPU se delegan a un pool de procesos (ver ``media_workers``).
+
+Con varios procesos de la API cada uno reencola los trabajos pendientes al
+arrancar; un trabajo solo se ejecuta en el proceso que lo reclama con un UPDATE
+condicional (``job_crud.claim_job``). Los trabajos en curso sin actualizar
+durante ``INGEST_JOB_LEASE_SECONDS`` se dan por abandonados y se reencolan
+(``requeue_abandoned``, que se ejecuta periódicamente).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import logger
+from app.crud import job as job_crud
+from app.crud import media as media_crud
+from app.models.job import JOB_RETRYING, JOB_COMPLETED, JOB_FAILED
+from app.models.media import Media
+from app.services.embedding_store import get_embedding_store
+from app.services.media_processor import MediaProcessor
+from app.services.media_workers import MediaProcessPool, ProgressCallback, analyze_media
+
+def media_absolute_path(db_media: Media) -> Path:
+    """Devuelve la ruta absoluta del archivo original de un medio."""
+    return settings.STORAGE_DIR / db_media.file_path.lstrip('/')
+
+def process_media(
+    processor: MediaProcessor,
+    db_media: Media,
+    report: Optional[ProgressCallback] = None,
+    process_pool: Optional[MediaProcessPool] = None
+) -> Media:
+    """
+    Ejecuta las etapas de procesamiento sobre un medio ya guardado.
+
+    Args:
+        processor: Instancia de MediaProcessor a utilizar
+        db_media: Registro del medio (no se hace commit aquí)
+        report: Callback opcional que recibe (etapa, progreso)
+        process_pool: Si se indica, las etapas se ejecutan en uno de sus procesos
+
+    Returns:
+        Media: El mismo registro con los campos actualizados
+
+    Raises:
+        FileNotFoundError: Si el archivo original ya no existe
+    """
+    file_path = media_absolute_path(db_media)
+    if not file_path.exists():
+        raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
+
+    # Un acierto de la caché de clasificación no trae embedding: solo vale si el medio ya lo tiene
+    need_embedding = db_media.id not in get_embedding_store()
+    if process_pool is not None:
+        analysis = process_pool.analyze(str(file_path), db_media.mime_type, report,
+                                        db_media.content_hash, need_embedding)
+    else:
+        # Un único contexto decodificado para todas las etapas
+        analysis = analyze_media(processor, str(file_path), db_media.mime_type, report,
+                                 db_media.content_hash, need_embedding)
+
+    if analysis["thumbnail_path"]:
+        db_media.thumbnail_path = analysis["thumbnail_path"]
+    for key, value in analysis["metadata"].items():
+        setattr(db_media, key, value)
+    if analysis["event_type"] is not None:
+        db_media.event_type = analysis["event_type"]
+        db_media.event_confidence = analysis["event_confidence"]
+        db_media.classified_by = analysis["classified_by"]
+
+    # Guardar el embedding CLIP para reclasificaciones y búsquedas posteriores
+    if analysis["embedding"] is not None:
+        try:
+            media_crud.store_media_embedding(db_media.id, analysis["embedding"])
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el embedding del medio {db_media.id}: {e}")
+
+    return db_media
+
+class IngestQueue:
+    """
+    Pool de trabajadores que procesa los trabajos de ingesta en segundo plano.
+    """
+
+    def __init__(
+        self,
+        processor: MediaProcessor,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_workers: Optional[int] = None,
+        process_pool: Optional[MediaProcessPool] = None
+    ):
+        self.processor = processor
+        self.process_pool = process_pool
+        self.session_factory = session_factory
+        self.max_workers = max_workers or settings.INGEST_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._timers: set = set()
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def start(self, recover: bool = True):
+        """Arranca el pool y, opcionalmente, reencola los trabajos pendientes."""
+        with self._lock:
+            self._stopped = False
+            self._ensure_executor()
+        if recover:
+            self._recover_pending()
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        # Llamar con self._lock tomado
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="ingest"
+            )
+            logger.info(f"Cola de ingesta iniciada con {self.max_workers} trabajadores")
+        return self._executor
+
+    def shutdown(self, wait: bool = False):
+        """Detiene el pool. Los trabajos pendientes se recuperan en el próximo arranque."""
+        with self._lock:
+            self._stopped = True
+            for timer in list(self._timers):
+                timer.cancel()
+            self._timers.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=wait)
+
+    def enqueue(self, job_id: int):
+        """
+        Añade un trabajo a la cola de procesamiento.
+
+        Raises:
+            RuntimeError: Si la cola se ha detenido con ``shutdown``
+        """
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("La cola de ingesta está detenida")
+            executor = self._ensure_executor()
+        executor.submit(self._run_job, job_id)
+
+    def enqueue_many(self, job_ids: List[int]):
+        """Añade varios trabajos; los trabajadores del pool los reparten entre sí."""
+        for job_id in job_ids:
+            self.enqueue(job_id)
+
+    def _enqueue_later(self, job_id: int, delay: float):
+        timer = threading.Timer(delay, self._fire_timer, args=(job_id,))
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _fire_timer(self, job_id: int):
+        with self._lock:
+            self._timers.discard(threading.current_thread())
+            if self._executor is None:
+                return
+        self.enqueue(job_id)
+
+    def requeue_abandoned(self) -> int:
+        """Reencola los trabajos en curso sin actualizar durante ``INGEST_JOB_LEASE_SECONDS``."""
+        older_than = datetime.now(timezone.utc) - timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS)
+        db = self.session_factory()
+        try:
+            job_ids = job_crud.requeue_abandoned_jobs(db, older_than)
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        if job_ids:
+            logger.warning(f"Reencolados {len(job_ids)} trabajos de ingesta abandonados")
+        return len(job_ids)
+
+    def _recover_pending(self):
+        db = self.session_factory()
+        try:
+            self.requeue_abandoned()
+            # Los demás procesos también los reencolan: cada trabajo lo ejecuta quien lo reclame
+            pending = job_crud.get_claimable_jobs(db)
+            for db_job in pending:
+                self.enqueue(db_job.id)
+            if pending:
+                logger.info(f"Reencolados {len(pending)} trabajos de ingesta pendientes")
+        except Exception as e:
+            logger.error(f"No se pudieron recuperar los trabajos pendientes: {e}")
+        finally:
+            db.close()
+
+    def _run_job(self, job_id: int):
+        db = self.session_factory()
+        try:
+            if not job_crud.claim_job(db, job_id):
+                return  # terminado, inexistente o ya reclamado por otro trabajador
+            db_job = job_crud.get_job(db, job_id)
+            if db_job is None:
+                return
+
+            db_media = db.query(Media).filter(Media.id == db_job.media_id).first()
+            if db_media is None:
+                job_crud.update_job(db, db_job, status=JOB_FAILED, error="El medio ya no existe",
+                                    finished_at=datetime.now(timezone.utc))
+                return
+
+            def report(stage: str, progress: float):
+                job_crud.update_job(db, db_job, stage=stage, progress=progress)
+
+            try:
+                process_media(self.processor, db_media, report, self.process_pool)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._handle_failure(db, job_id, e)
+                return
+
+            job_crud.update_job(db, db_job, status=JOB_COMPLETED, stage="done", progress=1.0,
+                                finished_at=datetime.now(timezone.utc))
+            logger.info(f"Trabajo de ingesta {job_id} completado (media {db_media.id})")
+        except Exception as e:
+            logger.exception(f"Error inesperado en el trabajo de ingesta {job_id}: {e}")
+        finally:
+            db.close()
+
+    def _handle_failure(self, db: Session, job_id: int, error: Exception):
+        db_job = job_crud.get_job(db, job_id)
+        if db_job is None:
+            return
+        if db_job.attempts < db_job.max_attempts:
+            delay = settings.INGEST_RETRY_DELAY * db_job.attempts
+            logger.warning(
+                f"Trabajo de ingesta {job_id} falló (intento {db_job.attempts}/{db_job.max_attempts}): "
+                f"{error}. Reintentando en {delay:.1f}s"
+            )
+            job_crud.update_job(db, db_job, status=JOB_RETRYING, error=str(error))
+            self._enqueue_later(job_id, delay)
+        else:
+            logger.error(f"Trabajo de ingesta {job_id} falló definitivamente: {error}")
+            job_crud.update_job(db, db_job, status=JOB_FAILED, error=str(error),
+                                finished_at=datetime.now(timezone.utc))
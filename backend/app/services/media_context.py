@@ -0,0 +1,237 @@
+"""
+Contexto de medio decodificado una sola vez.
+
+Cada etapa de ``MediaProcessor`` (miniatura, metadatos y clasificación) necesitaba
+abrir y decodificar el archivo por su cuenta. ``MediaContext`` lee los bytes una
+vez, analiza el EXIF una vez y decodifica la imagen una sola vez a un buffer RGB
+reducido (usando el modo *draft* de JPEG para decodificar directamente a menor
+resolución). Para vídeos abre un único ``cv2.VideoCapture`` del que se obtienen
+las propiedades y el fotograma de la miniatura.
+
+Todos los atributos se calculan de forma perezosa: una etapa que no los usa
+no paga su coste.
+"""
+import io
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+# pyheif se importa la primera vez que llega un archivo HEIC/HEIF (None = aún no comprobado)
+_pyheif: Any = None
+_pyheif_checked = False
+
+def load_pyheif() -> Optional[Any]:
+    """Módulo pyheif, o None si no está instalado (sin soporte para HEIC/HEIF)."""
+    global _pyheif, _pyheif_checked
+    if not _pyheif_checked:
+        _pyheif_checked = True
+        try:
+            import pyheif
+            if hasattr(pyheif, 'read'):
+                _pyheif = pyheif
+                print("pyheif está instalado y funcionando. El soporte para archivos HEIC/HEIF está disponible.")
+        except ImportError as e:
+            print(f"pyheif no está disponible: {str(e)}. El soporte para archivos HEIC/HEIF no estará disponible.")
+    return _pyheif
+
+# Transformaciones para cada valor de la etiqueta EXIF Orientation
+_ORIENTATION_TRANSPOSES = {
+    2: (Image.Transpose.FLIP_LEFT_RIGHT,),
+    3: (Image.Transpose.ROTATE_180,),
+    4: (Image.Transpose.FLIP_TOP_BOTTOM,),
+    5: (Image.Transpose.FLIP_LEFT_RIGHT, Image.Transpose.ROTATE_90),
+    6: (Image.Transpose.ROTATE_270,),
+    7: (Image.Transpose.FLIP_LEFT_RIGHT, Image.Transpose.ROTATE_270),
+    8: (Image.Transpose.ROTATE_90,),
+}
+
+class MediaContext:
+    """
+    Datos de un archivo compartidos por todas las etapas de procesamiento.
+
+    Args:
+        file_path: Ruta al archivo original
+        mime_type: Tipo MIME del archivo
+        max_side: Lado máximo del buffer RGB decodificado
+    """
+
+    def __init__(self, file_path: str, mime_type: str, max_side: Optional[int] = None):
+        self.file_path = str(file_path)
+        self.mime_type = mime_type
+        self.max_side = max_side or settings.MEDIA_DECODE_MAX_SIDE
+        self._data: Optional[bytes] = None
+        self._exif: Optional[Dict[str, Any]] = None
+        self._image: Optional[Image.Image] = None
+        self._image_bgr: Optional[np.ndarray] = None
+        self._original_size: Optional[Tuple[int, int]] = None
+        self._video_info: Optional[Dict[str, Any]] = None
+        self._video_frame: Optional[np.ndarray] = None
+        # Resultados que las etapas dejan para las siguientes (p. ej. el embedding CLIP)
+        self.clip_embedding: Optional[np.ndarray] = None
+        self.classified_by: Optional[str] = None  # modelo (o etapa de la cascada) que decidió el evento
+        self.event_scores: Optional[np.ndarray] = None  # puntuación de cada etiqueta del modelo que decidió
+
+    @classmethod
+    def from_image(cls, image: Image.Image, file_path: str = "<memoria>") -> "MediaContext":
+        """Contexto sobre una imagen ya en memoria (p. ej. la imagen sintética del calentamiento)."""
+        context = cls(file_path, "image/jpeg")
+        context._image = image.convert('RGB')
+        context._original_size = image.size
+        context._exif = {}
+        return context
+
+    @property
+    def is_image(self) -> bool:
+        return self.mime_type.startswith('image/')
+
+    @property
+    def is_video(self) -> bool:
+        return self.mime_type.startswith('video/')
+
+    @property
+    def is_heif(self) -> bool:
+        return self.file_path.lower().endswith(('.heic', '.heif'))
+
+    @property
+    def data(self) -> bytes:
+        """Contenido completo del archivo, leído una sola vez."""
+        if self._data is None:
+            with open(self.file_path, 'rb') as f:
+                self._data = f.read()
+        return self._data
+
+    @property
+    def exif_tags(self) -> Dict[str, Any]:
+        """Etiquetas EXIF analizadas con exifread (vacío si no hay EXIF)."""
+        if self._exif is None:
+            try:
+                import exifread
+                self._exif = exifread.process_file(io.BytesIO(self.data), details=False)
+            except Exception as e:
+                print(f"Warning: Error leyendo EXIF de {self.file_path}: {e}")
+                self._exif = {}
+        return self._exif
+
+    @property
+    def original_size(self) -> Optional[Tuple[int, int]]:
+        """Dimensiones (ancho, alto) del archivo original, antes de reducirlo."""
+        if self._original_size is None and self.is_image:
+            self._decode_image()
+        return self._original_size
+
+    @property
+    def image(self) -> Image.Image:
+        """Imagen RGB reducida a ``max_side`` con la orientación EXIF aplicada."""
+        if self._image is None:
+            self._decode_image()
+        assert self._image is not None
+        return self._image
+
+    @property
+    def image_bgr(self) -> np.ndarray:
+        """La misma imagen reducida como array BGR (formato de OpenCV)."""
+        if self._image_bgr is None:
+            import cv2
+            self._image_bgr = cv2.cvtColor(np.asarray(self.image), cv2.COLOR_RGB2BGR)
+        return self._image_bgr
+
+    @property
+    def video_info(self) -> Dict[str, Any]:
+        """Dimensiones, fps y número de fotogramas del vídeo."""
+        if self._video_info is None:
+            self._read_video()
+        assert self._video_info is not None
+        return self._video_info
+
+    @property
+    def video_frame(self) -> Optional[np.ndarray]:
+        """Fotograma BGR al 25% del vídeo (o None si no se pudo leer)."""
+        if self._video_info is None:
+            self._read_video()
+        return self._video_frame
+
+    def close(self):
+        """Libera los buffers retenidos."""
+        self._data = None
+        self._image = None
+        self._image_bgr = None
+        self._video_frame = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _decode_image(self):
+        if self.is_heif:
+            img = self._open_heif()
+        else:
+            img = Image.open(io.BytesIO(self.data))
+            self._original_size = img.size
+            # Decodificar directamente a resolución reducida cuando el formato lo permite (JPEG)
+            img.draft('RGB', (self.max_side, self.max_side))
+
+        if self._original_size is None:
+            self._original_size = img.size
+
+        img = self._apply_orientation(img)
+
+        # Convertir a RGB si es necesario
+        if img.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        img.thumbnail((self.max_side, self.max_side))
+        self._image = img
+
+    def _open_heif(self) -> Image.Image:
+        pyheif = load_pyheif()
+        if pyheif is None:
+            raise RuntimeError(f"No se puede procesar archivo HEIC/HEIF {self.file_path}: pyheif no está instalado")
+        heif_file = pyheif.read(self.data)
+        return Image.frombytes(
+            heif_file.mode,
+            heif_file.size,
+            heif_file.data,
+            "raw",
+            heif_file.mode,
+            heif_file.stride,
+        )
+
+    def _apply_orientation(self, img: Image.Image) -> Image.Image:
+        try:
+            tag = self.exif_tags.get('Image Orientation')
+            orientation = int(tag.values[0]) if tag is not None else 1
+            for transpose in _ORIENTATION_TRANSPOSES.get(orientation, ()):
+                img = img.transpose(transpose)
+        except Exception as e:
+            print(f"Warning: Error handling EXIF orientation: {e}")
+        return img
+
+    def _read_video(self):
+        import cv2
+        self._video_info = {}
+        cap = cv2.VideoCapture(self.file_path)
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self._video_info = {
+                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'fps': cap.get(cv2.CAP_PROP_FPS),
+                'frame_count': total_frames,
+            }
+            if total_frames > 0:
+                # Tomar frame al 25% del video
+                target_frame = min(int(total_frames * 0.25), total_frames - 1)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+            ret, frame = cap.read()
+            self._video_frame = frame if ret else None
+        finally:
+            cap.release()
@@ -1,42 +1,83 @@
 import os
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Tuple, Any, cast
+from typing import Dict, Optional, Tuple, Any, cast
 from PIL import Image
-import cv2
-import exifread
 from datetime import datetime
-import torch
 import shutil
 import numpy as np
-from app.core.config import settings
+from app.core.config import CLIP_AI_MODELS, settings
+from app.core.errors import ModelUnavailableException
+from app.core.metrics import metrics
+from app.services.media_context import MediaContext
+from app.services.event_labels import CLIP_EVENT_LABELS, CLIP_EVENT_TEXTS, YOLO_TO_CLIP_EVENT, clip_event_label
+from app.services.clip_text_embeddings import clip_text_cache, encode_texts
+from app.services.inference_scheduler import BatchScheduler
+from app.services import clip_backends
+from app.services.clip_preprocess import ClipPreprocessor
+from app.services.yolo_postprocess import UNKNOWN_EVENT, YoloEventScorer
+from app.services.classification_cache import classification_cache
+from app.services.yolo_models import COCO_NAMES_URL, KNOWN_YOLO_VARIANTS, discover_yolo_bundles, yolo_bundle, yolo_input_size
+from app.services.model_pool import ModelPool, ModelPoolTimeout, torch_module_bytes
+from app.services.model_artifacts import (
+    download_artifact, ensure_download_allowed, load_pretrained, read_mmap, require_artifact
+)
 
-# Importación condicional de pyheif
-HEIC_SUPPORT = False
-pyheif: Any = None  # Usar Any para evitar advertencias
+YOLO_MS_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+CASCADE_MARGIN_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
 
-try:
-    import pyheif as pyheif_module
-    pyheif = pyheif_module
-    if hasattr(pyheif, 'read'):
-        HEIC_SUPPORT = True
-        print("pyheif está instalado y funcionando. El soporte para archivos HEIC/HEIF está disponible.")
-except ImportError as e:
-    print(f"pyheif no está disponible: {str(e)}. El soporte para archivos HEIC/HEIF no estará disponible.")
+# torch, cv2, exifread y pyheif se importan dentro de las etapas que los usan: importar
+# este módulo (y con él app.main) no carga ningún backend de inferencia ni de vídeo
 
 class MediaProcessor:
-    def __init__(self):
-        self.clip_model = None
+    def __init__(self, use_inference_server: Optional[bool] = None):
+        # Con servidor de inferencia este proceso solo preprocesa; las redes se ejecutan allí
+        if use_inference_server is None:
+            use_inference_server = bool(settings.INFERENCE_SERVER_ADDRESS)
+        self.use_inference_server = use_inference_server
         self.clip_processor = None
-        self.opencv_dnn_model = None
+        self.clip_preprocessor: Optional[ClipPreprocessor] = None
         self.opencv_classes = None
+        self.yolo_scorer: Optional[YoloEventScorer] = None
+        self._load_lock = threading.Lock()
+        # Réplicas prestadas en exclusiva: ni cargas duplicadas ni forward concurrente sobre una red
+        # (con tamaño residente estimado para el presupuesto de memoria; se descargan si no se usan)
+        self.clip_pool = ModelPool("clip", self._create_clip_replica,
+                                   settings.CLIP_POOL_REPLICAS, settings.MODEL_POOL_TIMEOUT,
+                                   size_fn=torch_module_bytes)
+        # Un pool por variante de YOLO, creado con su primer uso
+        self.yolo_pools: Dict[str, ModelPool] = {}
+        # Codificadores de imagen optimizados (clip_onnx, clip_int8); el texto sigue en clip_pool
+        self.clip_vision_pools = {
+            "clip_onnx": ModelPool("clip_onnx", clip_backends.create_onnx_encoder,
+                                   settings.CLIP_POOL_REPLICAS, settings.MODEL_POOL_TIMEOUT,
+                                   size_fn=clip_backends.encoder_bytes),
+            "clip_int8": ModelPool("clip_int8", clip_backends.create_int8_encoder,
+                                   settings.CLIP_POOL_REPLICAS, settings.MODEL_POOL_TIMEOUT,
+                                   size_fn=clip_backends.encoder_bytes),
+        }
+        self.clip_scheduler = BatchScheduler(
+            self._clip_image_features_batch,
+            max_batch_size=settings.CLIP_BATCH_MAX_SIZE,
+            max_wait_ms=settings.CLIP_BATCH_MAX_WAIT_MS,
+            name="clip",
+            # Un lote en curso por réplica: con CLIP_POOL_REPLICAS > 1 las réplicas trabajan a la vez
+            max_concurrency=settings.CLIP_POOL_REPLICAS
+        )
 
-    def create_thumbnail(self, file_path: str, mime_type: str) -> Optional[str]:
+    def open_context(self, file_path: str, mime_type: str) -> MediaContext:
+        """Crea el contexto decodificado que comparten todas las etapas para un archivo."""
+        return MediaContext(file_path, mime_type)
+
+    def create_thumbnail(self, file_path: str, mime_type: str, context: Optional[MediaContext] = None) -> Optional[str]:
         try:
+            context = context or self.open_context(file_path, mime_type)
             # Crear la miniatura según el tipo de archivo
             if mime_type.startswith('image/'):
-                thumbnail_path = self._create_image_thumbnail(file_path)
+                thumbnail_path = self._create_image_thumbnail(file_path, context)
             elif mime_type.startswith('video/'):
-                thumbnail_path = self._create_video_thumbnail(file_path)
+                thumbnail_path = self._create_video_thumbnail(file_path, context)
             else:
                 return None
             return thumbnail_path
@@ -44,7 +85,7 @@ class MediaProcessor:
             print(f"Error en create_thumbnail: {e}")
             return None
 
-    def _create_image_thumbnail(self, file_path: str) -> Optional[str]:
+    def _create_image_thumbnail(self, file_path: str, context: MediaContext) -> Optional[str]:
         try:
             # Obtener la ruta de la miniatura según la estrategia configurada
             thumbnail_absolute_path, thumbnail_web_path = self._get_thumbnail_path(file_path)
@@ -54,59 +95,12 @@ class MediaProcessor:
                 print(f"La miniatura ya existe en: {thumbnail_absolute_path}")
                 return thumbnail_web_path
             
-            # Procesar la imagen según su formato
-            if file_path.lower().endswith(('.heic', '.heif')):
-                if not HEIC_SUPPORT:
-                    print(f"No se puede procesar archivo HEIC/HEIF {file_path}: pyheif no está instalado")
-                    return None
-                
-                try:
-                    print(f"Procesando archivo HEIC/HEIF: {file_path}")
-                    heif_file = pyheif.read(file_path)
-                    img = Image.frombytes(
-                        heif_file.mode, 
-                        heif_file.size, 
-                        heif_file.data,
-                        "raw", 
-                        heif_file.mode, 
-                        heif_file.stride,
-                    )
-                except Exception as e:
-                    print(f"Error al procesar archivo HEIC/HEIF {file_path}: {e}")
-                    return None
-            else:
-                # Para otros formatos de imagen
-                img = Image.open(file_path)
-            
-            # Manejar orientación EXIF
+            # El contexto ya entrega la imagen en RGB, reducida y con la orientación EXIF aplicada
             try:
-                if hasattr(img, '_getexif') and img._getexif() is not None:
-                    exif = dict(img._getexif().items())
-                    if orientation := exif.get(0x0112):  # Orientation tag
-                        if orientation == 2:
-                            img = img.transpose(Image.FLIP_LEFT_RIGHT)
-                        elif orientation == 3:
-                            img = img.transpose(Image.ROTATE_180)
-                        elif orientation == 4:
-                            img = img.transpose(Image.FLIP_TOP_BOTTOM)
-                        elif orientation == 5:
-                            img = img.transpose(Image.FLIP_LEFT_RIGHT).transpose(Image.ROTATE_90)
-                        elif orientation == 6:
-                            img = img.transpose(Image.ROTATE_270)
-                        elif orientation == 7:
-                            img = img.transpose(Image.FLIP_LEFT_RIGHT).transpose(Image.ROTATE_270)
-                        elif orientation == 8:
-                            img = img.transpose(Image.ROTATE_90)
+                img = context.image.copy()
             except Exception as e:
-                print(f"Warning: Error handling EXIF orientation: {e}")
-            
-            # Convertir a RGB si es necesario
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
+                print(f"Error al decodificar la imagen {file_path}: {e}")
+                return None
             
             # Crear miniatura
             img.thumbnail(settings.THUMBNAIL_SIZE)
@@ -126,7 +120,7 @@ class MediaProcessor:
             print(f"Error creating image thumbnail: {e}")
             return None
 
-    def _create_video_thumbnail(self, file_path: str) -> Optional[str]:
+    def _create_video_thumbnail(self, file_path: str, context: MediaContext) -> Optional[str]:
         try:
             # Obtener la ruta de la miniatura según la estrategia configurada
             thumbnail_absolute_path, thumbnail_web_path = self._get_thumbnail_path(file_path)
@@ -136,18 +130,10 @@ class MediaProcessor:
                 print(f"La miniatura de video ya existe en: {thumbnail_absolute_path}")
                 return thumbnail_web_path
             
-            cap = cv2.VideoCapture(str(file_path))
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            # Fotograma al 25% del video, leído una sola vez por el contexto
+            frame = context.video_frame
             
-            if total_frames > 0:
-                # Tomar frame al 25% del video
-                target_frame = min(int(total_frames * 0.25), total_frames - 1)
-                cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-            
-            ret, frame = cap.read()
-            cap.release()
-            
-            if ret:
+            if frame is not None:
                 # Redimensionar manteniendo proporción
                 height, width = frame.shape[:2]
                 max_size = max(settings.THUMBNAIL_SIZE)
@@ -159,6 +145,7 @@ class MediaProcessor:
                     new_height = max_size
                     new_width = int(width * (max_size / height))
                 
+                import cv2
                 frame = cv2.resize(frame, (new_width, new_height))
                 frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 
@@ -205,119 +192,225 @@ class MediaProcessor:
         
         return absolute_path, web_path
 
-    def _load_clip_model(self):
-        if self.clip_model is None:
-            from transformers import CLIPProcessor, CLIPModel
-            self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-            self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+    @property
+    def inference_client(self):
+        """Cliente del servidor de inferencia, o None si los modelos se ejecutan en este proceso."""
+        if not self.use_inference_server:
+            return None
+        from app.services.inference_server import get_inference_client
+        return get_inference_client()
+
+    def _load_clip_model(self, variant: Optional[str] = None):
+        """Carga el preprocesador de CLIP y, en modo local, la primera réplica del codificador de ``variant``."""
+        with self._load_lock:
+            if self.clip_processor is None:
+                from transformers import CLIPProcessor
+                self.clip_processor = load_pretrained(CLIPProcessor)
+                self.clip_preprocessor = ClipPreprocessor.from_image_processor(self.clip_processor.image_processor)
+        # Con servidor de inferencia el modelo vive allí: aquí solo se preprocesa
+        if not self.use_inference_server:
+            self.clip_image_pool(variant).warm(1)
+
+    def clip_image_pool(self, variant: Optional[str] = None) -> ModelPool:
+        """Pool del codificador de imagen de ``variant`` (por defecto, el AI_MODEL activo)."""
+        return self.clip_vision_pools.get(variant or settings.AI_MODEL, self.clip_pool)
+
+    def _create_clip_replica(self):
+        from transformers import CLIPModel
+        model = load_pretrained(CLIPModel)
+        model.eval()
+        return model
+
+    def preprocess_clip_images(self, images):
+        """Tensor ``pixel_values`` (N, 3, H, W) de CLIP para ``images``."""
+        if settings.CLIP_FAST_PREPROCESS and self.clip_preprocessor is not None:
+            return self.clip_preprocessor(images)
+        assert self.clip_processor is not None, "CLIP no está cargado"
+        return self.clip_processor(images=list(images), return_tensors="pt")["pixel_values"]
+
+    def encode_clip_texts(self, texts) -> np.ndarray:
+        """Embeddings de texto normalizados con el modelo CLIP configurado (sin caché)."""
+        client = self.inference_client
+        if client is not None:
+            return client.run("clip_text", texts=list(texts))
+        self._load_clip_model("clip")
+        with self.clip_pool.lease() as clip_model:
+            return encode_texts(clip_model, self.clip_processor, texts)
+
+    def clip_text_features(self, texts) -> np.ndarray:
+        """Matriz de embeddings de texto normalizados, servida desde la caché cuando es posible."""
+        return clip_text_cache.get(settings.CLIP_MODEL_NAME, texts, self.encode_clip_texts)
+
+    def _clip_image_features_batch(self, items: list) -> list:
+        """
+        Ejecuta el codificador de imagen de CLIP sobre un lote.
+
+        Args:
+            items: Lista de pares (variante, tensor (1, 3, H, W) ya preprocesado);
+                un cambio de AI_MODEL puede dejar variantes mezcladas en el mismo lote
+
+        Returns:
+            list: Un embedding normalizado (tensor 1D) por elemento
+        """
+        import torch
+        groups: dict = {}
+        for index, (variant, _) in enumerate(items):
+            groups.setdefault(variant, []).append(index)
+        results: list = [None] * len(items)
+        for variant, indices in groups.items():
+            batch = torch.cat([items[i][1] for i in indices], dim=0)
+            for i, features in zip(indices, self._encode_clip_images(variant, batch)):
+                results[i] = features
+        return results
+
+    def _encode_clip_images(self, variant: str, batch):
+        """Embeddings normalizados (N, D) de ``batch`` con el codificador de ``variant``."""
+        import torch
+        client = self.inference_client
+        if client is not None:
+            # El lote viaja por memoria compartida y vuelve ya normalizado
+            return torch.from_numpy(client.run("clip_image", batch.numpy(), variant=variant))
+        pool = self.clip_image_pool(variant)
+        if pool is not self.clip_pool:
+            with pool.lease() as encoder:
+                return encoder(batch)
+        with self.clip_pool.lease() as clip_model, torch.no_grad():
+            image_features = clip_model.get_image_features(pixel_values=batch)
+        return image_features / image_features.norm(dim=-1, keepdim=True)
+    
+    @property
+    def yolo_pool(self) -> ModelPool:
+        """Pool de la variante de YOLO configurada (``YOLO_VARIANT``)."""
+        return self.yolo_variant_pool(settings.YOLO_VARIANT)
+
+    def yolo_variant_pool(self, variant: str) -> ModelPool:
+        with self._load_lock:
+            pool = self.yolo_pools.get(variant)
+            if pool is None:
+                pool = ModelPool(variant, lambda: self._create_yolo_replica(variant),
+                                 settings.YOLO_POOL_REPLICAS, settings.MODEL_POOL_TIMEOUT,
+                                 size_fn=lambda _: self._opencv_dnn_paths(variant)[1].stat().st_size)
+                self.yolo_pools[variant] = pool
+            return pool
+
+    def _opencv_dnn_paths(self, variant: Optional[str] = None) -> Tuple[Path, Path, Path]:
+        """Rutas (cfg, weights, names) de la variante de YOLO, descargándola si es conocida y falta algún archivo."""
+        bundle = yolo_bundle(variant or settings.YOLO_VARIANT)
+        bundle.config_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Si los archivos no existen, los descargamos
+        if not bundle.complete:
+            if bundle.variant not in KNOWN_YOLO_VARIANTS:
+                available = ", ".join(discover_yolo_bundles()) or "ninguna"
+                raise ModelUnavailableException(
+                    f"Variante de YOLO '{bundle.variant}' no encontrada en {bundle.config_path.parent} "
+                    f"(disponibles: {available})"
+                )
+            ensure_download_allowed(f"El modelo YOLO '{bundle.variant}'")
+            print(f"Descargando modelo {bundle.variant} para OpenCV DNN...")
+            self._download_opencv_dnn_model(bundle.config_path, bundle.weights_path, bundle.classes_path,
+                                            bundle.variant)
+        return bundle.config_path, bundle.weights_path, bundle.classes_path
+
+    def _load_opencv_dnn_model(self, variant: Optional[str] = None):
+        """Carga las clases de COCO y, en modo local, la primera réplica de la red YOLO ``variant``."""
+        with self._load_lock:
+            if not self.opencv_classes:
+                client = self.inference_client
+                if client is not None:
+                    # Solo los nombres de las clases; la red vive en el servidor de inferencia
+                    self.opencv_classes = client.run("yolo_classes")
+                    self.yolo_scorer = YoloEventScorer(self.opencv_classes)
+                    return
+                try:
+                    _, _, classes_path = self._opencv_dnn_paths(variant)
+                    print(f"Cargando clases desde {classes_path}...")
+                    with open(require_artifact(classes_path), 'r') as f:
+                        self.opencv_classes = [line.strip() for line in f.readlines()]
+                    print(f"Cargadas {len(self.opencv_classes)} clases")
+                    self.yolo_scorer = YoloEventScorer(self.opencv_classes)
+                except Exception as e:
+                    print(f"Error al cargar el modelo OpenCV DNN: {e}")
+                    self.opencv_classes = []
+                    raise
+        if not self.use_inference_server:
+            self.yolo_variant_pool(variant or settings.YOLO_VARIANT).warm(1)
+
+    def _loaded_yolo_scorer(self) -> YoloEventScorer:
+        # Lo crea _load_opencv_dnn_model, al que llama _yolo_detections
+        assert self.yolo_scorer is not None, "YOLO no está cargado"
+        return self.yolo_scorer
+
+    def _create_yolo_replica(self, variant: Optional[str] = None) -> Tuple[Any, Any]:
+        """Carga una red YOLO independiente; devuelve (red, nombres de las capas de salida)."""
+        import cv2
+        config_path, weights_path, _ = self._opencv_dnn_paths(variant)
+        print(f"Cargando modelo YOLO desde {weights_path}...")
+        # Pesos leídos desde un mapa de memoria (caché de páginas, sin copia intermedia en Python)
+        config_data = np.fromfile(require_artifact(config_path), dtype=np.uint8)
+        net = cv2.dnn.readNetFromDarknet(config_data, read_mmap(weights_path))
+        
+        # Seleccionar backend preferido para mejor rendimiento
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        
+        # Verificar si el modelo se cargó correctamente
+        if net.empty():
+            raise ValueError("No se pudo cargar el modelo YOLO")
+        print("Modelo YOLO cargado exitosamente")
+        return net, net.getUnconnectedOutLayersNames()
+
+    def _yolo_forward(self, blob: np.ndarray, variant: Optional[str] = None) -> list:
+        """Salidas de todas las capas de YOLO para ``blob``, con una réplica en exclusiva de ``variant``."""
+        variant = variant or settings.YOLO_VARIANT
+        with self.yolo_variant_pool(variant).lease() as (net, output_layers):
+            started = time.monotonic()
+            net.setInput(blob)
+            outputs = list(net.forward(output_layers))
+        # Latencia por variante y tamaño de entrada, para elegir el punto velocidad/precisión
+        metrics.histogram(f"yolo.{variant}.{blob.shape[2]}.forward_ms", YOLO_MS_BUCKETS, "ms").observe(
+            (time.monotonic() - started) * 1000)
+        return outputs
     
-    def _load_opencv_dnn_model(self):
-        if self.opencv_dnn_model is None:
+    def _download_opencv_dnn_model(self, config_path, weights_path, classes_path, variant: str = "yolov4"):
+        """Descarga los archivos que falten del modelo YOLO (falla al momento con MODEL_OFFLINE)"""
+        downloads = [
+            (KNOWN_YOLO_VARIANTS[variant]["cfg"], config_path, 30),
+            # Archivo grande, puede tardar varios minutos
+            (KNOWN_YOLO_VARIANTS[variant]["weights"], weights_path, 300),
+            (COCO_NAMES_URL, classes_path, 30),
+        ]
+        for url, path, timeout in downloads:
+            if path.exists():
+                continue
+            print(f"Descargando {path.name} desde {url}")
             try:
-                # Rutas para el modelo YOLO
-                model_dir = settings.STORAGE_DIR / "models" / "opencv_dnn"
-                model_dir.mkdir(parents=True, exist_ok=True)
-                
-                # Rutas de los archivos del modelo YOLO
-                config_path = model_dir / "yolov4.cfg"
-                weights_path = model_dir / "yolov4.weights"
-                classes_path = model_dir / "coco.names"
-                
-                # Si los archivos no existen, los descargamos
-                if not config_path.exists() or not weights_path.exists() or not classes_path.exists():
-                    print("Descargando modelo YOLO para OpenCV DNN...")
-                    self._download_opencv_dnn_model(config_path, weights_path, classes_path)
-                
-                # Cargar el modelo YOLO
-                print(f"Cargando modelo YOLO desde {weights_path}...")
-                self.opencv_dnn_model = cv2.dnn.readNetFromDarknet(str(config_path), str(weights_path))
-                
-                # Seleccionar backend preferido para mejor rendimiento
-                self.opencv_dnn_model.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-                self.opencv_dnn_model.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-                
-                # Verificar si el modelo se cargó correctamente
-                if self.opencv_dnn_model.empty():
-                    raise ValueError("No se pudo cargar el modelo YOLO")
-                    
-                print("Modelo YOLO cargado exitosamente")
-                
-                # Cargar las clases de COCO
-                print(f"Cargando clases desde {classes_path}...")
-                with open(classes_path, 'r') as f:
-                    self.opencv_classes = [line.strip() for line in f.readlines()]
-                print(f"Cargadas {len(self.opencv_classes)} clases")
-                
-                # Agregar la configuración para las capas de salida de YOLO
-                self.yolo_output_layers = self.opencv_dnn_model.getUnconnectedOutLayersNames()
-                
+                download_artifact(url, path, timeout)
             except Exception as e:
-                print(f"Error al cargar el modelo OpenCV DNN: {e}")
-                # Inicializar con valores vacíos en caso de error
-                self.opencv_dnn_model = None
-                self.opencv_classes = []
-                self.yolo_output_layers = []
+                print(f"Error al descargar archivos del modelo: {e}")
                 raise
     
-    def _download_opencv_dnn_model(self, config_path, weights_path, classes_path):
-        """Descarga los archivos necesarios para el modelo YOLO"""
-        import requests
-        import os
-        
-        # URLs de los archivos del modelo YOLO
-        config_url = "https://raw.githubusercontent.com/AlexeyAB/darknet/master/cfg/yolov4.cfg"
-        weights_url = "https://github.com/AlexeyAB/darknet/releases/download/darknet_yolo_v3_optimal/yolov4.weights"
-        classes_url = "https://raw.githubusercontent.com/AlexeyAB/darknet/master/data/coco.names"
-        
-        print(f"Descargando archivo de configuración desde {config_url}")
-        try:
-            # Descargar el archivo de configuración
-            with open(config_path, 'wb') as f:
-                response = requests.get(config_url, timeout=30)
-                response.raise_for_status()
-                f.write(response.content)
-            print(f"Archivo de configuración guardado en {config_path}")
-            
-            # Descargar el archivo de pesos (archivo grande, puede tardar)
-            print(f"Descargando pesos del modelo desde {weights_url} (esto puede tardar varios minutos)...")
-            with open(weights_path, 'wb') as f:
-                response = requests.get(weights_url, timeout=300)  # tiempo de espera más largo para archivos grandes
-                response.raise_for_status()
-                f.write(response.content)
-            print(f"Archivo de pesos guardado en {weights_path}, tamaño: {os.path.getsize(weights_path)/1024/1024:.2f} MB")
-            
-            # Descargar el archivo de clases
-            print(f"Descargando archivo de clases desde {classes_url}")
-            with open(classes_path, 'wb') as f:
-                response = requests.get(classes_url, timeout=30)
-                response.raise_for_status()
-                f.write(response.content)
-            print(f"Archivo de clases guardado en {classes_path}")
-        except Exception as e:
-            print(f"Error al descargar archivos del modelo: {e}")
-            raise
-    
-    def extract_metadata(self, file_path: str, mime_type: str) -> dict:
+    def extract_metadata(self, file_path: str, mime_type: str, context: Optional[MediaContext] = None) -> dict:
         metadata = {}
+        context = context or self.open_context(file_path, mime_type)
         
         if mime_type.startswith('image/'):
-            img_metadata = self._extract_image_metadata(file_path)
+            img_metadata = self._extract_image_metadata(file_path, context)
             metadata.update(img_metadata)
         elif mime_type.startswith('video/'):
-            video_metadata = self._extract_video_metadata(file_path)
+            video_metadata = self._extract_video_metadata(file_path, context)
             metadata.update(video_metadata)
         
         return metadata
     
-    def _extract_image_metadata(self, file_path: str) -> dict:
+    def _extract_image_metadata(self, file_path: str, context: MediaContext) -> dict:
         metadata = {}
         try:
-            with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f)
+            tags = context.exif_tags
                 
-            # Dimensiones
-            with Image.open(file_path) as img:
-                metadata['width'], metadata['height'] = img.size
+            # Dimensiones del original (leídas de la cabecera, sin volver a decodificar)
+            if context.original_size:
+                metadata['width'], metadata['height'] = context.original_size
             
             # GPS
             if 'GPS GPSLatitude' in tags and 'GPS GPSLongitude' in tags:
@@ -343,22 +436,20 @@ class MediaProcessor:
         
         return metadata
     
-    def _extract_video_metadata(self, file_path: str) -> dict:
+    def _extract_video_metadata(self, file_path: str, context: MediaContext) -> dict:
         metadata = {}
         try:
-            cap = cv2.VideoCapture(file_path)
+            info = context.video_info
             
             # Dimensiones
-            metadata['width'] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            metadata['height'] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            metadata['width'] = info['width']
+            metadata['height'] = info['height']
             
             # Duración
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = info['fps']
+            frame_count = info['frame_count']
             metadata['duration'] = frame_count / fps if fps > 0 else None
             
-            cap.release()
-            
         except Exception as e:
             print(f"Error extracting video metadata: {e}")
         
@@ -371,303 +462,204 @@ class MediaProcessor:
         s = float(values[2].num) / float(values[2].den)
         return d + (m / 60.0) + (s / 3600.0)
 
-    def predict_event(self, file_path: str) -> Tuple[str, float]:
+    def predict_event(self, file_path: str, context: Optional[MediaContext] = None,
+                      content_hash: Optional[str] = None, need_embedding: bool = False) -> Tuple[str, float]:
         """
         Predice el tipo de evento en una imagen usando el modelo seleccionado.
+
+        Con ``content_hash`` el resultado se busca primero en la caché de clasificación
+        (clave: hash, modelo y versión de etiquetas) y se guarda allí tras calcularlo.
+        ``need_embedding`` descarta los aciertos de CLIP, que no traen el embedding.
         """
         try:
+            context = context or self.open_context(file_path, "image/*")
+            cache_key = classification_cache.key(content_hash) if content_hash and classification_cache.enabled else None
+            if cache_key is not None:
+                cached = classification_cache.get(cache_key)
+                clip_ran = cached is not None and (cached.classified_by in CLIP_AI_MODELS
+                                                   or cached.classified_by == "cascade:clip")
+                if cached is not None and not (need_embedding and clip_ran):
+                    context.classified_by = cached.classified_by
+                    context.event_scores = cached.scores
+                    return cached.event_type, cached.confidence
+            
+            # La cascada anota la etapa que decidió; el resto de modelos, su nombre
+            context.classified_by = settings.AI_MODEL
             # Usar el modelo seleccionado en la configuración
             if settings.AI_MODEL == "opencv_dnn":
-                return self._predict_event_opencv_dnn(file_path)
+                result = self._predict_event_opencv_dnn(file_path, context)
             elif settings.AI_MODEL == "opencv_yolo":
-                return self._predict_event_opencv_dnn(file_path)  # Usamos el mismo método ya que ahora carga YOLO
-            else:  # Modelo por defecto: CLIP
-                return self._predict_event_clip(file_path)
+                result = self._predict_event_opencv_dnn(file_path, context)  # Usamos el mismo método ya que ahora carga YOLO
+            elif settings.AI_MODEL == "cascade":
+                result = self._predict_event_cascade(file_path, context)
+            else:  # Modelo por defecto: CLIP (fp32, ONNX o int8)
+                result = self._predict_event_clip(file_path, context)
+            
+            # "unknown" es el resultado de un error: no se guarda
+            if cache_key is not None and result[0] != "unknown":
+                classification_cache.put(cache_key, result[0], result[1], context.classified_by, context.event_scores)
+            return result
+        except ModelPoolTimeout:
+            # Saturación, no un fallo del archivo: el trabajo de ingesta se reintentará
+            raise
         except Exception as e:
             print(f"Error al predecir evento: {e}")
             return "unknown", 0.0
     
-    def _predict_event_clip(self, file_path: str) -> Tuple[str, float]:
+    def _predict_event_clip(self, file_path: str, context: MediaContext, variant: Optional[str] = None) -> Tuple[str, float]:
         """
-        Predice el tipo de evento en una imagen usando CLIP.
+        Predice el tipo de evento en una imagen usando CLIP (``variant``: clip, clip_onnx o clip_int8).
         """
         try:
-            self._load_clip_model()
-            
-            # Cargar y preprocesar la imagen
-            image = Image.open(file_path)
-            inputs = self.clip_processor(images=image, return_tensors="pt", padding=True)
-            
-            # Lista de eventos para clasificar (en inglés para el modelo CLIP)
-            event_texts = [
-                "a sports event or game",
-                "a conference or meeting",
-                "a party or celebration",
-                "a concert or musical performance",
-                "a wedding ceremony",
-                "a graduation ceremony",
-                "a protest or demonstration",
-                "a religious ceremony",
-                "a parade or festival",
-                "an exhibition or art show",
-                "a family gathering",
-                "a food event or dining",
-                "an outdoor activity or adventure",
-                "a business event",
-                "an educational event"
-            ]
-            
-            # Mapeo de eventos en inglés a español
-            event_translation = {
-                "sports event or game": "evento deportivo",
-                "conference or meeting": "conferencia",
-                "party or celebration": "fiesta",
-                "concert or musical performance": "concierto",
-                "wedding ceremony": "boda",
-                "graduation ceremony": "graduación",
-                "protest or demonstration": "protesta",
-                "religious ceremony": "ceremonia religiosa",
-                "parade or festival": "festival",
-                "exhibition or art show": "exhibición",
-                "family gathering": "reunión familiar",
-                "food event or dining": "evento gastronómico",
-                "outdoor activity or adventure": "actividad al aire libre",
-                "business event": "evento de negocios",
-                "educational event": "evento educativo"
-            }
-            
-            # Preprocesar textos
-            text_inputs = self.clip_processor(
-                text=event_texts,
-                return_tensors="pt",
-                padding=True
-            )
+            import torch
+            if variant is None:
+                variant = settings.AI_MODEL if settings.AI_MODEL in CLIP_AI_MODELS else "clip"
+            self._load_clip_model(variant)
+            
+            # Preprocesar la imagen ya decodificada (a resolución reducida) por el contexto
+            pixel_values = self.preprocess_clip_images([context.image])
             
-            # Obtener embeddings de imagen y texto
-            with torch.no_grad():
-                image_features = self.clip_model.get_image_features(**inputs)
-                text_features = self.clip_model.get_text_features(**text_inputs)
+            # Embeddings de texto de los eventos: calculados una vez por modelo y conjunto de etiquetas
+            text_features = torch.from_numpy(self.clip_text_features(CLIP_EVENT_TEXTS))
             
-            # Normalizar features
-            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+            # Embedding normalizado de la imagen, agrupado en lotes con otras peticiones concurrentes
+            image_features = self.clip_scheduler.run((variant, pixel_values))
+            # Conservar el embedding para el almacén persistente
+            context.clip_embedding = image_features.cpu().numpy().astype(np.float32)
             
             # Calcular similaridad
             similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
+            context.event_scores = similarity.cpu().numpy().astype(np.float32)
             
-            # Obtener el evento más probable y su confianza
-            values, indices = similarity[0].topk(1)
-            english_event = event_texts[indices[0]].replace("a ", "").replace("an ", "")
+            # Obtener el evento más probable y su confianza (traducido al español)
+            values, indices = similarity.topk(1)
+            event_type = clip_event_label(CLIP_EVENT_TEXTS[indices[0]])
             confidence = float(values[0])
             
-            # Traducir el evento al español
-            event_type = event_translation.get(english_event, english_event)
-            
             return event_type, confidence
             
+        except ModelPoolTimeout:
+            # Saturación, no un fallo del archivo: el trabajo de ingesta se reintentará
+            raise
         except Exception as e:
             print(f"Error predicting event with CLIP: {e}")
             return "unknown", 0.0
             
-    def _predict_event_opencv_dnn(self, file_path: str) -> Tuple[str, float]:
+    def _predict_event_cascade(self, file_path: str, context: MediaContext,
+                               record_metrics: bool = True) -> Tuple[str, float]:
         """
-        Predice el tipo de evento en una imagen usando OpenCV DNN con YOLO.
+        Clasificación en cascada: YOLO ligero (``CASCADE_YOLO_VARIANT``) primero y CLIP
+        (``CASCADE_CLIP_VARIANT``) solo cuando el margen relativo entre los dos mejores
+        eventos no llega a ``CASCADE_MARGIN_THRESHOLD`` o el evento no existe en el
+        vocabulario de CLIP. La etapa que decide queda en ``context.classified_by``
+        (``cascade:yolo`` o ``cascade:clip``) y en los contadores ``cascade.decided.*``.
+        Las imágenes que decide YOLO no tienen embedding CLIP. El calentamiento pasa
+        ``record_metrics=False`` para no sesgar las métricas con la imagen sintética.
         """
         try:
-            self._load_opencv_dnn_model()
-            
-            # Cargar la imagen
-            img = cv2.imread(file_path)
-            if img is None:
-                raise ValueError(f"No se pudo cargar la imagen desde {file_path}")
-            
-            # Obtener las dimensiones de la imagen
-            height, width = img.shape[:2]
-            
-            # Preprocesar la imagen para YOLO (transformar a blob)
-            # YOLO espera un blob 416x416 con valores entre [0,1] y canales BGR
-            blob = cv2.dnn.blobFromImage(
-                img, 
-                1/255.0,  # Factor de escala para normalizar píxeles a [0,1]
-                (416, 416),  # Tamaño de entrada para YOLO
-                swapRB=False,  # OpenCV ya usa BGR, YOLO también espera BGR
-                crop=False
+            class_ids, confidences = self._yolo_detections(
+                file_path, context, settings.CASCADE_YOLO_VARIANT, settings.CASCADE_YOLO_INPUT_SIZE
             )
+            scorer = self._loaded_yolo_scorer()
+            scores = scorer.event_scores(class_ids, confidences)
+            event_type, score, margin = scorer.best_event(scores, confidences)
+            event_type = YOLO_TO_CLIP_EVENT.get(event_type, event_type)
+            context.event_scores = scores
+        except ModelPoolTimeout:
+            raise
+        except Exception as e:
+            # Sin primera etapa la imagen no se pierde: la decide CLIP
+            print(f"Error en la etapa YOLO de la cascada: {e}")
+            event_type, score, margin = UNKNOWN_EVENT, 0.0, 0.0
+        # Distribución de márgenes para ajustar el umbral
+        if record_metrics:
+            metrics.histogram("cascade.margin", CASCADE_MARGIN_BUCKETS).observe(margin)
+        
+        if event_type in CLIP_EVENT_LABELS and margin >= settings.CASCADE_MARGIN_THRESHOLD:
+            stage = "yolo"
+            print(f"Cascada: '{event_type}' decidido por YOLO (margen {margin:.2f})")
+        else:
+            stage = "clip"
+            print(f"Cascada: YOLO no concluyente ('{event_type}', margen {margin:.2f}), se usa CLIP")
+            event_type, score = self._predict_event_clip(file_path, context, variant=settings.CASCADE_CLIP_VARIANT)
+        if record_metrics:
+            metrics.counter(f"cascade.decided.{stage}").inc()
+        context.classified_by = f"cascade:{stage}"
+        return event_type, score
+            
+    def _predict_event_opencv_dnn(self, file_path: str, context: MediaContext) -> Tuple[str, float]:
+        """
+        Predice el tipo de evento en una imagen usando OpenCV DNN con YOLO.
+        """
+        try:
+            class_ids, confidences = self._yolo_detections(file_path, context)
             
-            # Pasar la imagen por la red
-            self.opencv_dnn_model.setInput(blob)
-            
-            # Obtener las predicciones de todas las capas de salida de YOLO
-            # Esto contendrá información sobre los objetos detectados
-            outputs = self.opencv_dnn_model.forward(self.yolo_output_layers)
-            
-            # Listas para almacenar los resultados
-            detected_objects = []
-            confidences = []
-            class_ids = []
-            
-            # Umbral de confianza para las detecciones
-            conf_threshold = 0.5
-            
-            # Procesar cada salida
-            for output in outputs:
-                # Cada fila es una detección
-                for detection in output:
-                    # Los primeros 4 valores son x, y, w, h (centro y dimensiones del bounding box)
-                    # Resto de valores son las confianzas para cada clase
-                    scores = detection[5:]
-                    class_id = np.argmax(scores)
-                    confidence = scores[class_id]
-                    
-                    if confidence > conf_threshold:
-                        detected_objects.append(self.opencv_classes[class_id])
-                        confidences.append(float(confidence))
-                        class_ids.append(class_id)
-            
-            # Mostrar los objetos detectados con su confianza
-            print(f"Objetos detectados ({len(detected_objects)}):")
-            for i, obj in enumerate(detected_objects):
-                print(f"  - {obj}: {confidences[i]:.4f}")
-            
-            # Mapeo mejorado de objetos detectados por YOLO a eventos
-            event_categories = {
-                # Categorías deportivas
-                "evento deportivo": {
-                    "objects": ["sports ball", "baseball bat", "baseball glove", "tennis racket", 
-                               "soccer ball", "football", "basketball", "baseball", "frisbee", 
-                               "skis", "snowboard", "sports ball", "kite", "baseball bat", 
-                               "baseball glove", "skateboard", "surfboard", "tennis racket"],
-                    "weight": 1.2
-                },
-                
-                # Categorías de conferencias/eventos educativos
-                "conferencia": {
-                    "objects": ["laptop", "tv", "book", "cell phone", "keyboard", "mouse",
-                               "microphone", "projector", "presentation", "whiteboard"],
-                    "weight": 1.0
-                },
-                
-                # Celebraciones y fiestas
-                "fiesta": {
-                    "objects": ["wine glass", "cup", "cake", "bottle", "balloon",
-                               "wine glass", "fork", "knife", "spoon", "bowl", "chair"],
-                    "weight": 1.1
-                },
-                
-                # Conciertos y eventos musicales
-                "concierto": {
-                    "objects": ["microphone", "chair", "person", "cell phone", "tv", "speaker"],
-                    "weight": 1.15
-                },
-                
-                # Bodas y ceremonias matrimoniales
-                "boda": {
-                    "objects": ["person", "tie", "dress", "suit", "cake", "wine glass", 
-                               "chair", "dining table", "flower", "candle"],
-                    "weight": 1.3
-                },
-                
-                # Graduaciones
-                "graduación": {
-                    "objects": ["person", "book", "chair", "tie", "gown", "hat"],
-                    "weight": 1.25
-                },
-                
-                # Protestas y manifestaciones
-                "protesta": {
-                    "objects": ["person", "sign", "banner", "flag", "backpack"],
-                    "weight": 1.0
-                },
-                
-                # Ceremonias religiosas
-                "ceremonia religiosa": {
-                    "objects": ["person", "book", "chair", "vase", "candle"],
-                    "weight": 1.0
-                },
-                
-                # Desfiles y festivales
-                "desfile o festival": {
-                    "objects": ["person", "flag", "umbrella", "balloon", "backpack", "handbag"],
-                    "weight": 1.0
-                },
-                
-                # Eventos gastronómicos
-                "evento gastronómico": {
-                    "objects": ["dining table", "bottle", "wine glass", "cup", "fork", "knife", 
-                               "spoon", "bowl", "banana", "apple", "sandwich", "orange", "broccoli", 
-                               "carrot", "hot dog", "pizza", "donut", "cake", "chair", "food"],
-                    "weight": 1.0
-                },
-                
-                # Actividades al aire libre
-                "actividad al aire libre": {
-                    "objects": ["bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", 
-                               "boat", "bird", "cat", "dog", "horse", "sheep", "cow", "backpack", 
-                               "umbrella", "handbag", "suitcase", "frisbee", "skis", "snowboard",
-                               "kite", "skateboard", "surfboard", "tennis racket", "bottle", "tree", 
-                               "mountain", "beach", "lake", "river"],
-                    "weight": 1.0
-                },
-                
-                # Reuniones familiares
-                "reunión familiar": {
-                    "objects": ["person", "chair", "couch", "potted plant", "dining table", "tv", 
-                               "laptop", "cell phone", "book", "clock", "vase"],
-                    "weight": 1.0
-                },
-                
-                # Grupo general de personas
-                "evento social": {
-                    "objects": ["person"],
-                    "weight": 0.8  # Menor peso ya que personas aparecen en muchos eventos
-                }
-            }
-            
-            # Sistema de puntuación para determinar el evento
-            event_scores = {event: 0.0 for event in event_categories.keys()}
-            
-            # Analizar cada objeto detectado y acumular puntuaciones
-            for obj, confidence in zip(detected_objects, confidences):
-                # Comprobar cada categoría de evento
-                for event, data in event_categories.items():
-                    if obj in data["objects"]:
-                        # Sumar puntuación ponderada si hay coincidencia
-                        event_scores[event] += confidence * data["weight"]
-                        print(f"  - Coincidencia '{obj}' para evento '{event}', score+={confidence * data['weight']:.4f}")
-            
-            # Factor de peso para eventos con múltiples objetos relevantes detectados
-            # Esto favorece escenas con varios objetos de la misma categoría
-            for event in event_scores:
-                # Contar objetos únicos detectados para este evento
-                unique_objects = set()
-                for obj in detected_objects:
-                    if obj in event_categories[event]["objects"]:
-                        unique_objects.add(obj)
-                
-                # Aplicar multiplicador basado en la cantidad de objetos únicos
-                if len(unique_objects) > 1:
-                    multiplier = 1.0 + (min(len(unique_objects), 5) - 1) * 0.15  # Cap at +60% boost
-                    event_scores[event] *= multiplier
-                    print(f"  - Bonus para '{event}' por {len(unique_objects)} objetos únicos: x{multiplier:.2f}")
-            
-            # Encontrar el evento con mayor puntuación
-            best_event = max(event_scores.items(), key=lambda x: x[1]) if event_scores else ("unknown", 0.0)
-            event_type, score = best_event
-            
-            # Si no hay suficiente puntuación, es un evento desconocido
-            if score <= 0.3:
+            # Puntuación de eventos: matriz clase x evento precalculada y bonificación por objetos únicos
+            scorer = self._loaded_yolo_scorer()
+            context.event_scores = scorer.event_scores(class_ids, confidences)
+            event_type, score, _ = scorer.best_event(context.event_scores, confidences)
+            if event_type == UNKNOWN_EVENT:
                 print("Puntuación baja, clasificando como evento desconocido")
-                return "evento desconocido", max(confidences) if confidences else 0.0
-                
-            print(f"Evento clasificado como '{event_type}' con puntuación {score:.4f}")
+            else:
+                print(f"Evento clasificado como '{event_type}' con puntuación {score:.4f}")
             return event_type, score
             
+        except ModelPoolTimeout:
+            # Saturación, no un fallo del archivo: el trabajo de ingesta se reintentará
+            raise
         except Exception as e:
             print(f"Error predicting event with OpenCV DNN YOLO: {e}")
             import traceback
             traceback.print_exc()
             return "unknown", 0.0
     
+    def _yolo_detections(self, file_path: str, context: MediaContext, variant: Optional[str] = None,
+                         input_size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Detecciones (class_ids, confidences) de YOLO ``variant`` con entrada ``input_size``
+        (por defecto ``YOLO_VARIANT`` y ``YOLO_INPUT_SIZE``), tras el filtrado y la supresión de no máximos.
+        """
+        import cv2
+        variant = variant or settings.YOLO_VARIANT
+        self._load_opencv_dnn_model(variant)
+        
+        # Imagen BGR ya decodificada (y reducida) por el contexto
+        img = context.image_bgr
+        if img is None:
+            raise ValueError(f"No se pudo cargar la imagen desde {file_path}")
+        
+        # Obtener las dimensiones de la imagen
+        height, width = img.shape[:2]
+        
+        # Preprocesar la imagen para YOLO (transformar a blob)
+        # YOLO espera un blob cuadrado (YOLO_INPUT_SIZE, múltiplo de 32) con valores entre [0,1] y canales BGR
+        size = yolo_input_size(input_size)
+        blob = cv2.dnn.blobFromImage(
+            img, 
+            1/255.0,  # Factor de escala para normalizar píxeles a [0,1]
+            (size, size),  # Tamaño de entrada para YOLO
+            swapRB=False,  # OpenCV ya usa BGR, YOLO también espera BGR
+            crop=False
+        )
+        
+        # Obtener las predicciones de todas las capas de salida de YOLO
+        # Esto contendrá información sobre los objetos detectados
+        client = self.inference_client
+        if client is not None:
+            # El servidor devuelve solo las filas que superan el umbral
+            outputs = [client.run("yolo", blob, min_score=settings.YOLO_CONF_THRESHOLD,
+                                  variant=variant)]
+        else:
+            outputs = self._yolo_forward(blob, variant)
+        
+        # Filtrado por confianza y supresión de no máximos, vectorizados
+        scorer = self._loaded_yolo_scorer()
+        class_ids, confidences = scorer.detect(
+            outputs, width, height, settings.YOLO_CONF_THRESHOLD, settings.YOLO_NMS_THRESHOLD
+        )
+        print(f"Objetos detectados ({len(class_ids)}): {', '.join(scorer.describe(class_ids, confidences))}")
+        return class_ids, confidences
+    
     def create_processed_copy(self, original_file_path: str, creation_date: Optional[datetime] = None, event_type: Optional[str] = None) -> Optional[str]:
         """
         Crea una copia del archivo original con un nuevo nombre basado en la fecha y tipo de evento
@@ -737,3 +729,14 @@ class MediaProcessor:
         except Exception as e:
             print(f"Error al crear copia procesada: {e}")
             return None
+
+_processor: Optional[MediaProcessor] = None
+_processor_lock = threading.Lock()
+
+def get_media_processor() -> MediaProcessor:
+    """Procesador compartido por los routers y la cola de ingesta del proceso."""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = MediaProcessor()
+        return _processor
@@ -0,0 +1,176 @@
+"""
+Análisis de medios en un pool de procesos.
+
+Las etapas de ingesta (decodificación y reducción con PIL, EXIF, ``forward`` de
+``cv2.dnn``/CLIP) son CPU intensivas y, ejecutadas en los hilos de la cola,
+compiten por el GIL con el servidor. Con ``MEDIA_PROCESS_WORKERS > 0`` esas
+etapas se ejecutan en procesos separados:
+
+- cada proceso crea su propio ``MediaProcessor`` una sola vez (en el
+  inicializador) y conserva sus modelos cargados entre trabajos;
+- el proceso recibe solo la ruta del archivo y devuelve un ``dict`` pequeño
+  (ruta de la miniatura ya escrita, metadatos, evento, confianza y el embedding
+  de 512 floats), nunca la imagen decodificada.
+
+El hilo de ingesta solo espera el resultado y aplica los campos en la base de datos.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, cast
+
+import numpy as np
+
+from app.core.config import AI_MODELS, CLIP_AI_MODELS, AIModelName, settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+ProgressCallback = Callable[[str, float], None]
+
+# Ajustes que el proceso padre puede haber cambiado en tiempo de ejecución y
+# que los trabajadores (iniciados con "spawn") deben copiar
+WORKER_SETTINGS = (
+    "AI_MODEL",
+    "CLIP_MODEL_NAME",
+    "STORAGE_DIR",
+    "THUMBNAILS_DIR",
+    "THUMBNAIL_SIZE",
+    "MEDIA_DECODE_MAX_SIDE",
+)
+
+TASK_MS_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def analyze_media(processor, file_path: str, content_type: str,
+                  report: Optional[ProgressCallback] = None, content_hash: Optional[str] = None,
+                  need_embedding: bool = False) -> Dict[str, Any]:
+    """
+    Ejecuta miniatura, metadatos y clasificación sobre un único contexto decodificado.
+
+    ``content_hash`` y ``need_embedding`` se pasan a ``predict_event`` (caché de clasificación).
+
+    Returns:
+        dict: ``thumbnail_path``, ``metadata``, ``event_type``, ``event_confidence``,
+        ``classified_by`` y ``embedding`` (None si no aplica)
+    """
+    report = report or (lambda stage, progress: None)
+    analysis: Dict[str, Any] = {
+        "thumbnail_path": None,
+        "metadata": {},
+        "event_type": None,
+        "event_confidence": None,
+        "classified_by": None,
+        "embedding": None,
+    }
+    with processor.open_context(file_path, content_type) as context:
+        report("thumbnail", 0.1)
+        thumbnail_path = processor.create_thumbnail(file_path, content_type, context=context)
+        if thumbnail_path:
+            # Normalizar la ruta web en caso de que no siga el formato /thumbnails/...
+            if not str(thumbnail_path).startswith('/thumbnails/'):
+                thumbnail_path = f"/thumbnails/{Path(str(thumbnail_path)).name}"
+            analysis["thumbnail_path"] = thumbnail_path
+
+        report("metadata", 0.4)
+        analysis["metadata"] = processor.extract_metadata(file_path, content_type, context=context)
+
+        if content_type.startswith('image/'):
+            report("classification", 0.6)
+            event_type, confidence = processor.predict_event(file_path, context=context, content_hash=content_hash,
+                                                             need_embedding=need_embedding)
+            analysis["event_type"] = event_type
+            analysis["event_confidence"] = confidence
+            analysis["classified_by"] = context.classified_by
+            analysis["embedding"] = context.clip_embedding
+    return analysis
+
+# Estado de cada proceso trabajador
+_worker_processor = None
+
+def _init_worker(overrides: Dict[str, Any]):
+    """Inicializador del proceso: aplica los ajustes del padre y crea su procesador."""
+    global _worker_processor
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    # Un proceso atiende un trabajo cada vez: no hay peticiones que agrupar
+    settings.CLIP_BATCH_MAX_SIZE = 1
+    from app.services.media_processor import MediaProcessor
+    _worker_processor = MediaProcessor()
+    try:
+        if settings.AI_MODEL in CLIP_AI_MODELS:
+            _worker_processor._load_clip_model(settings.AI_MODEL)
+        elif settings.AI_MODEL == "cascade":
+            _worker_processor._load_opencv_dnn_model(settings.CASCADE_YOLO_VARIANT)
+            _worker_processor._load_clip_model(settings.CASCADE_CLIP_VARIANT)
+        else:
+            _worker_processor._load_opencv_dnn_model()
+    except Exception as e:
+        # Se reintentará de forma perezosa en el primer trabajo
+        logger.warning(f"Trabajador de medios sin modelo precargado: {e}")
+
+def _analyze_in_worker(file_path: str, content_type: str, ai_model: str,
+                       content_hash: Optional[str], need_embedding: bool) -> Dict[str, Any]:
+    if ai_model not in AI_MODELS:
+        raise ValueError(f"Modelo de IA no válido: {ai_model}")
+    settings.AI_MODEL = cast(AIModelName, ai_model)
+    analysis = analyze_media(_worker_processor, file_path, content_type,
+                             content_hash=content_hash, need_embedding=need_embedding)
+    if analysis["embedding"] is not None:
+        analysis["embedding"] = np.asarray(analysis["embedding"], dtype=np.float32)
+    return analysis
+
+class MediaProcessPool:
+    """
+    Pool de procesos que ejecuta ``analyze_media``.
+
+    Los procesos se crean con "spawn" (el padre tiene hilos y, posiblemente,
+    torch inicializado) la primera vez que se envía un trabajo.
+
+    Args:
+        max_workers: Número de procesos
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, int(max_workers))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.task_histogram = metrics.histogram("media_pool.task_ms", TASK_MS_BUCKETS, "ms")
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                overrides = {name: getattr(settings, name) for name in WORKER_SETTINGS}
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(overrides,)
+                )
+                logger.info(f"Pool de procesos de medios iniciado con {self.max_workers} procesos")
+            return self._executor
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+
+    def analyze(self, file_path: str, content_type: str,
+                report: Optional[ProgressCallback] = None, content_hash: Optional[str] = None,
+                need_embedding: bool = False) -> Dict[str, Any]:
+        """Analiza un archivo en un proceso del pool y espera el resultado."""
+        if report:
+            report("analysis", 0.1)
+        started = time.monotonic()
+        future = self.start().submit(_analyze_in_worker, str(file_path), content_type, settings.AI_MODEL,
+                                     content_hash, need_embedding)
+        analysis = future.result()
+        self.task_histogram.observe((time.monotonic() - started) * 1000)
+        return analysis
+
+def create_media_process_pool() -> Optional[MediaProcessPool]:
+    """Pool configurado por ``MEDIA_PROCESS_WORKERS`` (None si está desactivado)."""
+    if settings.MEDIA_PROCESS_WORKERS <= 0:
+        return None
+    return MediaProcessPool(settings.MEDIA_PROCESS_WORKERS)
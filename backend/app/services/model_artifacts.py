@@ -0,0 +1,235 @@
+"""
+Artefactos de modelos: manifiesto con SHA-256, modo sin red y carga mapeada en memoria.
+
+Los pesos de YOLO (~250 MB) se descargaban de GitHub con la primera petición y
+CLIP se bajaba del hub de HuggingFace a ``TRANSFORMERS_CACHE``. En nodos sin
+salida a internet eso fallaba tras varios minutos de espera. Ahora:
+
+- ``scripts/model_artifacts.py bundle`` descarga (o exporta) los modelos por
+  adelantado a ``storage/models`` y escribe ``manifest.json`` con la ruta, el
+  tamaño, el SHA-256 y el origen de cada archivo; ``verify`` comprueba los hashes
+  y ``--archive`` empaqueta el directorio para copiarlo a los nodos.
+- Con ``MODEL_OFFLINE=true`` nunca se descarga nada: CLIP se carga solo desde
+  ``storage/models/clip/<modelo>`` o la caché local, y un archivo ausente o cuyo
+  tamaño no coincide con el manifiesto lanza ``ModelUnavailableException`` al
+  momento (``MODEL_VERIFY_CHECKSUMS`` añade el SHA-256 en la primera carga).
+- Los pesos se leen mapeados en memoria: CLIP se guarda en safetensors (que
+  transformers mapea) y los pesos de YOLO se pasan a OpenCV desde un
+  ``np.memmap``, así que un reinicio los sirve desde la caché de páginas.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.errors import ModelUnavailableException
+from app.core.logger import logger
+
+MANIFEST_NAME = "manifest.json"
+HASH_CHUNK_BYTES = 16 * 1024 * 1024
+
+def models_dir() -> Path:
+    return settings.STORAGE_DIR / "models"
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 de un archivo leído por bloques desde un mapa de memoria."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(0, len(view), HASH_CHUNK_BYTES):
+                    digest.update(view[start:start + HASH_CHUNK_BYTES])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+class ModelManifest:
+    """
+    Manifiesto ``manifest.json`` de un directorio de modelos.
+
+    Args:
+        root: Directorio de modelos (por defecto ``storage/models``)
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or models_dir()
+        self.path = self.root / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self._artifacts: Optional[Dict[str, Dict[str, Any]]] = None
+        self._verified: Dict[str, Tuple[float, int]] = {}  # ruta -> (mtime, tamaño) con hash ya comprobado
+
+    @property
+    def artifacts(self) -> Dict[str, Dict[str, Any]]:
+        if self._artifacts is None:
+            self._artifacts = self._load()
+        return self._artifacts
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f).get("artifacts", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifiesto de modelos ilegible ({self.path}): {e}")
+            return {}
+
+    def reload(self):
+        with self._lock:
+            self._artifacts = None
+            self._verified.clear()
+
+    def key(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def add(self, path: Path, source: Optional[str] = None) -> Dict[str, Any]:
+        """Registra (o actualiza) ``path`` con su tamaño y SHA-256."""
+        entry = {"size": path.stat().st_size, "sha256": sha256_file(path), "source": source}
+        with self._lock:
+            self.artifacts[self.key(path)] = entry
+        return entry
+
+    def add_tree(self, directory: Path, source: Optional[str] = None) -> int:
+        """Registra todos los archivos de ``directory``."""
+        files = [p for p in sorted(directory.rglob("*")) if p.is_file()]
+        for path in files:
+            self.add(path, source)
+        return len(files)
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        payload = {"version": 1, "created_at": time.time(), "artifacts": dict(sorted(self.artifacts.items()))}
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, indent=2)
+        tmp_path.replace(self.path)
+
+    def check(self, path: Path, full: Optional[bool] = None) -> Optional[str]:
+        """
+        Comprueba ``path`` contra el manifiesto.
+
+        Args:
+            full: Verificar también el SHA-256 (por defecto ``MODEL_VERIFY_CHECKSUMS``);
+                cada archivo se hashea una sola vez mientras no cambie
+
+        Returns:
+            Optional[str]: Descripción del problema, o None si es correcto (o no está en el manifiesto)
+        """
+        full = settings.MODEL_VERIFY_CHECKSUMS if full is None else full
+        key = self.key(path)
+        entry = self.artifacts.get(key)
+        if not path.exists():
+            return f"{key}: no existe"
+        if entry is None:
+            return None
+        stat = path.stat()
+        if stat.st_size != entry["size"]:
+            return f"{key}: tamaño {stat.st_size} distinto del manifiesto ({entry['size']})"
+        if full and self._verified.get(key) != (stat.st_mtime, stat.st_size):
+            if sha256_file(path) != entry["sha256"]:
+                return f"{key}: SHA-256 distinto del manifiesto"
+            self._verified[key] = (stat.st_mtime, stat.st_size)
+        return None
+
+    def verify(self, full: bool = True) -> List[str]:
+        """Problemas de todos los artefactos del manifiesto (vacío = todo correcto)."""
+        return [problem for problem in (self.check(self.root / key, full) for key in sorted(self.artifacts))
+                if problem is not None]
+
+_manifest: Optional[ModelManifest] = None
+
+def get_manifest() -> ModelManifest:
+    global _manifest
+    if _manifest is None or _manifest.root != models_dir():
+        _manifest = ModelManifest()
+    return _manifest
+
+def require_artifact(path: Path) -> Path:
+    """
+    Devuelve ``path`` si existe y concuerda con el manifiesto.
+
+    Raises:
+        ModelUnavailableException: Si falta o no supera la verificación
+    """
+    problem = get_manifest().check(path)
+    if problem is not None:
+        raise ModelUnavailableException(
+            f"Artefacto de modelo no válido: {problem}",
+            detail={"path": str(path), "hint": "scripts/model_artifacts.py bundle / verify"}
+        )
+    return path
+
+def ensure_download_allowed(what: str):
+    """Con ``MODEL_OFFLINE`` falla al momento en lugar de intentar descargar ``what``."""
+    if settings.MODEL_OFFLINE:
+        raise ModelUnavailableException(
+            f"{what} no está en {models_dir()} y MODEL_OFFLINE impide descargarlo",
+            detail={"hint": "Prepare los modelos con scripts/model_artifacts.py bundle"}
+        )
+
+def download_artifact(url: str, path: Path, timeout: float = 60.0) -> Path:
+    """Descarga ``url`` a ``path`` por bloques (archivo temporal y rename: nunca queda a medias)."""
+    import requests
+
+    ensure_download_allowed(path.name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f, requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    logger.info(f"Descargado {url} -> {path} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+    return path
+
+def read_mmap(path: Path) -> np.ndarray:
+    """Contenido de ``path`` como array uint8 mapeado en memoria (solo lectura)."""
+    return np.memmap(require_artifact(path), dtype=np.uint8, mode="r")
+
+def clip_bundle_dir(model_name: Optional[str] = None) -> Path:
+    """Directorio donde ``bundle`` guarda el modelo CLIP (safetensors + procesador)."""
+    slug = re.sub(r'[^a-zA-Z0-9._-]', '_', model_name or settings.CLIP_MODEL_NAME)
+    return models_dir() / "clip" / slug
+
+def load_pretrained(cls, model_name: Optional[str] = None, **kwargs):
+    """
+    ``cls.from_pretrained`` desde el paquete local si existe; si no, desde el hub
+    (o solo la caché local con ``MODEL_OFFLINE``).
+
+    Raises:
+        ModelUnavailableException: Si con ``MODEL_OFFLINE`` el modelo no está disponible localmente
+    """
+    model_name = model_name or settings.CLIP_MODEL_NAME
+    bundle = clip_bundle_dir(model_name)
+    if (bundle / "config.json").exists():
+        manifest = get_manifest()
+        for path in sorted(bundle.iterdir()):
+            if manifest.key(path) in manifest.artifacts:
+                require_artifact(path)
+        return cls.from_pretrained(str(bundle), local_files_only=True, **kwargs)
+    try:
+        return cls.from_pretrained(model_name, local_files_only=settings.MODEL_OFFLINE, **kwargs)
+    except OSError as e:
+        if settings.MODEL_OFFLINE:
+            raise ModelUnavailableException(
+                f"{model_name} no está en {bundle} ni en la caché local y MODEL_OFFLINE impide descargarlo",
+                detail={"hint": "Prepare los modelos con scripts/model_artifacts.py bundle"}
+            ) from e
+        raise
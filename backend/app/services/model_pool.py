@@ -0,0 +1,338 @@
+"""
+Pool de réplicas de modelos con concurrencia acotada.
+
+``MediaProcessor`` comprobaba ``self.clip_model is None`` sin cerrojo, así que
+varias primeras peticiones simultáneas cargaban el modelo varias veces, y la
+misma ``cv2.dnn_Net`` se usaba desde varios hilos (``setInput``/``forward`` no
+son seguros en paralelo). ``ModelPool`` mantiene hasta ``replicas`` instancias
+de un modelo:
+
+- las réplicas se crean bajo demanda, una sola vez cada una;
+- cada llamante toma una réplica en exclusiva (``lease``) y la devuelve al salir;
+- si todas están ocupadas espera en cola hasta ``timeout`` y después lanza
+  ``ModelPoolTimeout``;
+- ``stats()`` informa de réplicas cargadas, ocupadas, en espera y utilización.
+
+Además, todas las réplicas del proceso comparten un presupuesto de memoria
+(``MODEL_MEMORY_BUDGET_MB``): cada pool conoce el tamaño residente de sus
+réplicas y ``enforce_memory_budget`` descarta las que llevan más de
+``MODEL_IDLE_TTL_SECONDS`` sin usarse y, si aún se supera el presupuesto, las
+de los pools usados hace más tiempo (LRU). Se vuelven a cargar bajo demanda.
+"""
+import ctypes
+import gc
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+WAIT_MS_BUCKETS = (0.1, 1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+# Pools vivos del proceso, para el endpoint de métricas
+_pools: "weakref.WeakSet[ModelPool]" = weakref.WeakSet()
+
+class ModelPoolTimeout(TimeoutError):
+    """No quedó libre ninguna réplica dentro del tiempo de espera."""
+
+class ModelPool:
+    """
+    Réplicas de un modelo prestadas en exclusiva a cada llamante.
+
+    Args:
+        name: Nombre del backend (prefijo de las métricas)
+        factory: Función que carga y devuelve una réplica nueva
+        replicas: Número máximo de réplicas
+        timeout: Espera máxima por defecto de ``acquire``, en segundos
+        size_fn: Estima los bytes residentes de una réplica (None = no se contabiliza)
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], replicas: int = 1, timeout: Optional[float] = None,
+                 size_fn: Optional[Callable[[Any], int]] = None):
+        self.name = name
+        self.factory = factory
+        self.size_fn = size_fn
+        self.max_replicas = max(1, int(replicas))
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle: List[Any] = []
+        self._created = 0  # incluye las réplicas que se están cargando
+        self._in_use = 0
+        self._waiting = 0
+        self._leases = 0
+        self._timeouts = 0
+        self._busy_seconds = 0.0
+        self._since: Optional[float] = None
+        self._sizes: Dict[int, int] = {}  # id(réplica) -> bytes residentes
+        self._evictions = 0
+        self.last_used = time.monotonic()
+        self.wait_histogram = metrics.histogram(f"model_pool.{name}.wait_ms", WAIT_MS_BUCKETS, "ms")
+        _pools.add(self)
+
+    @property
+    def size(self) -> int:
+        """Réplicas cargadas o en carga."""
+        return self._created
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @property
+    def idle_replicas(self) -> int:
+        return len(self._idle)
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        Toma una réplica libre, cargando una nueva si aún no se alcanzó el máximo.
+
+        Raises:
+            ModelPoolTimeout: Si todas las réplicas siguen ocupadas tras ``timeout``
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        create = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    replica = self._idle.pop()
+                    break
+                if self._created < self.max_replicas:
+                    self._created += 1
+                    create = True
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._timeouts += 1
+                    raise ModelPoolTimeout(
+                        f"Ninguna réplica de '{self.name}' quedó libre en {timeout}s "
+                        f"({self.max_replicas} réplicas ocupadas)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            self._leases += 1
+
+        if create:
+            # La carga se hace fuera del cerrojo; el hueco ya está reservado
+            try:
+                load_started = time.monotonic()
+                replica = self.factory()
+                size = int(self.size_fn(replica)) if self.size_fn else 0
+                with self._cond:
+                    self._sizes[id(replica)] = size
+                logger.info(f"Réplica {self._created}/{self.max_replicas} de '{self.name}' cargada "
+                            f"en {time.monotonic() - load_started:.1f}s ({size / 1024 / 1024:.0f} MB)")
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            # Hacer sitio descargando réplicas libres de otros modelos
+            enforce_memory_budget(exclude=self)
+        self.wait_histogram.observe((time.monotonic() - started) * 1000)
+        return replica
+
+    def release(self, replica: Any, busy_seconds: float = 0.0):
+        """Devuelve una réplica al pool."""
+        with self._cond:
+            self._idle.append(replica)
+            self._in_use -= 1
+            self._busy_seconds += busy_seconds
+            self.last_used = time.monotonic()
+            if self._since is None:
+                self._since = time.monotonic() - busy_seconds
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Presta una réplica durante el bloque ``with``."""
+        replica = self.acquire(timeout)
+        started = time.monotonic()
+        try:
+            yield replica
+        finally:
+            self.release(replica, time.monotonic() - started)
+
+    def warm(self, count: int = 1):
+        """Carga réplicas hasta tener al menos ``count`` (sin superar el máximo)."""
+        replicas = []
+        try:
+            while self._created < min(count, self.max_replicas):
+                replicas.append(self.acquire())
+        finally:
+            for replica in replicas:
+                self.release(replica)
+
+    def clear(self) -> int:
+        """Descarta las réplicas libres (las prestadas se conservan). Devuelve cuántas se liberaron."""
+        with self._cond:
+            dropped = len(self._idle)
+            for replica in self._idle:
+                self._sizes.pop(id(replica), None)
+            self._idle.clear()
+            self._created -= dropped
+            self._evictions += dropped
+            self._cond.notify_all()
+        return dropped
+
+    def stats(self) -> dict:
+        with self._cond:
+            elapsed = time.monotonic() - self._since if self._since is not None else 0.0
+            capacity = elapsed * max(self._created, 1)
+            return {
+                "name": self.name,
+                "max_replicas": self.max_replicas,
+                "loaded": self._created,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "leases": self._leases,
+                "timeouts": self._timeouts,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "resident_mb": round(sum(self._sizes.values()) / 1024 / 1024, 1),
+                "idle_seconds": round(time.monotonic() - self.last_used, 1),
+                "evictions": self._evictions,
+                "utilization": round(min(self._busy_seconds / capacity, 1.0), 4) if capacity > 0 else 0.0,
+            }
+
+def pool_stats() -> List[dict]:
+    """Estado de todos los pools de modelos del proceso."""
+    return sorted((pool.stats() for pool in list(_pools)), key=lambda s: s["name"])
+
+def torch_module_bytes(model: Any) -> int:
+    """Bytes de los parámetros y buffers de un ``torch.nn.Module``."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def torch_state_bytes(model: Any) -> int:
+    """Bytes del ``state_dict``; a diferencia de ``parameters()`` incluye los pesos empaquetados int8."""
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in (value if isinstance(value, tuple) else (value,)):
+            if hasattr(tensor, "element_size"):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+def process_rss_bytes() -> Optional[int]:
+    """Memoria residente actual del proceso (Linux), o None si no se puede leer."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _release_memory():
+    """Devuelve al sistema la memoria de los modelos descartados."""
+    gc.collect()
+    try:
+        # glibc conserva los bloques liberados en sus arenas; malloc_trim los devuelve
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def enforce_memory_budget(
+    budget_bytes: Optional[int] = None,
+    idle_ttl: Optional[float] = None,
+    exclude: Optional[ModelPool] = None,
+    pools: Optional[Iterable[ModelPool]] = None
+) -> int:
+    """
+    Descarta réplicas libres: primero las inactivas más de ``idle_ttl`` segundos y
+    después, mientras el total supere ``budget_bytes``, las del pool usado hace
+    más tiempo. ``exclude`` (el pool que acaba de cargar) no se toca por presupuesto.
+
+    Returns:
+        int: Réplicas descartadas
+    """
+    budget_bytes = settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024 if budget_bytes is None else budget_bytes
+    idle_ttl = settings.MODEL_IDLE_TTL_SECONDS if idle_ttl is None else idle_ttl
+    pools = list(_pools if pools is None else pools)
+    now = time.monotonic()
+    dropped = 0
+
+    if idle_ttl > 0:
+        for pool in pools:
+            if pool.idle_replicas and now - pool.last_used > idle_ttl:
+                freed = pool.resident_bytes
+                count = pool.clear()
+                if count:
+                    dropped += count
+                    logger.info(f"Modelo '{pool.name}' descargado tras {now - pool.last_used:.0f}s sin uso "
+                                f"({count} réplicas, {freed / 1024 / 1024:.0f} MB)")
+
+    if budget_bytes > 0:
+        candidates = sorted((p for p in pools if p is not exclude), key=lambda p: p.last_used)
+        for pool in candidates:
+            total = sum(p.resident_bytes for p in pools)
+            if total <= budget_bytes:
+                break
+            count = pool.clear()
+            if count:
+                dropped += count
+                logger.info(f"Modelo '{pool.name}' descargado por presupuesto de memoria "
+                            f"({total / 1024 / 1024:.0f} MB > {budget_bytes / 1024 / 1024:.0f} MB)")
+        total = sum(p.resident_bytes for p in pools)
+        if total > budget_bytes:
+            logger.warning(f"Los modelos en uso ocupan {total / 1024 / 1024:.0f} MB, "
+                           f"por encima del presupuesto de {budget_bytes / 1024 / 1024:.0f} MB")
+
+    if dropped:
+        _release_memory()
+    return dropped
+
+class ModelMemorySweeper:
+    """
+    Hilo que aplica periódicamente ``enforce_memory_budget`` (descarga por inactividad)
+    y las tareas de mantenimiento registradas con ``add_task``.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        if interval is None:
+            ttl = settings.MODEL_IDLE_TTL_SECONDS
+            # Revisar varias veces por TTL, sin bajar de 5s ni pasar de un minuto
+            interval = max(5.0, min(ttl / 4, 60.0)) if ttl > 0 else 60.0
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: Dict[str, Callable[[], Any]] = {}
+
+    def add_task(self, name: str, task: Callable[[], Any]):
+        """
+        Ejecuta ``task`` en cada pasada del hilo; sus errores se registran sin detenerlo.
+        Registrar otra tarea con el mismo nombre la sustituye.
+        """
+        self._tasks[name] = task
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-memory", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                enforce_memory_budget()
+            except Exception as e:
+                logger.error(f"Error aplicando el presupuesto de memoria de modelos: {e}")
+            for name, task in list(self._tasks.items()):
+                try:
+                    task()
+                except Exception as e:
+                    logger.error(f"Error en la tarea de mantenimiento '{name}': {e}")
+
+model_memory_sweeper = ModelMemorySweeper()
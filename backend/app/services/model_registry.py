@@ -0,0 +1,188 @@
+"""
+Registro de modelos con precarga, calentamiento y estado de disponibilidad.
+
+La primera subida tras un despliegue pagaba la carga completa de CLIP
+(``from_pretrained``) o de YOLO y además la primera inferencia (inicialización
+de kernels y del asignador de memoria). ``ModelRegistry`` carga en segundo
+plano los backends de ``settings.AI_MODEL`` al arrancar, ejecuta
+``MODEL_WARMUP_RUNS`` inferencias sobre una imagen sintética y guarda el estado
+de cada modelo, que se publica en ``GET /ready``: el balanceador (o el
+healthcheck) solo envía tráfico cuando la latencia ya es la de régimen.
+"""
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.media_context import MediaContext
+from app.services.media_processor import get_media_processor
+
+MODEL_PENDING = "pending"
+MODEL_LOADING = "loading"
+MODEL_WARMING = "warming"
+MODEL_READY = "ready"
+MODEL_FAILED = "failed"
+
+# Backends que necesita cada valor de AI_MODEL
+AI_MODEL_BACKENDS: Dict[str, Tuple[str, ...]] = {
+    "clip": ("clip",),
+    "clip_onnx": ("clip_onnx",),
+    "clip_int8": ("clip_int8",),
+    "opencv_dnn": ("yolo",),
+    "opencv_yolo": ("yolo",),
+    "cascade": ("cascade",),
+}
+
+@dataclass
+class ModelStatus:
+    name: str
+    state: str = MODEL_PENDING
+    load_seconds: Optional[float] = None
+    first_inference_ms: Optional[float] = None
+    warm_inference_ms: Optional[float] = None
+    error: Optional[str] = None
+    updated_at: Optional[float] = None
+
+def synthetic_image(width: int = 640, height: int = 480) -> Image.Image:
+    """Imagen RGB determinista con gradientes y ruido (ejercita todo el preprocesado)."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                       rng.uniform(0, 255, (height, width))], axis=-1)
+    return Image.fromarray(pixels.astype(np.uint8), "RGB")
+
+class ModelRegistry:
+    """
+    Estado de carga de los modelos de un ``MediaProcessor``.
+
+    Args:
+        processor: Procesador cuyos modelos se precargan
+        warmup_runs: Inferencias de calentamiento por modelo
+    """
+
+    def __init__(self, processor, warmup_runs: Optional[int] = None):
+        self.processor = processor
+        self.warmup_runs = settings.MODEL_WARMUP_RUNS if warmup_runs is None else warmup_runs
+        self._models: Dict[str, ModelStatus] = {}
+        self._lock = threading.Lock()
+        self._backends: Dict[str, Tuple[Callable[[], None], Callable[[MediaContext], None]]] = {
+            "clip": self._clip_backend("clip"),
+            "clip_onnx": self._clip_backend("clip_onnx"),
+            "clip_int8": self._clip_backend("clip_int8"),
+            "yolo": (self._load_yolo, lambda context: processor._predict_event_opencv_dnn(context.file_path, context)),
+            # Las dos etapas; la imagen sintética no tiene objetos, así que el calentamiento llega a CLIP
+            "cascade": (self._load_cascade, lambda context: processor._predict_event_cascade(
+                context.file_path, context, record_metrics=False)),
+        }
+
+    def preload(self, ai_model: Optional[str] = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Carga y calienta los backends de ``ai_model`` (por defecto, el configurado).
+        Los que ya están listos o cargándose se omiten.
+        """
+        names = []
+        with self._lock:
+            for name in AI_MODEL_BACKENDS.get(ai_model or settings.AI_MODEL, ()):
+                current = self._models.get(name)
+                if current is not None and current.state not in (MODEL_PENDING, MODEL_FAILED):
+                    continue
+                self._models[name] = ModelStatus(name, MODEL_LOADING, updated_at=time.time())
+                names.append(name)
+        if not names:
+            return None
+        if not background:
+            self._preload(names)
+            return None
+        thread = threading.Thread(target=self._preload, args=(names,), name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self, ai_model: Optional[str] = None) -> dict:
+        """Estado de cada modelo y si los del ``AI_MODEL`` activo están listos."""
+        ai_model = ai_model or settings.AI_MODEL
+        with self._lock:
+            models = {name: asdict(status) for name, status in self._models.items()}
+        required = AI_MODEL_BACKENDS.get(ai_model, ())
+        for name in required:
+            models.setdefault(name, asdict(ModelStatus(name)))
+        ready = all(models[name]["state"] == MODEL_READY for name in required)
+        return {
+            # Sin precarga los modelos se cargan con la primera petición: no hay nada que esperar
+            "ready": ready or not settings.MODEL_PRELOAD,
+            "ai_model": ai_model,
+            "models": models,
+        }
+
+    def _preload(self, names: List[str]):
+        image = synthetic_image()
+        for name in names:
+            load, infer = self._backends[name]
+            try:
+                started = time.monotonic()
+                load()
+                self._update(name, state=MODEL_WARMING, load_seconds=round(time.monotonic() - started, 3))
+                timings = []
+                for _ in range(self.warmup_runs):
+                    with MediaContext.from_image(image, "<calentamiento>") as context:
+                        started = time.monotonic()
+                        infer(context)
+                        timings.append(round((time.monotonic() - started) * 1000, 1))
+                self._update(
+                    name,
+                    state=MODEL_READY,
+                    first_inference_ms=timings[0] if timings else None,
+                    warm_inference_ms=timings[-1] if timings else None
+                )
+                logger.info(f"Modelo '{name}' listo: carga {self._models[name].load_seconds}s, "
+                            f"inferencias de calentamiento {timings} ms")
+            except Exception as e:
+                logger.error(f"No se pudo precargar el modelo '{name}': {e}")
+                self._update(name, state=MODEL_FAILED, error=str(e))
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            status = self._models[name]
+            for key, value in fields.items():
+                setattr(status, key, value)
+            status.updated_at = time.time()
+
+    def _clip_backend(self, variant: str) -> Tuple[Callable[[], None], Callable[[MediaContext], None]]:
+        def load():
+            self.processor._load_clip_model(variant)
+            if not self.processor.use_inference_server:
+                pool = self.processor.clip_image_pool(variant)
+                pool.warm(pool.max_replicas)
+
+        def infer(context: MediaContext):
+            self.processor._predict_event_clip(context.file_path, context, variant=variant)
+
+        return load, infer
+
+    def _load_cascade(self):
+        self.processor._load_opencv_dnn_model(settings.CASCADE_YOLO_VARIANT)
+        self._clip_backend(settings.CASCADE_CLIP_VARIANT)[0]()
+        if not self.processor.use_inference_server:
+            pool = self.processor.yolo_variant_pool(settings.CASCADE_YOLO_VARIANT)
+            pool.warm(pool.max_replicas)
+
+    def _load_yolo(self):
+        self.processor._load_opencv_dnn_model()
+        if not self.processor.use_inference_server:
+            self.processor.yolo_pool.warm(self.processor.yolo_pool.max_replicas)
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Registro de los modelos del procesador compartido (``get_media_processor``)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(get_media_processor())
+        return _registry
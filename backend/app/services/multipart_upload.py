@@ -0,0 +1,218 @@
+"""
+Recepción de subidas multipart en streaming.
+
+Starlette vuelca el cuerpo completo en un ``SpooledTemporaryFile`` antes de
+llamar al endpoint, que después lo copiaba otra vez a ``UPLOADS_DIR``. Aquí el
+cuerpo se analiza a medida que llega y, en esa misma pasada, cada archivo se
+escribe en ``INCOMING_DIR`` (mismo sistema de archivos que el destino final),
+se calcula su SHA-256, se detecta su tipo real con libmagic y se aplica
+``MAX_FILE_SIZE``. El archivo temporal se mueve después con un ``rename`` atómico.
+"""
+import hashlib
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings
+from app.services.uploads import PendingUpload, incoming_path
+from app.utils.file_validator import FileValidator, SNIFF_BYTES
+
+@dataclass
+class ReceivedFile:
+    """Un archivo del cuerpo multipart ya escrito en ``INCOMING_DIR`` (o su error)."""
+    field_name: str
+    filename: str
+    declared_type: str
+    temp_path: Optional[Path] = None
+    mime_type: Optional[str] = None
+    content_hash: Optional[str] = None
+    size: int = 0
+    error: Optional[str] = None
+    status_code: int = status.HTTP_400_BAD_REQUEST
+    _head: bytearray = field(default_factory=bytearray, repr=False)
+
+    def as_pending(self, filename: str, mime_type: str) -> PendingUpload:
+        """Archivo recibido sin error, listo para ``store_uploads`` con el nombre y tipo indicados."""
+        assert self.error is None and self.temp_path is not None and self.content_hash is not None
+        return PendingUpload(self.temp_path, filename, mime_type, self.content_hash, self.size)
+
+    def discard(self):
+        """Elimina el archivo temporal (si sigue existiendo)."""
+        if self.temp_path is not None:
+            self.temp_path.unlink(missing_ok=True)
+
+class MultipartUploadReceiver:
+    """
+    Analizador incremental que escribe los archivos de ``field_names`` a disco.
+
+    Los errores de un archivo (tipo no permitido, tamaño excesivo) se guardan
+    en su ``ReceivedFile`` sin interrumpir la lectura del resto del cuerpo.
+
+    Args:
+        content_type: Cabecera Content-Type de la petición
+        field_names: Campos del formulario que contienen archivos
+        max_file_size: Tamaño máximo de cada archivo
+        max_files: Número máximo de archivos; los siguientes se marcan como error sin escribirlos
+    """
+
+    def __init__(self, content_type: str, field_names: Sequence[str], max_file_size: int,
+                 max_files: Optional[int] = None):
+        mime, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if mime != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Se esperaba un cuerpo multipart/form-data")
+        self.field_names = set(field_names)
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.files: List[ReceivedFile] = []
+        self._current: Optional[ReceivedFile] = None
+        self._out = None
+        self._hasher = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def write(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    def finish(self):
+        self._parser.finalize()
+        if self._current is not None:
+            # Cuerpo truncado: el último archivo no llegó completo
+            self._close_current()
+            self._fail(self.files[-1], "El archivo llegó incompleto")
+
+    def discard_all(self):
+        self._close_current()
+        for received in self.files:
+            received.discard()
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if name not in self.field_names or filename is None:
+            return  # campo que no es un archivo esperado: se ignora
+        received = ReceivedFile(
+            field_name=name,
+            filename=filename.decode("utf-8", "replace"),
+            declared_type=self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1"),
+        )
+        self.files.append(received)
+        self._current = received
+        if self.max_files is not None and len(self.files) > self.max_files:
+            self._fail(received, f"Se admiten como máximo {self.max_files} archivos por petición")
+            return
+        received.temp_path = incoming_path(f"{uuid.uuid4().hex}.part")
+        self._out = open(received.temp_path, "wb")
+        self._hasher = hashlib.sha256()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        received = self._current
+        if received is None or received.error:
+            return
+        chunk = data[start:end]
+        received.size += len(chunk)
+        if received.size > self.max_file_size:
+            self._close_current(keep_current=True)
+            self._fail(received, f"El archivo supera el tamaño máximo de {self.max_file_size} bytes",
+                       status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            return
+        if received.mime_type is None and len(received._head) < SNIFF_BYTES:
+            received._head += chunk[:SNIFF_BYTES - len(received._head)]
+            if len(received._head) >= SNIFF_BYTES:
+                self._sniff(received)
+                if received.error:
+                    self._close_current(keep_current=True)
+                    return
+        assert self._out is not None and self._hasher is not None
+        self._out.write(chunk)
+        self._hasher.update(chunk)
+
+    def _on_part_end(self):
+        received = self._current
+        if received is None:
+            return
+        if not received.error:
+            if received.mime_type is None:
+                self._sniff(received)  # archivo más corto que SNIFF_BYTES
+            if not received.error:
+                assert self._hasher is not None
+                received.content_hash = self._hasher.hexdigest()
+        self._close_current()
+
+    def _sniff(self, received: ReceivedFile):
+        try:
+            received.mime_type, _ = FileValidator.detect_mime(bytes(received._head), received.filename)
+        except HTTPException as e:
+            self._fail(received, e.detail, e.status_code)
+
+    def _fail(self, received: ReceivedFile, message: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+        received.error = message
+        received.status_code = status_code
+        received.discard()
+
+    def _close_current(self, keep_current: bool = False):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        if not keep_current:
+            self._current = None
+
+async def receive_files(
+    request: Request,
+    field_names: Sequence[str] = ("file",),
+    max_file_size: Optional[int] = None,
+    max_files: Optional[int] = None
+) -> List[ReceivedFile]:
+    """
+    Lee el cuerpo multipart de ``request`` en streaming y devuelve sus archivos.
+
+    El análisis y la escritura de cada bloque se ejecutan en el pool de hilos
+    para no bloquear el bucle de eventos.
+    """
+    receiver = MultipartUploadReceiver(
+        request.headers.get("content-type", ""),
+        field_names,
+        max_file_size or settings.MAX_FILE_SIZE,
+        max_files
+    )
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(receiver.write, chunk)
+        await run_in_threadpool(receiver.finish)
+    except BaseException:
+        receiver.discard_all()
+        raise
+    return receiver.files
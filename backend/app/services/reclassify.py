@@ -0,0 +1,90 @@
+"""
+Reclasificación de la biblioteca a partir de los embeddings almacenados.
+
+En lugar de volver a ejecutar el codificador de imagen sobre cada archivo, se
+multiplica la matriz de embeddings del ``EmbeddingStore`` por la matriz de
+embeddings de texto del conjunto de etiquetas.
+"""
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.logger import logger
+from app.models.media import Media, CLASSIFIED_BY_RECLASSIFY, CLASSIFIED_MANUALLY
+from app.services.embedding_store import get_embedding_store
+from app.services.event_labels import CLIP_EVENT_TEXTS, clip_event_label
+from app.utils.vectors import softmax_rows
+
+def reclassify_library(
+    db: Session,
+    processor,
+    prompts: Optional[Sequence[str]] = None,
+    labels: Optional[Sequence[str]] = None,
+    dry_run: bool = False,
+    skip_manual: bool = True
+) -> dict:
+    """
+    Reasigna ``event_type`` y ``event_confidence`` a todos los medios con embedding
+    y marca ``classified_by`` como ``reclassify``.
+
+    Args:
+        db: Sesión de base de datos
+        processor: MediaProcessor (solo se usa para obtener los embeddings de texto)
+        prompts: Prompts en inglés para CLIP (por defecto, los eventos estándar)
+        labels: Etiqueta a guardar para cada prompt (por defecto, la traducción estándar)
+        dry_run: Si es True calcula el resultado sin escribir en la base de datos
+        skip_manual: Si es True no se tocan los medios con la etiqueta corregida a mano
+
+    Returns:
+        dict: Recuento de medios actualizados, distribución de etiquetas y tiempos
+    """
+    prompts = list(prompts or CLIP_EVENT_TEXTS)
+    label_list: List[str] = list(labels) if labels else [clip_event_label(p) for p in prompts]
+    if len(label_list) != len(prompts):
+        raise ValueError("Debe haber una etiqueta por cada prompt")
+
+    start = time.perf_counter()
+    text_features = processor.clip_text_features(prompts)
+    ids, similarities = get_embedding_store().scores(text_features)
+    scored_at = time.perf_counter()
+
+    if ids.shape[0] == 0:
+        return {"updated": 0, "matched": 0, "skipped_manual": 0, "distribution": {},
+                "score_seconds": 0.0, "total_seconds": 0.0}
+
+    probabilities = softmax_rows(100.0 * similarities)
+    best = probabilities.argmax(axis=1)
+    confidences = probabilities[np.arange(best.shape[0]), best]
+
+    # Solo actualizar medios que siguen existiendo y, con skip_manual, no corregidos a mano
+    existing = dict(db.query(Media.id, Media.classified_by).all())
+    manual = [media_id for media_id, classified_by in existing.items() if classified_by == CLASSIFIED_MANUALLY]
+    keep = np.isin(ids, list(existing))
+    skipped_manual = 0
+    if skip_manual and manual:
+        is_manual = np.isin(ids, manual)
+        skipped_manual = int(is_manual.sum())
+        keep &= ~is_manual
+    mappings = [
+        {"id": int(media_id), "event_type": label_list[label_index], "event_confidence": float(confidence),
+         "classified_by": CLASSIFIED_BY_RECLASSIFY}
+        for media_id, label_index, confidence in zip(ids[keep], best[keep], confidences[keep])
+    ]
+    if not dry_run and mappings:
+        db.bulk_update_mappings(Media, mappings)
+        db.commit()
+
+    counts = np.bincount(best[keep], minlength=len(label_list))
+    distribution = {label_list[i]: int(c) for i, c in enumerate(counts) if c}
+    total = time.perf_counter() - start
+    logger.info(f"Reclasificados {len(mappings)} medios en {total:.3f}s (puntuación: {scored_at - start:.3f}s)")
+    return {
+        "updated": 0 if dry_run else len(mappings),
+        "matched": len(mappings),
+        "skipped_manual": skipped_manual,
+        "distribution": distribution,
+        "score_seconds": scored_at - start,
+        "total_seconds": total
+    }
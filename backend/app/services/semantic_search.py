@@ -0,0 +1,93 @@
+"""
+Búsqueda semántica texto → imagen sobre la biblioteca.
+
+La consulta se codifica con el codificador de texto de CLIP y se compara por
+similitud coseno con los embeddings del ``EmbeddingStore``. Los filtros sobre
+columnas de ``Media`` se resuelven primero en SQL y se aplican como máscara
+antes de seleccionar el top-k con ``np.argpartition``.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.media import Media
+from app.services.embedding_store import get_embedding_store
+from app.utils.vectors import top_k
+
+# Consultas recientes ya codificadas (texto → embedding normalizado)
+QUERY_CACHE_SIZE = 256
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+def encode_query(processor, query: str) -> np.ndarray:
+    """Embedding normalizado de la consulta, con una pequeña caché LRU en memoria."""
+    key = query.strip().lower()
+    with _query_cache_lock:
+        cached = _query_cache.get(key)
+        if cached is not None:
+            _query_cache.move_to_end(key)
+            return cached
+    vector = np.asarray(processor.encode_clip_texts([query])[0], dtype=np.float32)
+    with _query_cache_lock:
+        _query_cache[key] = vector
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return vector
+
+def filtered_media_ids(
+    db: Session,
+    event_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> Optional[np.ndarray]:
+    """Ids que cumplen los filtros, o None si no se pidió ningún filtro."""
+    if event_type is None and date_from is None and date_to is None:
+        return None
+    query = db.query(Media.id)
+    if event_type is not None:
+        query = query.filter(Media.event_type == event_type)
+    if date_from is not None:
+        query = query.filter(Media.creation_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Media.creation_date <= date_to)
+    return np.fromiter((media_id for (media_id,) in query), dtype=np.int64)
+
+def search_media(
+    db: Session,
+    processor,
+    query: str,
+    limit: int = 50,
+    event_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> List[Tuple[Media, float]]:
+    """
+    Medios más parecidos a la consulta de texto.
+
+    Returns:
+        List[Tuple[Media, float]]: Pares (medio, similitud coseno) de mayor a menor
+    """
+    query_vector = encode_query(processor, query)
+    ids, scores = get_embedding_store().scores(query_vector)
+    scores = scores[:, 0]
+
+    allowed = filtered_media_ids(db, event_type, date_from, date_to)
+    if allowed is not None:
+        mask = np.isin(ids, allowed)
+        ids, scores = ids[mask], scores[mask]
+
+    best_ids, best_scores = top_k(ids, scores, limit)
+    if best_ids.shape[0] == 0:
+        return []
+
+    rows = db.query(Media).filter(Media.id.in_(best_ids.tolist())).all()
+    by_id = {m.id: m for m in rows}
+    return [
+        (by_id[int(media_id)], float(score))
+        for media_id, score in zip(best_ids, best_scores)
+        if int(media_id) in by_id
+    ]
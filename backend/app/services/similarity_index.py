@@ -0,0 +1,236 @@
+"""
+Búsqueda de imágenes similares sobre el índice IVF.
+
+Mantiene un ``IVFIndex`` sincronizado con el almacén de embeddings: cada
+inserción o borrado de un medio actualiza el índice de forma incremental, y el
+índice se guarda en disco junto a la base de datos (``storage/ann``) para no
+re-entrenarlo en cada arranque. Mientras la biblioteca es pequeña (menos de
+``ANN_MIN_TRAIN`` embeddings) las consultas recorren el almacén completo.
+"""
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.ann_index import IVFIndex
+from app.services.embedding_store import EmbeddingStore, get_embedding_store
+from app.utils.vectors import top_k
+
+# Vectores por partición recomendados al elegir nlist para bibliotecas pequeñas
+MIN_VECTORS_PER_LIST = 39
+# Se re-entrena cuando la biblioteca crece este factor respecto al entrenamiento
+RETRAIN_GROWTH = 4
+
+SEARCH_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+class SimilarityIndex:
+    """
+    Índice ANN de un almacén de embeddings.
+
+    Args:
+        store: Almacén de embeddings del que se alimenta el índice
+        path: Archivo ``.npz`` donde se persiste
+        nlist: Número máximo de particiones IVF
+        pq_m: Subespacios de cuantización de producto (0 = vectores float16 sin PQ)
+        min_train: Embeddings necesarios antes de entrenar el índice
+        save_every: Cambios acumulados tras los que se guarda el índice
+    """
+
+    def __init__(self, store: EmbeddingStore, path: Path, nlist: int = 256, pq_m: int = 0,
+                 min_train: int = 2048, save_every: int = 200):
+        self.store = store
+        self.path = Path(path)
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.min_train = min_train
+        self.save_every = save_every
+        self._index: Optional[IVFIndex] = None
+        self._loaded = False
+        self._dirty = 0
+        self._lock = threading.RLock()
+        self.search_histogram = metrics.histogram("ann.search_ms", SEARCH_MS_BUCKETS, "ms")
+
+    @property
+    def is_trained(self) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return self._index is not None
+
+    def add(self, media_id: int, vector: np.ndarray):
+        """Inserta o reemplaza el vector de un medio (ya guardado en el almacén)."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._needs_training():
+                self._maybe_train()
+                if self._index is None or media_id in self._index:
+                    return
+            assert self._index is not None
+            self._index.add(np.array([media_id]), np.asarray(vector)[None, :])
+            self._mark_dirty()
+
+    def remove(self, media_id: int):
+        """Elimina el vector de un medio."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._index is not None and self._index.remove(media_id):
+                self._mark_dirty()
+
+    def search(
+        self,
+        vector: np.ndarray,
+        k: int = 10,
+        nprobe: Optional[int] = None,
+        exclude: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Los ``k`` medios más parecidos a ``vector``.
+
+        Args:
+            vector: Embedding de consulta
+            k: Número de resultados
+            nprobe: Particiones a recorrer (por defecto ``ANN_NPROBE``); más particiones
+                dan más recall a cambio de latencia
+            exclude: Media.id a excluir de los resultados (la propia consulta)
+
+        Returns:
+            (ids, scores) de mayor a menor similitud coseno
+        """
+        nprobe = nprobe or settings.ANN_NPROBE
+        extra = 1 if exclude is not None else 0
+        started_at = time.monotonic()
+        ids = None
+        with self._lock:
+            self._ensure_loaded()
+            if self._index is not None:
+                ids, scores = self._index.search(
+                    vector, k + extra, nprobe,
+                    rerank=self._exact_vectors, rerank_factor=settings.ANN_RERANK
+                )
+        if ids is None:
+            # Biblioteca aún pequeña: búsqueda exacta sobre el almacén
+            ids, scores = self.store.scores(vector)
+            ids, scores = top_k(ids, scores[:, 0], k + extra)
+        self.search_histogram.observe((time.monotonic() - started_at) * 1000.0)
+        if exclude is not None:
+            keep = ids != exclude
+            ids, scores = ids[keep], scores[keep]
+        return ids[:k], scores[:k]
+
+    def similar_to(self, media_id: int, k: int = 10, nprobe: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Medios más parecidos a uno ya indexado, o None si no tiene embedding."""
+        vector = self.store.get(media_id)
+        if vector is None:
+            return None
+        return self.search(vector, k, nprobe, exclude=media_id)
+
+    def rebuild(self):
+        """Re-entrena el índice con todos los embeddings del almacén."""
+        with self._lock:
+            self._loaded = True
+            self._index = None
+            self._maybe_train(force=True)
+
+    def save(self):
+        """Guarda el índice si tiene cambios pendientes."""
+        with self._lock:
+            if self._index is None or not self._dirty:
+                return
+            try:
+                self._index.save(self.path)
+                self._dirty = 0
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el índice ANN {self.path}: {e}")
+
+    def _exact_vectors(self, ids: np.ndarray) -> np.ndarray:
+        assert self._index is not None
+        dim = self._index.dim
+        vectors = [self.store.get(int(media_id)) for media_id in ids]
+        return np.stack([v if v is not None else np.zeros(dim, np.float32) for v in vectors])
+
+    def _needs_training(self) -> bool:
+        if self._index is None:
+            return True
+        return bool(self._index.trained_on) and len(self.store) >= self._index.trained_on * RETRAIN_GROWTH
+
+    def _mark_dirty(self):
+        self._dirty += 1
+        if self._dirty >= self.save_every:
+            self.save()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path.exists():
+            try:
+                self._index = IVFIndex.load(self.path)
+                self._reconcile()
+                return
+            except Exception as e:
+                logger.warning(f"Índice ANN ilegible en {self.path}, se reconstruye: {e}")
+                self._index = None
+        self._maybe_train()
+
+    def _reconcile(self):
+        """Sincroniza el índice cargado con el almacén (cambios hechos sin guardar)."""
+        index = self._index
+        assert index is not None
+        store_ids, vectors = self.store.live()
+        index_ids = index.ids()
+        missing = ~np.isin(store_ids, index_ids)
+        stale = index_ids[~np.isin(index_ids, store_ids)]
+        for media_id in stale:
+            index.remove(int(media_id))
+        if missing.any():
+            index.add(store_ids[missing], np.asarray(vectors[missing], dtype=np.float32))
+        if missing.any() or stale.size:
+            logger.info(f"Índice ANN sincronizado: {int(missing.sum())} añadidos, {stale.size} eliminados")
+            self._dirty += 1
+            self.save()
+
+    def _maybe_train(self, force: bool = False):
+        ids, vectors = self.store.live()
+        if ids.shape[0] == 0 or (ids.shape[0] < self.min_train and not force):
+            return
+        assert self.store.dim is not None  # hay vectores, luego la dimensión es conocida
+        nlist = max(1, min(self.nlist, ids.shape[0] // MIN_VECTORS_PER_LIST))
+        index = IVFIndex(self.store.dim, nlist=nlist, pq_m=self.pq_m)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        index.train(vectors)
+        index.add(ids, vectors)
+        self._index = index
+        logger.info(f"Índice ANN entrenado: {ids.shape[0]} vectores, {index.nlist} particiones, pq_m={self.pq_m}")
+        self._dirty += 1
+        self.save()
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_similarity_index(model_name: Optional[str] = None) -> SimilarityIndex:
+    """Índice ANN del modelo indicado (por defecto, el modelo CLIP configurado)."""
+    model_name = model_name or settings.CLIP_MODEL_NAME
+    with _indexes_lock:
+        if model_name not in _indexes:
+            slug = re.sub(r'[^a-zA-Z0-9._-]', '_', model_name)
+            _indexes[model_name] = SimilarityIndex(
+                get_embedding_store(model_name),
+                settings.ANN_INDEX_DIR / f"{slug}.npz",
+                nlist=settings.ANN_NLIST,
+                pq_m=settings.ANN_PQ_M,
+                min_train=settings.ANN_MIN_TRAIN,
+                save_every=settings.ANN_SAVE_EVERY,
+            )
+        return _indexes[model_name]
+
+def save_similarity_indexes():
+    """Guarda los cambios pendientes de todos los índices abiertos."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.save()
@@ -0,0 +1,352 @@
+"""
+Almacenamiento de subidas direccionado por contenido.
+
+Toda subida (normal o reanudable) se escribe primero en ``INCOMING_DIR``, que
+está en el mismo sistema de archivos que ``UPLOADS_DIR``, y cuando se conoce su
+SHA-256 se mueve con un ``rename`` atómico a ``uploads/<sha256><ext>``: los
+bytes se escriben una sola vez.
+
+Las subidas reanudables siguen el protocolo crear sesión → ``PUT`` de rangos
+de bytes consecutivos → finalizar. El desplazamiento recibido se guarda en la
+tabla ``upload_sessions``, de modo que una subida interrumpida (o un reinicio
+del servidor) continúa desde el último byte escrito.
+"""
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.errors import ConflictException, ValidationException
+from app.core.logger import logger
+from app.crud import media as media_crud
+from app.crud import upload as upload_crud
+from app.models.media import Media
+from app.models.upload import UploadSession, UPLOAD_OPEN, UPLOAD_COMPLETED, UPLOAD_EXPIRED, UPLOAD_REJECTED
+from app.schemas.media import MediaCreate
+from app.utils.file_validator import FileValidator, SNIFF_BYTES
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+def content_filename(content_hash: str, filename: str) -> str:
+    """Nombre de almacenamiento de un contenido: ``<sha256><ext>``."""
+    return f"{content_hash}{Path(filename).suffix.lower()}"
+
+def incoming_path(name: str) -> Path:
+    """Ruta de un archivo en curso de subida."""
+    settings.INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    return settings.INCOMING_DIR / name
+
+def file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+class PendingUpload(NamedTuple):
+    """Archivo recibido en ``INCOMING_DIR`` pendiente de registrar."""
+    temp_path: Path
+    filename: str
+    mime_type: str
+    content_hash: str
+    file_size: int
+
+def store_upload(
+    db: Session,
+    temp_path: Path,
+    filename: str,
+    mime_type: str,
+    content_hash: str,
+    file_size: int
+) -> Tuple[Media, bool]:
+    """
+    Registra un archivo ya recibido en ``temp_path``.
+
+    Si el contenido ya existe se descarta el temporal y se devuelve el medio
+    existente; si no, se mueve a su ruta definitiva y se crea el registro.
+
+    Returns:
+        Tuple[Media, bool]: (medio, True si se ha creado)
+    """
+    return store_uploads(db, [PendingUpload(temp_path, filename, mime_type, content_hash, file_size)])[0]
+
+def store_uploads(db: Session, uploads: Sequence[PendingUpload]) -> List[Tuple[Media, bool]]:
+    """
+    Registra varios archivos recibidos insertando todos los medios nuevos en una
+    sola transacción. Los contenidos repetidos (ya almacenados o dentro del
+    propio lote) devuelven el medio existente.
+
+    Returns:
+        List[Tuple[Media, bool]]: (medio, True si se ha creado) en el orden de ``uploads``
+    """
+    known = {m.content_hash: m for m in media_crud.get_media_by_hashes(db, list({u.content_hash for u in uploads}))}
+    first_in_batch: Dict[str, int] = {}
+    new_items: List[Tuple[PendingUpload, MediaCreate, str]] = []
+    for index, upload in enumerate(uploads):
+        if upload.content_hash in known or upload.content_hash in first_in_batch:
+            Path(upload.temp_path).unlink(missing_ok=True)
+            continue
+        first_in_batch[upload.content_hash] = index
+        new_items.append((upload, MediaCreate(
+            filename=upload.filename,
+            mime_type=upload.mime_type,
+            file_size=upload.file_size,
+            content_hash=upload.content_hash
+        ), content_filename(upload.content_hash, upload.filename)))
+
+    # Primero el registro y después el archivo: un fallo al insertar no deja archivos
+    # sin fila, y quien pierde la carrera con otra subida simultánea no deja una copia
+    created: Dict[str, Media] = {}
+    try:
+        if new_items:
+            try:
+                db_media_list = media_crud.create_media_batch(
+                    db, [(media, f"/uploads/{stored_filename}") for _, media, stored_filename in new_items]
+                )
+                created = {m.content_hash: m for m in db_media_list}
+            except IntegrityError:
+                # Otra subida simultánea registró parte del contenido antes: uno a uno
+                db.rollback()
+                for upload, media, stored_filename in new_items:
+                    try:
+                        created[upload.content_hash] = media_crud.create_media(db, media, f"/uploads/{stored_filename}")
+                    except IntegrityError:
+                        db.rollback()
+                        known[upload.content_hash] = media_crud.get_media_by_hash(db, upload.content_hash)
+    except Exception:
+        for upload, _, _ in new_items:
+            Path(upload.temp_path).unlink(missing_ok=True)
+        raise
+
+    for upload, media, stored_filename in new_items:
+        db_media = created.get(upload.content_hash)
+        if db_media is None:
+            Path(upload.temp_path).unlink(missing_ok=True)
+            continue
+        try:
+            settings.UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+            os.replace(upload.temp_path, settings.UPLOADS_DIR / stored_filename)
+        except OSError:
+            # Sin archivo, el registro no sirve: se deshace
+            db.delete(db_media)
+            db.commit()
+            Path(upload.temp_path).unlink(missing_ok=True)
+            raise
+
+    results = []
+    for index, upload in enumerate(uploads):
+        db_media = created.get(upload.content_hash)
+        if db_media is not None and first_in_batch.get(upload.content_hash) == index:
+            results.append((db_media, True))
+        else:
+            results.append((known.get(upload.content_hash) or db_media, False))
+    return results
+
+def parse_content_range(header: Optional[str], total_size: int) -> Tuple[int, int]:
+    """
+    Interpreta una cabecera ``Content-Range: bytes <inicio>-<fin>/<total>``.
+
+    Returns:
+        Tuple[int, int]: (inicio, fin exclusivo)
+
+    Raises:
+        ValidationException: Si la cabecera falta o no es coherente con la sesión
+    """
+    match = _CONTENT_RANGE.match((header or "").strip())
+    if not match:
+        raise ValidationException("Cabecera Content-Range ausente o mal formada (bytes inicio-fin/total)")
+    start, end, total = (int(value) for value in match.groups())
+    if total != total_size or end < start or end >= total_size:
+        raise ValidationException(
+            "Content-Range fuera de los límites de la subida",
+            {"total_size": total_size}
+        )
+    return start, end + 1
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    f = open(path, 'r+b')
+    f.seek(offset)
+    f.truncate()
+    return f
+
+def _write_chunk(f: BinaryIO, chunk: bytes, hasher: Optional["hashlib._Hash"]):
+    f.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+class ResumableUploads:
+    """
+    Sesiones de subida reanudable.
+
+    El SHA-256 se calcula mientras llegan los bloques; si el estado del hash se
+    pierde (reinicio del proceso) se recalcula leyendo el archivo al finalizar.
+    """
+
+    def __init__(self):
+        self._hashers: Dict[str, Tuple["hashlib._Hash", int]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, db_session: UploadSession) -> Path:
+        return incoming_path(f"{db_session.id}.part")
+
+    def create(self, db: Session, filename: str, mime_type: str, total_size: int, content_hash: str) -> UploadSession:
+        """Crea una sesión y reserva su archivo parcial."""
+        if total_size > settings.MAX_RESUMABLE_FILE_SIZE:
+            raise ValidationException(
+                "El archivo supera el tamaño máximo permitido",
+                {"max_size": settings.MAX_RESUMABLE_FILE_SIZE}
+            )
+        db_session = upload_crud.create_upload_session(db, filename, mime_type, total_size, content_hash)
+        self.path_for(db_session).touch()
+        return db_session
+
+    async def write(self, db: Session, db_session: UploadSession, start: int, end: int,
+                    stream: AsyncIterator[bytes]) -> UploadSession:
+        """
+        Escribe el rango ``[start, end)`` recibido en ``stream`` en su posición del archivo.
+
+        Raises:
+            ConflictException: Si la sesión no está abierta o ``start`` no coincide
+                con los bytes ya recibidos (el detalle incluye el desplazamiento actual)
+            ValidationException: Si el cuerpo no tiene el tamaño del rango
+        """
+        lock = self._session_lock(db_session.id)
+        if not lock.acquire(blocking=False):
+            raise ConflictException("Ya se está escribiendo otro bloque de esta subida",
+                                    {"received": db_session.received})
+        try:
+            if db_session.status != UPLOAD_OPEN:
+                raise ConflictException(f"La subida no está abierta ({db_session.status})")
+            if start != db_session.received:
+                raise ConflictException(
+                    "El bloque no continúa la parte ya recibida",
+                    {"received": db_session.received}
+                )
+            return await self._write_range(db, db_session, start, end, stream)
+        finally:
+            lock.release()
+
+    async def _write_range(self, db: Session, db_session: UploadSession, start: int, end: int,
+                           stream: AsyncIterator[bytes]) -> UploadSession:
+        # Escritura, hash y commit en el pool de hilos, como en las subidas multipart:
+        # un PUT de varios GB no debe bloquear el bucle de eventos
+        path = self.path_for(db_session)
+        try:
+            hasher, hashed = self._hashers.get(db_session.id, (None, 0))
+            if hasher is None and start == 0:
+                hasher, hashed = hashlib.sha256(), 0
+            if hashed != start:
+                hasher = None  # estado perdido: se recalculará al finalizar
+
+            written = 0
+            f = await run_in_threadpool(_open_at, path, start)
+            try:
+                async for chunk in stream:
+                    if written + len(chunk) > end - start:
+                        raise ValidationException("El cuerpo es mayor que el rango indicado")
+                    await run_in_threadpool(_write_chunk, f, chunk, hasher)
+                    written += len(chunk)
+            finally:
+                await run_in_threadpool(f.close)
+
+            if written != end - start:
+                raise ValidationException(
+                    "El cuerpo no tiene el tamaño del rango indicado",
+                    {"received": start}
+                )
+        except Exception:
+            # Bloque incompleto o cortado: se descarta lo escrito de él y el estado del hash
+            self._hashers.pop(db_session.id, None)
+            await run_in_threadpool(os.truncate, path, start)
+            raise
+        else:
+            if hasher is not None:
+                self._hashers[db_session.id] = (hasher, end)
+            else:
+                self._hashers.pop(db_session.id, None)
+            return await run_in_threadpool(upload_crud.update_upload_session, db, db_session, received=end)
+
+    def finalize(self, db: Session, db_session: UploadSession) -> Tuple[Media, bool]:
+        """
+        Verifica el tamaño, el tipo real del contenido y el SHA-256 y registra el archivo como medio.
+
+        Un checksum incorrecto reinicia la sesión para que el cliente vuelva a enviarla;
+        un tipo no permitido la rechaza y borra el archivo parcial. El medio se guarda
+        con el tipo detectado, no con el declarado al crear la sesión.
+        """
+        if db_session.status == UPLOAD_COMPLETED and db_session.media_id:
+            return media_crud.get_media(db, db_session.media_id), False
+        if db_session.status != UPLOAD_OPEN:
+            raise ConflictException(f"La subida no está abierta ({db_session.status})")
+        if db_session.received != db_session.total_size:
+            raise ConflictException(
+                "La subida está incompleta",
+                {"received": db_session.received, "total_size": db_session.total_size}
+            )
+
+        path = self.path_for(db_session)
+        # Igual que en las subidas multipart: el tipo se detecta con libmagic sobre los primeros bytes
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+        try:
+            mime_type, _ = FileValidator.detect_mime(head, db_session.filename)
+        except HTTPException as e:
+            path.unlink(missing_ok=True)
+            upload_crud.update_upload_session(db, db_session, status=UPLOAD_REJECTED)
+            self._forget(db_session.id)
+            raise ValidationException(e.detail, {"declared_mime_type": db_session.mime_type})
+
+        hasher, hashed = self._hashers.pop(db_session.id, (None, 0))
+        if hasher is not None and hashed == db_session.total_size:
+            content_hash = hasher.hexdigest()
+        else:
+            content_hash = file_sha256(path)
+
+        if content_hash != db_session.content_hash:
+            os.truncate(path, 0)
+            upload_crud.update_upload_session(db, db_session, received=0)
+            raise ValidationException(
+                "El SHA-256 del archivo recibido no coincide; la subida se ha reiniciado",
+                {"expected": db_session.content_hash, "actual": content_hash}
+            )
+
+        db_media, created = store_upload(
+            db, path, db_session.filename, mime_type, content_hash, db_session.total_size
+        )
+        upload_crud.update_upload_session(db, db_session, status=UPLOAD_COMPLETED, media_id=db_media.id,
+                                          mime_type=mime_type)
+        self._forget(db_session.id)
+        return db_media, created
+
+    def expire_stale(self, db: Session) -> int:
+        """Elimina las sesiones abiertas sin actividad durante ``UPLOAD_SESSION_TTL_HOURS``."""
+        stale = upload_crud.get_stale_upload_sessions(db, settings.UPLOAD_SESSION_TTL_HOURS)
+        for db_session in stale:
+            self.path_for(db_session).unlink(missing_ok=True)
+            upload_crud.update_upload_session(db, db_session, status=UPLOAD_EXPIRED)
+            self._forget(db_session.id)
+        if stale:
+            logger.info(f"Sesiones de subida caducadas: {len(stale)}")
+        return len(stale)
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _forget(self, session_id: str):
+        with self._lock:
+            self._hashers.pop(session_id, None)
+            self._locks.pop(session_id, None)
+
+resumable_uploads = ResumableUploads()
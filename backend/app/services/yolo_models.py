@@ -0,0 +1,71 @@
+"""
+Variantes de YOLO disponibles para ``opencv_dnn``/``opencv_yolo``.
+
+Cada variante es un par ``<variante>.cfg`` + ``<variante>.weights`` en
+``storage/models/opencv_dnn`` (las clases se leen de ``<variante>.names`` o, si
+no existe, de ``coco.names``). Cualquier par que se copie al directorio queda
+disponible como ``YOLO_VARIANT``; las variantes de ``KNOWN_YOLO_VARIANTS`` se
+descargan además si faltan. ``yolov4-tiny`` con entrada 320 o 288 es varias
+veces más rápido que ``yolov4`` a 416 con poco cambio en el evento final; la
+latencia de cada combinación se registra en los histogramas
+``yolo.<variante>.<tamaño>.forward_ms`` (``scripts/benchmark_yolo.py`` las compara).
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+DARKNET_RAW = "https://raw.githubusercontent.com/AlexeyAB/darknet/master"
+DARKNET_RELEASES = "https://github.com/AlexeyAB/darknet/releases/download"
+
+# URLs de descarga (cfg, weights) de las variantes conocidas
+KNOWN_YOLO_VARIANTS: Dict[str, Dict[str, str]] = {
+    "yolov4": {
+        "cfg": f"{DARKNET_RAW}/cfg/yolov4.cfg",
+        "weights": f"{DARKNET_RELEASES}/darknet_yolo_v3_optimal/yolov4.weights",
+    },
+    "yolov4-tiny": {
+        "cfg": f"{DARKNET_RAW}/cfg/yolov4-tiny.cfg",
+        "weights": f"{DARKNET_RELEASES}/darknet_yolo_v4_pre/yolov4-tiny.weights",
+    },
+}
+COCO_NAMES_URL = f"{DARKNET_RAW}/data/coco.names"
+
+@dataclass(frozen=True)
+class YoloBundle:
+    variant: str
+    config_path: Path
+    weights_path: Path
+    classes_path: Path
+
+    @property
+    def complete(self) -> bool:
+        return self.config_path.exists() and self.weights_path.exists() and self.classes_path.exists()
+
+def yolo_model_dir() -> Path:
+    return settings.STORAGE_DIR / "models" / "opencv_dnn"
+
+def yolo_bundle(variant: str, model_dir: Optional[Path] = None) -> YoloBundle:
+    """Rutas de los archivos de ``variant`` (existan o no)."""
+    model_dir = model_dir or yolo_model_dir()
+    names = model_dir / f"{variant}.names"
+    return YoloBundle(
+        variant,
+        model_dir / f"{variant}.cfg",
+        model_dir / f"{variant}.weights",
+        names if names.exists() else model_dir / "coco.names"
+    )
+
+def discover_yolo_bundles(model_dir: Optional[Path] = None) -> Dict[str, YoloBundle]:
+    """Variantes con cfg, pesos y clases presentes en ``model_dir``."""
+    model_dir = model_dir or yolo_model_dir()
+    if not model_dir.is_dir():
+        return {}
+    bundles = (yolo_bundle(cfg.stem, model_dir) for cfg in sorted(model_dir.glob("*.cfg")))
+    return {bundle.variant: bundle for bundle in bundles if bundle.complete}
+
+def yolo_input_size(size: Optional[int] = None) -> int:
+    """Lado de la entrada de la red: múltiplo de 32 (requisito de YOLO), como mínimo 32."""
+    size = settings.YOLO_INPUT_SIZE if size is None else size
+    return max(32, int(size) // 32 * 32)
@@ -28,6 +28,9 @@ ALLOWED_VIDEO_MIMES: Set[str] = {
 
 ALLOWED_MIMES: Set[str] = ALLOWED_IMAGE_MIMES.union(ALLOWED_VIDEO_MIMES)
 
+# Bytes iniciales que se pasan a libmagic para detectar el tipo
+SNIFF_BYTES: int = 100
+
 # Tamaño máximo de archivo (en bytes)
 MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
 
@@ -51,12 +54,29 @@ class FileValidator:
         - HTTPException: Si el archivo no pasa las validaciones
         """
         # Comprobar tamaño (primeros 100 bytes para determinar tipo)
-        first_bytes = await file.read(100)
+        first_bytes = await file.read(SNIFF_BYTES)
         await file.seek(0)  # Regresar al inicio del archivo
         
+        return FileValidator.detect_mime(first_bytes, file.filename)
+    
+    @staticmethod
+    def detect_mime(first_bytes: bytes, filename: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Determina con libmagic el tipo MIME real a partir de los primeros bytes.
+        
+        Parámetros:
+        - first_bytes: Primeros bytes del archivo (al menos SNIFF_BYTES si los hay)
+        - filename: Nombre del archivo, solo para los mensajes de log
+        
+        Returns:
+        - Tuple[str, str]: El tipo MIME real y el tipo de archivo (image/video)
+        
+        Raises:
+        - HTTPException: Si el archivo está vacío o su tipo no está permitido
+        """
         # Verificar que no esté vacío
         if not first_bytes:
-            logger.warning(f"Archivo vacío: {file.filename}")
+            logger.warning(f"Archivo vacío: {filename}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El archivo está vacío"
@@ -67,7 +87,7 @@ class FileValidator:
         
         # Validar tipo de archivo
         if mime_type not in ALLOWED_MIMES:
-            logger.warning(f"Tipo de archivo no permitido: {mime_type}, archivo: {file.filename}")
+            logger.warning(f"Tipo de archivo no permitido: {mime_type}, archivo: {filename}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Tipo de archivo {mime_type} no permitido. Tipos permitidos: {', '.join(ALLOWED_MIMES)}"
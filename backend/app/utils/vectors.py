@@ -0,0 +1,31 @@
+"""
+Operaciones vectorizadas comunes sobre embeddings.
+"""
+from typing import Tuple
+
+import numpy as np
+
+def top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Los ``k`` ids con mayor puntuación, ordenados de mayor a menor."""
+    if k <= 0 or ids.shape[0] == 0:
+        return ids[:0], scores[:0]
+    if k < ids.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(ids.shape[0])
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return ids[order], scores[order]
+
+def softmax_rows(logits: np.ndarray) -> np.ndarray:
+    """Softmax por filas numéricamente estable."""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    shifted /= shifted.sum(axis=1, keepdims=True)
+    return shifted
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normaliza cada fila a norma 1 (las filas nulas se dejan igual)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
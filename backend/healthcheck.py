@@ -18,21 +18,29 @@ def check_directories():
             return False
     return True
 
-def check_api():
-    """Verificar que la API está respondiendo"""
-    try:
-        response = requests.get('http://localhost:8000/health')
-        if response.status_code == 200:
-            return True
-        print(f"Error: API respondió con código {response.status_code}")
-        return False
-    except requests.exceptions.RequestException as e:
-        print(f"Error conectando con la API: {e}")
-        return False
+def check_api(timeout: float = 8.0, interval: float = 0.5):
+    """
+    Verificar que la API está lista para recibir tráfico.
 
-# Esperar un poco antes de hacer el healthcheck
-# Esto da tiempo a que uvicorn inicie completamente
-time.sleep(2)
+    Consulta /ready hasta que responde 200 (modelos cargados y calentados)
+    o se agota el tiempo (por debajo del timeout de 10s del HEALTHCHECK),
+    en lugar de esperar un tiempo fijo.
+    """
+    deadline = time.monotonic() + timeout
+    last_error = "sin respuesta"
+    while True:
+        try:
+            response = requests.get('http://localhost:8000/ready', timeout=5)
+            if response.status_code == 200:
+                return True
+            states = {name: model.get("state") for name, model in response.json().get("models", {}).items()}
+            last_error = f"código {response.status_code}, modelos {states}"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            last_error = str(e)
+        if time.monotonic() + interval >= deadline:
+            print(f"Error: la API no está lista: {last_error}")
+            return False
+        time.sleep(interval)
 
 # Verificar directorios y API
 if check_directories() and check_api():
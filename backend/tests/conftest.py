@@ -60,6 +60,20 @@ def test_db():
     # Eliminar todas las tablas después de la prueba
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture
+def session_factory(test_db):
+    """Fábrica de sesiones ligada a la base de datos de prueba (para trabajadores en segundo plano)."""
+    return TestingSessionLocal
+
+@pytest.fixture
+def upload_storage(tmp_path, monkeypatch):
+    """Directorios de subida temporales; los trabajos de ingesta no se ejecutan."""
+    from app.api.v1 import media as media_api
+    monkeypatch.setattr(settings, "UPLOADS_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(settings, "INCOMING_DIR", tmp_path / "incoming")
+    monkeypatch.setattr(media_api.ingest_queue, "enqueue", lambda job_id: None)
+    return tmp_path
+
 @pytest.fixture
 def client(test_db):
     """Cliente de prueba para la API."""
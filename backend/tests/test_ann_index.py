@@ -0,0 +1,68 @@
+"""
+Tests del índice aproximado IVF y de su sincronización con el almacén de embeddings.
+"""
+import numpy as np
+
+from app.services.ann_index import IVFIndex
+from app.services.embedding_store import EmbeddingStore
+from app.services.similarity_index import SimilarityIndex
+
+def clustered_vectors(n, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_ivf_recall_delete_and_reload(tmp_path):
+    vectors = clustered_vectors(2000)
+    ids = np.arange(100, 2100)
+    index = IVFIndex(32, nlist=16)
+    index.train(vectors)
+    index.add(ids, vectors)
+
+    hits = 0
+    for row in range(0, 2000, 100):
+        exact = ids[np.argsort(-(vectors @ vectors[row]))[:10]]
+        found, _ = index.search(vectors[row], k=10, nprobe=4)
+        hits += len(set(exact.tolist()) & set(found.tolist()))
+    assert hits / 200 >= 0.9
+
+    assert index.remove(100)
+    assert 100 not in index.search(vectors[0], k=5, nprobe=16)[0]
+
+    index.save(tmp_path / "index.npz")
+    reloaded = IVFIndex.load(tmp_path / "index.npz")
+    assert len(reloaded) == 1999
+    np.testing.assert_array_equal(
+        reloaded.search(vectors[5], k=5, nprobe=4)[0],
+        index.search(vectors[5], k=5, nprobe=4)[0]
+    )
+
+def test_ivf_pq_with_rerank():
+    vectors = clustered_vectors(3000, seed=1)
+    index = IVFIndex(32, nlist=8, pq_m=8)
+    index.train(vectors)
+    index.add(np.arange(3000), vectors)
+    found, scores = index.search(vectors[7], k=5, nprobe=8, rerank=lambda ids: vectors[ids])
+    assert found[0] == 7
+    np.testing.assert_allclose(scores[0], 1.0, atol=1e-5)
+
+def test_similarity_index_trains_and_stays_in_sync(tmp_path):
+    vectors = clustered_vectors(120, seed=2)
+    store = EmbeddingStore(tmp_path / "store")
+    index = SimilarityIndex(store, tmp_path / "ann.npz", nlist=4, min_train=100, save_every=1)
+    for media_id, vector in enumerate(vectors, start=1):
+        store.add(media_id, vector)
+        index.add(media_id, vector)
+        assert index.is_trained == (media_id >= 100)
+
+    ids, _ = index.similar_to(3, k=5, nprobe=4)
+    assert 3 not in ids and len(ids) == 5
+
+    store.delete(4)
+    index.remove(4)
+    # Cambios hechos en el almacén sin pasar por el índice se reconcilian al cargar
+    store.delete(5)
+    reopened = SimilarityIndex(store, tmp_path / "ann.npz", nlist=4, min_train=100)
+    found, _ = reopened.search(vectors[4], k=10, nprobe=4)
+    assert 4 not in found and 5 not in found
@@ -0,0 +1,65 @@
+"""
+Tests de la clasificación en cascada (YOLO ligero y CLIP solo si hay dudas).
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.media_context import MediaContext
+from app.services.media_processor import MediaProcessor
+from app.services.yolo_postprocess import YoloEventScorer
+
+CLASSES = ["person", "tie", "cake", "toothbrush"] + [f"clase {i}" for i in range(76)]
+WEDDING = (np.array([0, 1, 2]), np.array([0.9, 0.7, 0.8], dtype=np.float32))
+NOTHING = (np.zeros(0, np.int64), np.zeros(0, np.float32))
+
+@pytest.fixture
+def processor(monkeypatch):
+    processor = MediaProcessor(use_inference_server=False)
+    processor.yolo_scorer = YoloEventScorer(CLASSES)
+    processor.clip_calls = []
+
+    def fake_clip(file_path, context, variant=None):
+        processor.clip_calls.append(variant)
+        return "concierto", 0.7
+
+    monkeypatch.setattr(processor, "_predict_event_clip", fake_clip)
+    monkeypatch.setattr(settings, "AI_MODEL", "cascade")
+    return processor
+
+def classify(processor, monkeypatch, detections):
+    monkeypatch.setattr(processor, "_yolo_detections", lambda *args: detections)
+    with MediaContext.from_image(Image.new("RGB", (64, 64))) as context:
+        result = processor.predict_event(context.file_path, context=context)
+        return result, context.classified_by
+
+@pytest.mark.parametrize("threshold, detections, expected, stage", [
+    (0.0, WEDDING, "boda", "yolo"),      # margen suficiente: CLIP no se ejecuta
+    (1.01, WEDDING, "concierto", "clip"),  # margen insuficiente
+    (0.0, NOTHING, "concierto", "clip"),   # evento desconocido
+])
+def test_cascade_escalates_to_clip_only_when_unsure(processor, monkeypatch, threshold, detections, expected, stage):
+    monkeypatch.setattr(settings, "CASCADE_MARGIN_THRESHOLD", threshold)
+    decided = metrics.counter(f"cascade.decided.{stage}")
+    before = decided.value
+
+    (event, _), classified_by = classify(processor, monkeypatch, detections)
+
+    assert event == expected
+    assert classified_by == f"cascade:{stage}"
+    assert decided.value == before + 1
+    assert processor.clip_calls == ([settings.CASCADE_CLIP_VARIANT] if stage == "clip" else [])
+
+def test_warmup_does_not_record_cascade_metrics(processor, monkeypatch):
+    from app.services.model_registry import ModelRegistry
+
+    monkeypatch.setattr(processor, "_yolo_detections", lambda *args: NOTHING)
+    before = metrics.snapshot(prefix="cascade.")
+    _, warmup = ModelRegistry(processor)._backends["cascade"]
+    with MediaContext.from_image(Image.new("RGB", (64, 64))) as context:
+        warmup(context)
+
+    assert processor.clip_calls == [settings.CASCADE_CLIP_VARIANT]
+    assert metrics.snapshot(prefix="cascade.") == before
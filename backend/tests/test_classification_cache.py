@@ -0,0 +1,84 @@
+"""
+Tests de la caché persistente de resultados de clasificación.
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.models.classification import ClassificationCacheEntry
+from app.services import classification_cache as cache_module
+from app.services import media_processor as media_processor_module
+from app.services.classification_cache import ClassificationCache
+from app.services.media_context import MediaContext
+from app.services.media_processor import MediaProcessor
+
+HASH = "a" * 64
+
+@pytest.fixture
+def cache(session_factory, monkeypatch):
+    monkeypatch.setattr(cache_module, "EVICTION_CHECK_EVERY", 1)
+    return ClassificationCache(session_factory, max_entries=10)
+
+def test_results_round_trip_per_model_and_label_version(cache, monkeypatch):
+    monkeypatch.setattr(settings, "AI_MODEL", "clip")
+    key = cache.key(HASH.upper())
+    cache.put(key, "boda", 0.8, "clip", np.array([0.8, 0.2], dtype=np.float32))
+
+    cached = cache.get(key)
+    assert (cached.event_type, cached.confidence, cached.classified_by) == ("boda", 0.8, "clip")
+    np.testing.assert_array_equal(cached.scores, np.array([0.8, 0.2], dtype=np.float32))
+    assert cache.key(HASH) == key
+    # Otro modelo u otras etiquetas no aciertan
+    assert cache.get(cache.key(HASH, "clip_int8")) is None
+    assert cache.get((HASH, key[1], "otra-version")) is None
+    # opencv_dnn y opencv_yolo comparten entradas
+    assert cache.key(HASH, "opencv_dnn") == cache.key(HASH, "opencv_yolo")
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(cache_module, "TOUCH_INTERVAL_SECONDS", 0.0)
+    keys = [(f"{i:064d}", "clip/test", "v1") for i in range(11)]
+    for key in keys[:10]:
+        cache.put(key, "fiesta", 0.5)
+    assert cache.get(keys[0]) is not None  # el más antiguo vuelve a ser reciente
+
+    cache.put(keys[10], "fiesta", 0.5)  # 11 > 10: se deja la tabla al 90%
+
+    remaining = [key for key in keys if cache.get(key) is not None]
+    assert len(remaining) == 9
+    assert keys[0] in remaining and keys[10] in remaining
+    assert keys[1] not in remaining and keys[2] not in remaining
+
+def test_invalidate_stale_removes_old_label_sets(cache, test_db):
+    cache.put(cache.key(HASH, "clip"), "boda", 0.8)
+    cache.put((HASH, "clip/test", "etiquetas-antiguas"), "boda", 0.8)
+
+    assert cache.invalidate_stale() == 1
+    assert [e.label_version for e in test_db.query(ClassificationCacheEntry).all()] == [cache.key(HASH, "clip")[2]]
+
+def test_predict_event_reuses_cached_results(cache, monkeypatch):
+    monkeypatch.setattr(media_processor_module, "classification_cache", cache)
+    monkeypatch.setattr(settings, "AI_MODEL", "clip")
+    processor = MediaProcessor(use_inference_server=False)
+    calls = []
+
+    def fake_clip(file_path, context, variant=None):
+        calls.append(file_path)
+        context.event_scores = np.array([0.9, 0.1], dtype=np.float32)
+        return "concierto", 0.9
+
+    monkeypatch.setattr(processor, "_predict_event_clip", fake_clip)
+
+    def classify(**kwargs):
+        with MediaContext.from_image(Image.new("RGB", (32, 32))) as context:
+            return processor.predict_event(context.file_path, context=context, **kwargs), context.event_scores
+
+    assert classify(content_hash=HASH)[0] == ("concierto", 0.9)
+    result, scores = classify(content_hash=HASH)
+    assert result == ("concierto", 0.9)
+    np.testing.assert_array_equal(scores, np.array([0.9, 0.1], dtype=np.float32))
+    assert len(calls) == 1
+    # Sin hash no hay caché, y un acierto de CLIP no sirve si falta el embedding
+    classify()
+    classify(content_hash=HASH, need_embedding=True)
+    assert len(calls) == 3
@@ -0,0 +1,64 @@
+"""
+Tests de las variantes optimizadas del codificador de imagen de CLIP.
+"""
+import warnings
+
+import torch
+
+from app.services.clip_backends import clip_parity_report
+from app.services.event_labels import CLIP_EVENT_TEXTS, clip_event_label
+from app.services.media_processor import MediaProcessor
+from app.services.model_pool import ModelPool, torch_state_bytes
+
+class FakeClipModel:
+    def get_image_features(self, pixel_values):
+        return pixel_values.flatten(1)
+
+def test_batches_mixing_variants_are_routed_to_each_encoder():
+    processor = MediaProcessor(use_inference_server=False)
+    processor.clip_pool = ModelPool("test_fp32", FakeClipModel)
+    processor.clip_vision_pools["clip_int8"] = ModelPool("test_int8", lambda: lambda batch: -batch.flatten(1))
+    items = [("clip", torch.ones(1, 2)), ("clip_int8", torch.ones(1, 2)), ("clip", torch.ones(1, 2) * 3)]
+
+    features = processor._clip_image_features_batch(items)
+
+    expected = torch.full((2,), 2 ** -0.5)
+    torch.testing.assert_close(torch.stack(features), torch.stack([expected, -torch.ones(2), expected]))
+    assert processor.clip_image_pool("clip_int8").stats()["leases"] == 1
+    assert processor.clip_image_pool("opencv_yolo") is processor.clip_pool
+
+def test_state_bytes_count_packed_int8_weights():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # API de cuantización eager marcada como obsoleta en torch recientes
+        model = torch.ao.quantization.quantize_dynamic(
+            torch.nn.Sequential(torch.nn.Linear(64, 32)), {torch.nn.Linear}, dtype=torch.qint8)
+    assert 64 * 32 + 32 * 4 <= torch_state_bytes(model) < 64 * 32 * 4
+
+class FakeParityProcessor:
+    """Las "imágenes" ya son embeddings; clip_int8 invierte la predicción de la última."""
+
+    def preprocess_clip_images(self, images):
+        return torch.stack(list(images))
+
+    def _load_clip_model(self, variant=None):
+        pass
+
+    def clip_text_features(self, texts):
+        return torch.eye(len(texts)).numpy()
+
+    def _encode_clip_images(self, variant, batch):
+        if variant == "clip_int8" and batch.shape[0] > 1:
+            batch = batch.clone()
+            batch[-1] = batch[-1].roll(1)
+        return batch
+
+def test_parity_report_compares_against_fp32():
+    images = [torch.eye(len(CLIP_EVENT_TEXTS))[i] for i in range(4)]
+    labels = [clip_event_label(CLIP_EVENT_TEXTS[i]) for i in range(3)] + [None]
+
+    report = clip_parity_report(FakeParityProcessor(), images, labels, variants=("clip_int8",), batch_size=4)
+
+    assert report["clip"]["accuracy"] == 1.0 and "speedup" not in report["clip"]
+    assert report["clip_int8"]["top1_agreement"] == 0.75
+    assert report["clip_int8"]["min_cosine"] == 0.0 and report["clip_int8"]["accuracy"] == 1.0
+    assert report["clip_int8"]["speedup"] > 0
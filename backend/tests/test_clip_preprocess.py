@@ -0,0 +1,41 @@
+"""
+Tests del preprocesado rápido de CLIP.
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.clip_preprocess import CLIP_IMAGE_MEAN, CLIP_IMAGE_STD, ClipPreprocessor
+from app.services.model_registry import synthetic_image
+
+# Un nivel uint8 tras normalizar: el recorte previo puede redondear distinto algún píxel
+TOLERANCE = 1.0 / 255 / min(CLIP_IMAGE_STD) + 1e-5
+
+def reference_pixel_values(image, size=224, crop=224):
+    """Pasos de CLIPImageProcessor: lado corto a ``size``, recorte central, reescalado y normalización."""
+    width, height = image.size
+    long = int(size * max(width, height) / min(width, height))
+    new_w, new_h = (size, long) if width <= height else (long, size)
+    resized = np.asarray(image.resize((new_w, new_h), Image.Resampling.BICUBIC)).astype(np.float64)
+    top, left = (new_h - crop) // 2, (new_w - crop) // 2
+    pixels = resized[top:top + crop, left:left + crop] / 255.0
+    return ((pixels - CLIP_IMAGE_MEAN) / CLIP_IMAGE_STD).transpose(2, 0, 1).astype(np.float32)
+
+@pytest.mark.parametrize("size", [(1024, 768), (300, 1000), (225, 224), (180, 120)])
+def test_matches_reference_preprocessing(size):
+    image = synthetic_image(*size)
+    batch = ClipPreprocessor()([image, image.convert("L")])
+
+    assert batch.shape == (2, 3, 224, 224) and batch.dtype.is_floating_point
+    np.testing.assert_allclose(batch[0].numpy(), reference_pixel_values(image), atol=TOLERANCE)
+    np.testing.assert_allclose(batch[1].numpy(), reference_pixel_values(image.convert("L").convert("RGB")),
+                               atol=TOLERANCE)
+
+def test_matches_transformers_image_processor():
+    transformers = pytest.importorskip("transformers")
+    image_processor = transformers.CLIPImageProcessor()
+    image = synthetic_image(640, 480)
+
+    expected = image_processor(images=image, return_tensors="np")["pixel_values"]
+    fast = ClipPreprocessor.from_image_processor(image_processor)([image])
+    np.testing.assert_allclose(fast.numpy(), expected, atol=TOLERANCE)
@@ -0,0 +1,39 @@
+"""
+Tests de la caché de embeddings de texto de CLIP.
+"""
+import numpy as np
+
+from app.services.clip_text_embeddings import ClipTextEmbeddingCache
+
+LABELS = ["a wedding", "a concert", "a protest"]
+
+class FakeEncoder:
+    """Codificador que cuenta sus llamadas en lugar de ejecutar CLIP."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        matrix = np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4) + 1
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+def test_encoded_once_per_model_and_label_set(tmp_path):
+    encoder = FakeEncoder()
+    cache = ClipTextEmbeddingCache(tmp_path)
+
+    first = cache.get("modelo", LABELS, encoder)
+    assert cache.get("modelo", LABELS, encoder) is first  # acierto en memoria
+    assert len(encoder.calls) == 1
+
+    # Un reinicio (instancia nueva) carga el .npy sin ejecutar el codificador
+    restarted = ClipTextEmbeddingCache(tmp_path)
+    np.testing.assert_array_equal(restarted.get("modelo", LABELS, encoder), first)
+    assert len(encoder.calls) == 1
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+
+    # Otras etiquetas u otro modelo se calculan aparte
+    restarted.get("modelo", LABELS + ["a graduation"], encoder)
+    restarted.get("otro/modelo", LABELS, encoder)
+    assert len(encoder.calls) == 3
+    assert encoder.calls[1] == LABELS + ["a graduation"]
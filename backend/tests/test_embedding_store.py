@@ -0,0 +1,71 @@
+"""
+Tests del almacén persistente de embeddings.
+"""
+import numpy as np
+import pytest
+
+from app.services.embedding_store import EmbeddingStore
+
+def random_vectors(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+def test_add_get_and_reload(tmp_path):
+    vectors = random_vectors(3)
+    store = EmbeddingStore(tmp_path)
+    for media_id, vector in zip((10, 20, 30), vectors):
+        store.add(media_id, vector)
+
+    reopened = EmbeddingStore(tmp_path)
+    assert len(reopened) == 3
+    expected = vectors[1] / np.linalg.norm(vectors[1])
+    np.testing.assert_allclose(reopened.get(20), expected, atol=1e-3)
+
+@pytest.mark.parametrize("dense_cache", [False, True])
+def test_delete_replace_and_compact(tmp_path, dense_cache):
+    vectors = random_vectors(4)
+    store = EmbeddingStore(tmp_path, compact_ratio=1.0, dense_cache=dense_cache)
+    for media_id, vector in enumerate(vectors, start=1):
+        store.add(media_id, vector)
+
+    store.add(2, vectors[0])  # reemplazo: la fila anterior queda como tombstone
+    assert store.delete(3)
+    assert store.tombstones == 2
+    assert 3 not in store
+
+    ids, scores = store.scores(vectors[0] / np.linalg.norm(vectors[0]))
+    assert sorted(ids.tolist()) == [1, 2, 4]
+    np.testing.assert_allclose(scores[ids.tolist().index(2), 0], 1.0, atol=1e-3)
+
+    store.add(5, vectors[3])
+    ids, scores = store.scores(vectors[3])
+    assert sorted(ids.tolist()) == [1, 2, 4, 5]
+    assert ids[scores[:, 0].argmax()] in (4, 5)
+
+    store.compact()
+    assert store.tombstones == 0
+    reopened = EmbeddingStore(tmp_path)
+    assert sorted(reopened.live()[0].tolist()) == [1, 2, 4, 5]
+    np.testing.assert_allclose(reopened.get(2), store.get(1), atol=1e-6)
+
+def test_writes_from_another_process_are_seen(tmp_path):
+    # Dos instancias sobre el mismo directorio, como dos workers de uvicorn
+    vectors = random_vectors(3)
+    first = EmbeddingStore(tmp_path)
+    second = EmbeddingStore(tmp_path)
+    first.add(1, vectors[0])
+    second.add(2, vectors[1])
+    first.add(3, vectors[2])
+
+    assert 2 in first and 3 in second
+    ids, _ = second.live()
+    assert sorted(ids.tolist()) == [1, 2, 3]
+    expected = vectors[1] / np.linalg.norm(vectors[1])
+    np.testing.assert_allclose(first.get(2), expected, atol=1e-3)
+
+    second.delete(1)
+    assert 1 not in first
+    first.compact()
+    assert len(second) == 2
+    np.testing.assert_allclose(second.get(2), expected, atol=1e-3)
+    assert (tmp_path / "ids.i64").stat().st_size == 2 * 8
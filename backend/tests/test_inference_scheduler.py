@@ -0,0 +1,57 @@
+"""
+Tests del planificador de inferencia por micro-lotes.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.inference_scheduler import BatchScheduler
+
+def test_concurrent_requests_are_batched():
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    scheduler = BatchScheduler(batch_fn, max_batch_size=8, max_wait_ms=200, name="test.batched")
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(scheduler.run, range(8)))
+    finally:
+        scheduler.stop()
+
+    assert results == [i * 2 for i in range(8)]
+    assert sum(len(b) for b in batches) == 8
+    assert len(batches) < 8
+    assert scheduler.batch_size_histogram.snapshot()["count"] == len(batches)
+    assert scheduler.queue_wait_histogram.snapshot()["count"] == 8
+
+def test_batch_errors_reach_every_caller():
+    def batch_fn(items):
+        raise ValueError("fallo del modelo")
+
+    scheduler = BatchScheduler(batch_fn, max_batch_size=4, max_wait_ms=1, name="test.errors")
+    try:
+        with pytest.raises(ValueError):
+            scheduler.run(1, timeout=5)
+    finally:
+        scheduler.stop()
+
+def test_batches_run_concurrently_up_to_max_concurrency():
+    # Dos lotes solo pasan la barrera si se ejecutan a la vez (una réplica cada uno)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def batch_fn(items):
+        barrier.wait()
+        return [item * 2 for item in items]
+
+    scheduler = BatchScheduler(batch_fn, max_batch_size=1 << 10, max_wait_ms=0, name="test.concurrent",
+                               max_concurrency=2)
+    try:
+        first = scheduler.submit(1)
+        second = scheduler.submit(2)
+        assert (first.result(timeout=5), second.result(timeout=5)) == (2, 4)
+    finally:
+        scheduler.stop()
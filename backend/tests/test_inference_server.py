@@ -0,0 +1,88 @@
+"""
+Tests del servidor de inferencia dedicado y su transferencia por memoria compartida.
+"""
+import os
+from multiprocessing import AuthenticationError
+
+import numpy as np
+import pytest
+import torch
+
+from app.core.config import settings
+from app.services import inference_server
+from app.services.inference_scheduler import BatchScheduler
+from app.services.inference_server import InferenceClient, InferenceServer
+from app.services.media_processor import MediaProcessor
+
+class FakeProcessor:
+    """Procesador sin modelos reales: la "red" CLIP duplica el tensor aplanado."""
+
+    def __init__(self):
+        self.clip_scheduler = BatchScheduler(lambda items: [tensor[0].flatten() * 2 for _, tensor in items],
+                                             max_batch_size=8, max_wait_ms=1, name="test_server")
+        self.opencv_classes = ["persona", "pelota"]
+
+    def _load_clip_model(self, variant=None):
+        pass
+
+    def _load_opencv_dnn_model(self, variant=None):
+        pass
+
+    def _yolo_forward(self, blob, variant=None):
+        rows = np.zeros((3, 7), dtype=np.float32)
+        rows[0, 5] = 0.9
+        rows[2, 6] = 0.7
+        return [rows[:2], rows[2:]]
+
+    def encode_clip_texts(self, texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    address = str(tmp_path / "inference.sock")
+    monkeypatch.setattr(settings, "INFERENCE_SERVER_ADDRESS", address)
+    monkeypatch.setattr(settings, "INFERENCE_AUTHKEY", "")
+    monkeypatch.setattr(settings, "CONFIG_DIR", tmp_path / "config")
+    monkeypatch.setattr(inference_server, "_client", None)
+    server = InferenceServer(address, processor=FakeProcessor())
+    server.start()
+    yield server
+    if inference_server._client is not None:
+        inference_server._client.close()
+    server.stop()
+
+def test_tensors_round_trip_through_shared_memory(server):
+    client = InferenceClient(server.address, slots=2, slot_bytes=4096)
+    try:
+        pixels = np.arange(24, dtype=np.float32).reshape(2, 3, 2, 2)
+        np.testing.assert_array_equal(client.run("clip_image", pixels), pixels.reshape(2, -1) * 2)
+
+        detections = client.run("yolo", np.zeros((1, 3, 4, 4), dtype=np.float32), min_score=0.5)
+        assert detections.shape == (2, 7)
+        assert client.run("yolo_classes") == ["persona", "pelota"]
+
+        with pytest.raises(ValueError):
+            client.run("clip_image", np.zeros(4096, dtype=np.float32))
+        with pytest.raises(RuntimeError):
+            client.run("desconocida")
+        # Los errores no dejan huecos ocupados
+        assert client.ring._free.qsize() == 2
+    finally:
+        client.close()
+
+def test_media_processor_uses_server_instead_of_local_models(server):
+    processor = MediaProcessor()
+    assert processor.use_inference_server
+    assert processor.encode_clip_texts(["una boda"]).shape == (1, 4)
+    features = processor._clip_image_features_batch([("clip_int8", torch.ones(1, 3, 2, 2))])
+    np.testing.assert_array_equal(features[0].numpy(), np.full(12, 2.0, dtype=np.float32))
+    assert processor.clip_pool.size == 0 and processor.clip_image_pool("clip_int8").size == 0
+
+def test_connection_requires_generated_private_key(server, tmp_path):
+    key_path = tmp_path / "config" / inference_server.AUTHKEY_FILENAME
+    assert key_path.stat().st_mode & 0o777 == 0o600
+    assert os.stat(server.address).st_mode & 0o777 == 0o600
+    assert inference_server.inference_authkey() == key_path.read_text().encode()
+
+    with pytest.raises(AuthenticationError):
+        InferenceClient(server.address, slots=1, slot_bytes=1024, authkey="clasificador")
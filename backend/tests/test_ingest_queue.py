@@ -0,0 +1,165 @@
+"""
+Tests de la cola de ingesta asíncrona.
+"""
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.crud import job as job_crud
+from app.crud import media as media_crud
+from app.models.job import JOB_COMPLETED, JOB_FAILED
+from app.schemas.media import MediaCreate
+from app.services.ingest_queue import IngestQueue
+from app.services.media_context import MediaContext
+
+class FakeProcessor:
+    """Procesador mínimo que evita cargar modelos reales."""
+
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.calls = 0
+
+    def open_context(self, file_path, mime_type):
+        return MediaContext(file_path, mime_type)
+
+    def create_thumbnail(self, file_path, mime_type, context=None):
+        self.calls += 1
+        if self.calls <= self.fail_times:
+            raise RuntimeError("fallo simulado")
+        return "/thumbnails/thumb_test.jpg"
+
+    def extract_metadata(self, file_path, mime_type, context=None):
+        return {"width": 10, "height": 20}
+
+    def predict_event(self, file_path, context=None, content_hash=None, need_embedding=False):
+        return "fiesta", 0.9
+
+@pytest.fixture
+def stored_media(test_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_DIR", tmp_path)
+    monkeypatch.setattr(settings, "INGEST_RETRY_DELAY", 0.0)
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "test.jpg").write_bytes(b"fake")
+    media = MediaCreate(filename="test.jpg", mime_type="image/jpeg", file_size=4)
+    return media_crud.create_media(test_db, media, "/uploads/test.jpg")
+
+def wait_for_job(db, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        db.expire_all()
+        db_job = job_crud.get_job(db, job_id)
+        if db_job is not None and db_job.status in (JOB_COMPLETED, JOB_FAILED):
+            return db_job
+        time.sleep(0.02)
+    raise AssertionError(f"El trabajo {job_id} no terminó a tiempo")
+
+def test_job_runs_all_stages(test_db, session_factory, stored_media):
+    queue = IngestQueue(FakeProcessor(), session_factory=session_factory, max_workers=1)
+    db_job = job_crud.create_job(test_db, stored_media.id)
+    queue.enqueue(db_job.id)
+    try:
+        db_job = wait_for_job(test_db, db_job.id)
+    finally:
+        queue.shutdown(wait=True)
+
+    assert db_job.status == JOB_COMPLETED
+    assert db_job.progress == 1.0
+    assert db_job.attempts == 1
+    test_db.refresh(stored_media)
+    assert stored_media.thumbnail_path == "/thumbnails/thumb_test.jpg"
+    assert stored_media.width == 10
+    assert stored_media.event_type == "fiesta"
+
+def test_job_is_retried_then_fails(test_db, session_factory, stored_media):
+    processor = FakeProcessor(fail_times=10)
+    queue = IngestQueue(processor, session_factory=session_factory, max_workers=1)
+    db_job = job_crud.create_job(test_db, stored_media.id)
+    queue.enqueue(db_job.id)
+    try:
+        db_job = wait_for_job(test_db, db_job.id)
+    finally:
+        queue.shutdown(wait=True)
+
+    assert db_job.status == JOB_FAILED
+    assert db_job.attempts == db_job.max_attempts
+    assert "fallo simulado" in db_job.error
+
+def test_job_runs_in_process_pool(test_db, session_factory, stored_media, tmp_path, monkeypatch):
+    from PIL import Image
+    from app.services.media_workers import MediaProcessPool
+
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(tmp_path / "uploads" / "test.jpg", "JPEG")
+    monkeypatch.setattr(settings, "THUMBNAILS_DIR", tmp_path / "thumbnails")
+    pool = MediaProcessPool(1)
+    queue = IngestQueue(FakeProcessor(), session_factory=session_factory, max_workers=1, process_pool=pool)
+    db_job = job_crud.create_job(test_db, stored_media.id)
+    queue.enqueue(db_job.id)
+    try:
+        db_job = wait_for_job(test_db, db_job.id, timeout=120.0)
+    finally:
+        queue.shutdown(wait=True)
+
+    assert db_job.status == JOB_COMPLETED
+    test_db.refresh(stored_media)
+    assert (stored_media.width, stored_media.height) == (64, 48)
+    assert stored_media.thumbnail_path == "/thumbnails/thumb_test.jpg"
+    assert (tmp_path / "thumbnails" / "thumb_test.jpg").exists()
+
+@pytest.fixture
+def file_session_factory(tmp_path):
+    # Base de datos en archivo: cada sesión abre su propia conexión, como en varios procesos
+    # (la de los demás tests comparte una sola conexión entre hilos)
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+def test_job_is_claimed_by_a_single_worker(file_session_factory, stored_media):
+    # Dos procesos de la API reencolan el mismo trabajo pendiente al arrancar
+    processor = FakeProcessor()
+    first = IngestQueue(processor, session_factory=file_session_factory, max_workers=1)
+    second = IngestQueue(processor, session_factory=file_session_factory, max_workers=1)
+    db = file_session_factory()
+    db_media = media_crud.create_media(db, MediaCreate(filename="test.jpg", mime_type="image/jpeg", file_size=4),
+                                       stored_media.file_path)
+    db_job = job_crud.create_job(db, db_media.id)
+    try:
+        first.start()
+        second.start()
+        db_job = wait_for_job(db, db_job.id)
+        time.sleep(0.1)
+    finally:
+        first.shutdown(wait=True)
+        second.shutdown(wait=True)
+        db.close()
+
+    assert db_job.status == JOB_COMPLETED
+    assert db_job.attempts == 1
+    assert processor.calls == 1
+
+def test_abandoned_running_job_is_requeued(test_db, session_factory, stored_media, monkeypatch):
+    db_job = job_crud.create_job(test_db, stored_media.id)
+    assert job_crud.claim_job(test_db, db_job.id)
+    assert not job_crud.claim_job(test_db, db_job.id)
+
+    queue = IngestQueue(FakeProcessor(), session_factory=session_factory, max_workers=1)
+    try:
+        assert queue.requeue_abandoned() == 0  # todavía dentro del plazo
+        monkeypatch.setattr(settings, "INGEST_JOB_LEASE_SECONDS", -60.0)
+        assert queue.requeue_abandoned() == 1
+        db_job = wait_for_job(test_db, db_job.id)
+    finally:
+        queue.shutdown(wait=True)
+
+    assert db_job.status == JOB_COMPLETED
+    assert db_job.attempts == 2
+
+def test_enqueue_is_refused_after_shutdown(session_factory):
+    queue = IngestQueue(FakeProcessor(), session_factory=session_factory, max_workers=1)
+    queue.start(recover=False)
+    queue.shutdown(wait=True)
+    with pytest.raises(RuntimeError):
+        queue.enqueue(1)
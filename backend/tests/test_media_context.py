@@ -0,0 +1,58 @@
+"""
+Tests del contexto de medio decodificado una sola vez.
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.media_context import MediaContext
+
+@pytest.fixture
+def rotated_jpeg(tmp_path):
+    """JPEG de 400x200 guardado de lado: EXIF Orientation 6 (girar 90° en sentido horario)."""
+    pixels = np.zeros((200, 400, 3), dtype=np.uint8)
+    pixels[:, :200] = (255, 0, 0)  # mitad izquierda roja, derecha azul
+    pixels[:, 200:] = (0, 0, 255)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    path = tmp_path / "lado.jpg"
+    Image.fromarray(pixels).save(path, quality=95, exif=exif.tobytes())
+    return path
+
+def test_image_is_decoded_reduced_and_oriented(rotated_jpeg):
+    with MediaContext(str(rotated_jpeg), "image/jpeg", max_side=100) as context:
+        assert int(context.exif_tags["Image Orientation"].values[0]) == 6
+        assert context.original_size == (400, 200)
+        image = context.image
+        # Girada a vertical y reducida a max_side
+        assert image.size == (50, 100)
+        # Tras el giro horario la mitad izquierda (roja) queda arriba
+        top, bottom = np.asarray(image)[10, 25], np.asarray(image)[90, 25]
+        assert top[0] > 200 and top[2] < 60
+        assert bottom[2] > 200 and bottom[0] < 60
+        # Un solo decodificado: las propiedades devuelven el mismo buffer
+        assert context.image is image
+        assert context.image_bgr.shape == (100, 50, 3)
+
+def test_video_is_opened_once(tmp_path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV sin codificador MJPG")
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+    opened = []
+    video_capture = cv2.VideoCapture
+    monkeypatch.setattr(cv2, "VideoCapture", lambda *args: opened.append(args) or video_capture(*args))
+
+    with MediaContext(str(path), "video/x-msvideo") as context:
+        assert context.video_info["width"] == 64 and context.video_info["height"] == 48
+        assert context.video_info["frame_count"] == 20
+        frame = context.video_frame
+        assert frame is not None and frame.shape == (48, 64, 3)
+        # Fotograma al 25% del vídeo (el quinto, gris 50)
+        assert abs(int(frame.mean()) - 50) <= 5
+    assert len(opened) == 1
@@ -0,0 +1,51 @@
+"""
+Tests del manifiesto de artefactos de modelos y del modo sin red.
+"""
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.errors import ModelUnavailableException
+from app.services.media_processor import MediaProcessor
+from app.services.model_artifacts import ModelManifest, read_mmap, require_artifact, sha256_file
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_DIR", tmp_path)
+    root = tmp_path / "models"
+    (root / "opencv_dnn").mkdir(parents=True)
+    return root
+
+def test_manifest_records_and_verifies_checksums(models):
+    weights = models / "opencv_dnn" / "tiny.weights"
+    weights.write_bytes(b"\x01" * 1000)
+    manifest = ModelManifest(models)
+    manifest.add(weights, source="https://example.invalid/tiny.weights")
+    manifest.save()
+
+    loaded = ModelManifest(models)
+    assert loaded.artifacts["opencv_dnn/tiny.weights"]["sha256"] == sha256_file(weights)
+    assert loaded.verify() == []
+    assert bytes(read_mmap(weights)[:3]) == b"\x01\x01\x01"
+
+    # Mismo tamaño, contenido distinto: solo lo detecta la verificación completa
+    weights.write_bytes(b"\x02" * 1000)
+    assert loaded.verify(full=False) == []
+    assert loaded.verify() == ["opencv_dnn/tiny.weights: SHA-256 distinto del manifiesto"]
+    weights.write_bytes(b"\x02" * 10)
+    with pytest.raises(ModelUnavailableException) as error:
+        require_artifact(weights)
+    assert error.value.status_code == 503
+
+def test_offline_mode_fails_fast_instead_of_downloading(models, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_OFFLINE", True)
+    processor = MediaProcessor(use_inference_server=False)
+
+    started = time.monotonic()
+    with pytest.raises(ModelUnavailableException, match="MODEL_OFFLINE"):
+        processor._opencv_dnn_paths("yolov4-tiny")
+    with pytest.raises(ModelUnavailableException, match="no encontrada"):
+        processor._opencv_dnn_paths("desconocida")
+    assert time.monotonic() - started < 1
+    assert list((models / "opencv_dnn").iterdir()) == []
@@ -0,0 +1,94 @@
+"""
+Tests del pool de réplicas de modelos.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.model_pool import ModelPool, ModelPoolTimeout, enforce_memory_budget
+
+def test_concurrent_first_use_loads_each_replica_once():
+    loads = []
+    lock = threading.Lock()
+
+    def factory():
+        time.sleep(0.05)  # carga lenta: todos los hilos llegan antes de que termine
+        with lock:
+            loads.append(len(loads))
+            return object()
+
+    pool = ModelPool("test_once", factory, replicas=2)
+    active, peak = [0], [0]
+
+    def use(_):
+        with pool.lease() as replica:
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return replica
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        replicas = set(map(id, executor.map(use, range(32))))
+
+    assert len(loads) == 2 and len(replicas) == 2
+    assert peak[0] <= 2
+    stats = pool.stats()
+    assert (stats["loaded"], stats["in_use"], stats["leases"]) == (2, 0, 32)
+    assert 0 < stats["utilization"] <= 1
+
+def test_waiters_time_out_and_failed_loads_free_the_slot():
+    pool = ModelPool("test_timeout", object, replicas=1)
+    with pool.lease():
+        with pytest.raises(ModelPoolTimeout):
+            pool.acquire(timeout=0.05)
+    assert pool.stats()["timeouts"] == 1
+
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("sin pesos")
+        return object()
+
+    pool = ModelPool("test_flaky", flaky, replicas=1)
+    with pytest.raises(RuntimeError):
+        pool.acquire(timeout=0.1)
+    with pool.lease(timeout=0.1) as replica:
+        assert replica is not None
+    assert pool.size == 1
+
+def test_idle_and_over_budget_replicas_are_unloaded_and_reloaded_lazily():
+    loads = []
+
+    def factory(name):
+        def load():
+            loads.append(name)
+            return object()
+        return load
+
+    clip = ModelPool("test_budget_clip", factory("clip"), replicas=1, size_fn=lambda _: 600)
+    yolo = ModelPool("test_budget_yolo", factory("yolo"), replicas=1, size_fn=lambda _: 250)
+    pools = [clip, yolo]
+    clip.warm(1)
+    yolo.warm(1)
+
+    # Presupuesto excedido: se descarga el usado hace más tiempo (clip)
+    assert enforce_memory_budget(budget_bytes=700, idle_ttl=0, pools=pools) == 1
+    assert (clip.size, clip.resident_bytes, yolo.resident_bytes) == (0, 0, 250)
+
+    # Usar clip de nuevo lo recarga; por TTL se descarga todo lo inactivo
+    with clip.lease():
+        pass
+    assert loads == ["clip", "yolo", "clip"]
+    time.sleep(0.05)
+    with yolo.lease():
+        pass
+    assert enforce_memory_budget(budget_bytes=0, idle_ttl=0.03, pools=pools) == 1
+    assert (clip.size, yolo.size) == (0, 1)
+    assert clip.stats()["evictions"] == 2
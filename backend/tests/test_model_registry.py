@@ -0,0 +1,61 @@
+"""
+Tests del registro de modelos (precarga, calentamiento y /ready).
+"""
+from app.core.config import settings
+from app.services import model_registry as model_registry_module
+from app.services.model_pool import ModelPool
+from app.services.model_registry import MODEL_FAILED, MODEL_READY, ModelRegistry
+
+class FakeProcessor:
+    use_inference_server = False
+
+    def __init__(self, fail_yolo=False):
+        self.fail_yolo = fail_yolo
+        self.clip_pool = ModelPool("test_registry_clip", object, replicas=2)
+        self.warmup_sizes = []
+
+    def _load_clip_model(self, variant=None):
+        self.clip_pool.warm(1)
+
+    def clip_image_pool(self, variant=None):
+        return self.clip_pool
+
+    def _predict_event_clip(self, file_path, context, variant=None):
+        self.warmup_sizes.append(context.image.size)
+        return "boda", 0.9
+
+    def _load_opencv_dnn_model(self, variant=None):
+        if self.fail_yolo:
+            raise RuntimeError("pesos no encontrados")
+
+def test_preload_loads_replicas_and_warms_up():
+    processor = FakeProcessor()
+    registry = ModelRegistry(processor, warmup_runs=2)
+    registry.preload("clip", background=False)
+
+    status = registry.status("clip")
+    assert status["ready"]
+    clip = status["models"]["clip"]
+    assert clip["state"] == MODEL_READY
+    assert clip["load_seconds"] is not None and clip["warm_inference_ms"] is not None
+    assert processor.clip_pool.size == 2
+    assert processor.warmup_sizes == [(640, 480), (640, 480)]
+    # Ya listo: una segunda precarga no repite el trabajo
+    assert registry.preload("clip") is None
+
+def test_ready_endpoint_reports_failures(client, monkeypatch):
+    registry = ModelRegistry(FakeProcessor(fail_yolo=True), warmup_runs=1)
+    monkeypatch.setattr(model_registry_module, "_registry", registry)
+    monkeypatch.setattr(settings, "MODEL_PRELOAD", True)
+    monkeypatch.setattr(settings, "AI_MODEL", "opencv_yolo")
+
+    assert client.get("/ready").status_code == 503
+    registry.preload(background=False)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["models"]["yolo"]["state"] == MODEL_FAILED
+    assert "pesos" in response.json()["models"]["yolo"]["error"]
+
+    monkeypatch.setattr(settings, "AI_MODEL", "clip")
+    registry.preload(background=False)
+    assert client.get("/ready").status_code == 200
@@ -0,0 +1,79 @@
+"""
+Tests de la reclasificación de la biblioteca con los embeddings almacenados.
+"""
+import numpy as np
+import pytest
+
+from app.api.v1 import media as media_api
+from app.core.config import settings
+from app.crud import media as media_crud
+from app.models.media import Media
+from app.schemas.media import MediaCreate
+from app.services import embedding_store
+from app.services.embedding_store import get_embedding_store
+from app.services.reclassify import reclassify_library
+
+LABELS = [
+    {"prompt": "a wedding", "label": "boda"},
+    {"prompt": "a football match", "label": "deporte"},
+]
+PROMPT_VECTORS = {
+    "a wedding": np.array([1, 0, 0], dtype=np.float32),
+    "a football match": np.array([0, 1, 0], dtype=np.float32),
+}
+
+@pytest.fixture
+def library(test_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_DIR", tmp_path / "embeddings")
+    monkeypatch.setattr(embedding_store, "_stores", {})
+    monkeypatch.setattr(media_api.media_processor, "clip_text_features",
+                        lambda texts: np.stack([PROMPT_VECTORS[text] for text in texts]))
+
+    ids = []
+    for name, vector in (("boda.jpg", [1, 0.1, 0]), ("partido.jpg", [0.1, 1, 0]), ("fiesta.jpg", [0.9, 0.2, 0])):
+        db_media = media_crud.create_media(
+            test_db, MediaCreate(filename=name, mime_type="image/jpeg", file_size=1), f"/uploads/{name}"
+        )
+        db_media.event_type = "otro"
+        db_media.classified_by = "clip_int8"
+        test_db.commit()
+        get_embedding_store().add(db_media.id, np.asarray(vector, dtype=np.float32))
+        ids.append(db_media.id)
+    return ids
+
+def reclassify(client, **body):
+    response = client.post(f"{settings.API_V1_STR}/media/reclassify/", json={"labels": LABELS, **body})
+    assert response.status_code == 200
+    return response.json()
+
+def stored(test_db, media_id):
+    test_db.expire_all()
+    db_media = test_db.get(Media, media_id)
+    return db_media.event_type, db_media.classified_by
+
+def test_dry_run_reports_without_writing(client, test_db, library):
+    result = reclassify(client, dry_run=True)
+    assert result["updated"] == 0
+    assert result["matched"] == 3
+    assert result["distribution"] == {"boda": 2, "deporte": 1}
+    assert all(stored(test_db, media_id) == ("otro", "clip_int8") for media_id in library)
+
+def test_reclassify_marks_rows_and_keeps_manual_labels(client, test_db, library):
+    wedding, football, party = library
+    patched = client.patch(f"{settings.API_V1_STR}/media/{party}", json={"event_type": "fiesta"})
+    assert patched.json()["classified_by"] == "manual"
+
+    result = reclassify(client)
+    assert result["updated"] == 2
+    assert result["skipped_manual"] == 1
+    assert stored(test_db, wedding) == ("boda", "reclassify")
+    assert stored(test_db, football) == ("deporte", "reclassify")
+    assert stored(test_db, party) == ("fiesta", "manual")
+
+    result = reclassify(client, skip_manual=False)
+    assert result["updated"] == 3
+    assert stored(test_db, party) == ("boda", "reclassify")
+
+def test_labels_must_match_prompts(test_db, library):
+    with pytest.raises(ValueError):
+        reclassify_library(test_db, media_api.media_processor, ["a wedding", "a football match"], ["boda"])
@@ -0,0 +1,74 @@
+"""
+Tests del protocolo de subida reanudable por bloques.
+"""
+import hashlib
+
+from app.core.config import settings
+
+# Cabecera "ftyp" de QuickTime: libmagic lo detecta como video/quicktime
+CONTENT = b"\x00\x00\x00\x14ftypqt  \x00\x00\x02\x00qt  " + bytes(range(256)) * 40
+
+def create_session(client, content=CONTENT, content_hash=None, filename="video largo.mov",
+                   mime_type="video/quicktime"):
+    response = client.post(f"{settings.API_V1_STR}/media/uploads", json={
+        "filename": filename,
+        "mime_type": mime_type,
+        "total_size": len(content),
+        "content_hash": content_hash or hashlib.sha256(content).hexdigest(),
+    })
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def put_range(client, session_id, start, end, content=CONTENT):
+    return client.put(
+        f"{settings.API_V1_STR}/media/uploads/{session_id}",
+        content=content[start:end],
+        headers={"Content-Range": f"bytes {start}-{end - 1}/{len(content)}"}
+    )
+
+def test_resume_after_interruption_and_finalize(client, upload_storage):
+    session_id = create_session(client)
+    assert put_range(client, session_id, 0, 4000).json()["received"] == 4000
+
+    # Un bloque que no continúa lo recibido se rechaza indicando el desplazamiento actual
+    conflict = put_range(client, session_id, 6000, 8000)
+    assert conflict.status_code == 409
+    assert conflict.json()["detail"]["received"] == 4000
+
+    status = client.get(f"{settings.API_V1_STR}/media/uploads/{session_id}").json()
+    put_range(client, session_id, status["received"], len(CONTENT))
+
+    done = client.post(f"{settings.API_V1_STR}/media/uploads/{session_id}/complete")
+    assert done.status_code == 202
+    media = client.get(f"{settings.API_V1_STR}/media/{done.json()['media_id']}").json()
+    assert media["filename"] == "video_largo.mov"
+    stored = upload_storage / "uploads" / f"{hashlib.sha256(CONTENT).hexdigest()}.mov"
+    assert stored.read_bytes() == CONTENT
+    assert list((upload_storage / "incoming").iterdir()) == []
+
+def test_checksum_mismatch_resets_session(client, upload_storage):
+    session_id = create_session(client, content_hash="0" * 64)
+    put_range(client, session_id, 0, len(CONTENT))
+
+    done = client.post(f"{settings.API_V1_STR}/media/uploads/{session_id}/complete")
+    assert done.status_code == 422
+    status = client.get(f"{settings.API_V1_STR}/media/uploads/{session_id}").json()
+    assert status["received"] == 0
+
+def test_content_type_is_detected_not_trusted(client, upload_storage):
+    fake_jpeg = b"#!/bin/sh\necho esto no es una imagen\n" * 10
+    session_id = create_session(client, content=fake_jpeg, filename="foto.jpg", mime_type="image/jpeg")
+    put_range(client, session_id, 0, len(fake_jpeg), content=fake_jpeg)
+
+    done = client.post(f"{settings.API_V1_STR}/media/uploads/{session_id}/complete")
+    assert done.status_code == 422
+    status = client.get(f"{settings.API_V1_STR}/media/uploads/{session_id}").json()
+    assert status["status"] == "rejected"
+    assert list((upload_storage / "incoming").iterdir()) == []
+
+    # Los tipos no permitidos se rechazan ya al crear la sesión
+    response = client.post(f"{settings.API_V1_STR}/media/uploads", json={
+        "filename": "doc.svg", "mime_type": "image/svg+xml",
+        "total_size": 10, "content_hash": "0" * 64,
+    })
+    assert response.status_code == 400
@@ -0,0 +1,79 @@
+"""
+Tests de la búsqueda semántica texto → imagen (``GET /media/search``).
+"""
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.api.v1 import media as media_api
+from app.core.config import settings
+from app.crud import media as media_crud
+from app.schemas.media import MediaCreate
+from app.services import embedding_store, semantic_search
+from app.services.embedding_store import get_embedding_store
+
+# Consultas con embedding conocido (ejes de un espacio de dimensión 4)
+QUERY_VECTORS = {
+    "una boda": np.array([1, 0, 0, 0], dtype=np.float32),
+    "un partido de fútbol": np.array([0, 1, 0, 0], dtype=np.float32),
+}
+
+@pytest.fixture
+def library(test_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_DIR", tmp_path / "embeddings")
+    monkeypatch.setattr(embedding_store, "_stores", {})
+    monkeypatch.setattr(semantic_search, "_query_cache", OrderedDict())
+    monkeypatch.setattr(media_api.media_processor, "encode_clip_texts",
+                        lambda texts: np.stack([QUERY_VECTORS[text] for text in texts]))
+
+    def add(name, vector, event_type, creation_date):
+        db_media = media_crud.create_media(
+            test_db, MediaCreate(filename=name, mime_type="image/jpeg", file_size=1), f"/uploads/{name}"
+        )
+        db_media.event_type = event_type
+        db_media.creation_date = creation_date
+        test_db.commit()
+        get_embedding_store().add(db_media.id, np.asarray(vector, dtype=np.float32))
+        return db_media.id
+
+    return add
+
+def search(client, **params):
+    response = client.get(f"{settings.API_V1_STR}/media/search", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+def test_results_are_ranked_by_similarity(client, library):
+    far = library("lejos.jpg", [0.2, 1, 0, 0], "deporte", datetime(2024, 1, 1))
+    best = library("boda.jpg", [1, 0.1, 0, 0], "boda", datetime(2024, 5, 1))
+    middle = library("banquete.jpg", [1, 0.8, 0, 0], "boda", datetime(2024, 6, 1))
+
+    results = search(client, q="una boda")
+    assert [item["id"] for item in results] == [best, middle, far]
+    scores = [item["score"] for item in results]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == pytest.approx(1 / np.sqrt(1.01), abs=1e-3)
+
+    assert [item["id"] for item in search(client, q="una boda", limit=1)] == [best]
+    assert search(client, q="un partido de fútbol")[0]["id"] == far
+
+def test_filters_are_applied_before_ranking(client, library):
+    library("boda.jpg", [1, 0, 0, 0], "boda", datetime(2024, 5, 1))
+    football = library("partido.jpg", [0.9, 0.4, 0, 0], "deporte", datetime(2023, 9, 1))
+    late = library("fiesta.jpg", [0.8, 0.6, 0, 0], "fiesta", datetime(2025, 2, 1))
+
+    assert [item["id"] for item in search(client, q="una boda", event_type="deporte")] == [football]
+    ranged = search(client, q="una boda", date_from="2024-06-01T00:00:00", date_to="2025-12-31T00:00:00")
+    assert [item["id"] for item in ranged] == [late]
+    assert search(client, q="una boda", event_type="deporte", date_from="2024-01-01T00:00:00") == []
+
+def test_empty_store_returns_no_results(client, library):
+    assert search(client, q="una boda") == []
+
+def test_search_route_is_not_taken_as_a_media_id(client, library):
+    # Si /{media_id} se declarase antes, "search" llegaría a get_media como id
+    response = client.get(f"{settings.API_V1_STR}/media/search")
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"][0]["loc"] == ["query", "q"]
@@ -0,0 +1,33 @@
+"""
+Presupuesto de tiempo de arranque: ``import app.main`` no debe cargar backends de inferencia.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Segundos; se puede ampliar en máquinas lentas con STARTUP_IMPORT_BUDGET
+IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "2.5"))
+HEAVY_MODULES = ("torch", "cv2", "transformers", "exifread", "pyheif")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def test_import_app_main_is_fast_and_lazy(tmp_path):
+    (tmp_path / "storage").mkdir()  # la base de datos se crea antes que los directorios
+    env = dict(os.environ, CLASIFICADOR_BASE_DIR=str(tmp_path))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    assert probe["loaded"] == []
+    assert probe["seconds"] < IMPORT_BUDGET, f"import app.main tardó {probe['seconds']:.2f}s"
@@ -0,0 +1,122 @@
+"""
+Tests de la deduplicación por contenido en la subida de archivos.
+"""
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.crud import media as media_crud
+from app.services.uploads import PendingUpload, incoming_path, store_upload, store_uploads
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+PHOTO_A = jpeg_bytes((255, 0, 0))
+PHOTO_B = jpeg_bytes((0, 0, 255))
+
+@pytest.fixture
+def uploads_dir(upload_storage):
+    return upload_storage / "uploads"
+
+def upload(client, name, content):
+    return client.post(
+        f"{settings.API_V1_STR}/media/upload/",
+        files={"file": (name, content, "image/jpeg")}
+    )
+
+def test_same_content_returns_existing_media(client, uploads_dir):
+    first = upload(client, "IMG_0001.jpg", PHOTO_A)
+    assert first.status_code == 202
+    assert first.json()["duplicate"] is False
+
+    again = upload(client, "copia.jpg", PHOTO_A)
+    assert again.status_code == 200
+    assert again.json()["duplicate"] is True
+    assert again.json()["media_id"] == first.json()["media_id"]
+    assert again.json()["job_id"] == first.json()["job_id"]
+
+    digest = hashlib.sha256(PHOTO_A).hexdigest()
+    assert sorted(p.name for p in uploads_dir.iterdir()) == [f"{digest}.jpg"]
+
+def test_same_name_different_content_does_not_overwrite(client, uploads_dir):
+    first = upload(client, "IMG_0001.jpg", PHOTO_A)
+    second = upload(client, "IMG_0001.jpg", PHOTO_B)
+    assert second.status_code == 202
+    assert second.json()["media_id"] != first.json()["media_id"]
+    assert len(list(uploads_dir.iterdir())) == 2
+
+def test_check_reports_known_hashes(client, uploads_dir):
+    stored = upload(client, "IMG_0001.jpg", PHOTO_A).json()
+    known = hashlib.sha256(PHOTO_A).hexdigest()
+    unknown = hashlib.sha256(PHOTO_B).hexdigest()
+
+    response = client.post(f"{settings.API_V1_STR}/media/upload/check", json={"files": [
+        {"content_hash": known.upper(), "file_size": len(PHOTO_A)},
+        {"content_hash": unknown, "file_size": len(PHOTO_A)},
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {
+        "existing": [{"content_hash": known, "media_id": stored["media_id"]}],
+        "missing": [unknown],
+    }
+
+def test_streaming_upload_rejects_wrong_type_and_oversized_files(client, uploads_dir, monkeypatch):
+    rejected = upload(client, "notas.jpg", b"esto no es una imagen")
+    assert rejected.status_code == 400
+
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", len(PHOTO_A) - 1)
+    too_big = upload(client, "IMG_0002.jpg", PHOTO_A)
+    assert too_big.status_code == 413
+
+    assert list((uploads_dir.parent / "incoming").iterdir()) == []
+    assert not uploads_dir.exists() or list(uploads_dir.iterdir()) == []
+
+def test_batch_upload_reports_per_file_status(client, uploads_dir):
+    upload(client, "IMG_0001.jpg", PHOTO_A)
+    photo_c = jpeg_bytes((0, 255, 0))
+
+    response = client.post(f"{settings.API_V1_STR}/media/upload/batch", files=[
+        ("files", ("a.jpg", PHOTO_A, "image/jpeg")),
+        ("files", ("b.jpg", PHOTO_B, "image/jpeg")),
+        ("files", ("b-copia.jpg", PHOTO_B, "image/jpeg")),
+        ("files", ("c.jpg", photo_c, "image/jpeg")),
+        ("files", ("notas.txt", b"texto", "text/plain")),
+    ])
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["accepted"], body["duplicates"], body["failed"]) == (2, 2, 1)
+    assert [item["status"] for item in body["items"]] == ["duplicate", "accepted", "duplicate", "accepted", "error"]
+    assert body["items"][2]["media_id"] == body["items"][1]["media_id"]
+    assert all(item["job_id"] for item in body["items"][1:4:2])
+    assert len(list(uploads_dir.iterdir())) == 3
+
+def pending_upload(upload_storage, name, content):
+    temp_path = incoming_path(f"{name}.part")
+    temp_path.write_bytes(content)
+    return PendingUpload(temp_path, name, "image/jpeg", hashlib.sha256(content).hexdigest(), len(content))
+
+def test_losing_a_concurrent_insert_leaves_no_copy(test_db, upload_storage, monkeypatch):
+    # Otra subida registró el mismo contenido como .jpeg entre la consulta y el insert
+    winner = store_upload(test_db, *pending_upload(upload_storage, "foto.jpeg", PHOTO_A))[0]
+    monkeypatch.setattr(media_crud, "get_media_by_hashes", lambda db, hashes: [])
+
+    db_media, created = store_uploads(test_db, [pending_upload(upload_storage, "foto.jpg", PHOTO_A)])[0]
+    assert not created and db_media.id == winner.id
+    assert [p.name for p in (upload_storage / "uploads").iterdir()] == [Path(winner.file_path).name]
+    assert list((upload_storage / "incoming").iterdir()) == []
+
+def test_failed_insert_leaves_no_files(test_db, upload_storage, monkeypatch):
+    def fail(db, items, commit=True):
+        raise RuntimeError("base de datos no disponible")
+    monkeypatch.setattr(media_crud, "create_media_batch", fail)
+
+    with pytest.raises(RuntimeError):
+        store_uploads(test_db, [pending_upload(upload_storage, "foto.jpg", PHOTO_A)])
+    assert not (upload_storage / "uploads").exists() or list((upload_storage / "uploads").iterdir()) == []
+    assert list((upload_storage / "incoming").iterdir()) == []
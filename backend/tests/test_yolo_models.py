@@ -0,0 +1,42 @@
+"""
+Tests de las variantes de YOLO (descubrimiento, tamaño de entrada y latencia por variante).
+"""
+import numpy as np
+
+from app.core.metrics import metrics
+from app.services.media_processor import MediaProcessor
+from app.services.model_pool import ModelPool
+from app.services.yolo_models import discover_yolo_bundles, yolo_input_size
+
+def test_discovers_complete_bundles(tmp_path):
+    for name in ("yolov4-tiny.cfg", "yolov4-tiny.weights", "coco.names",
+                 "custom.cfg", "custom.weights", "custom.names", "incomplete.cfg"):
+        (tmp_path / name).write_text("x")
+
+    bundles = discover_yolo_bundles(tmp_path)
+
+    assert sorted(bundles) == ["custom", "yolov4-tiny"]
+    assert bundles["custom"].classes_path.name == "custom.names"
+    assert bundles["yolov4-tiny"].classes_path.name == "coco.names"
+    assert discover_yolo_bundles(tmp_path / "no-existe") == {}
+
+def test_input_size_is_a_multiple_of_32():
+    assert [yolo_input_size(s) for s in (416, 320, 300, 288, 10)] == [416, 320, 288, 288, 32]
+
+class FakeNet:
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self, layers):
+        return [np.zeros((1, 85), np.float32) for _ in layers]
+
+def test_forward_uses_the_variant_pool_and_records_latency():
+    processor = MediaProcessor(use_inference_server=False)
+    processor.yolo_pools["test-tiny"] = ModelPool("test-tiny", lambda: (FakeNet(), ["a", "b"]))
+
+    outputs = processor._yolo_forward(np.zeros((1, 3, 288, 288), np.float32), "test-tiny")
+
+    assert len(outputs) == 2
+    assert processor.yolo_variant_pool("test-tiny").stats()["leases"] == 1
+    snapshot = metrics.snapshot("yolo.test-tiny.288")["histograms"]
+    assert snapshot["yolo.test-tiny.288.forward_ms"]["count"] == 1
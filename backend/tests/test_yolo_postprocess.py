@@ -0,0 +1,55 @@
+"""
+Tests del post-procesado vectorizado de YOLO.
+"""
+import numpy as np
+import pytest
+
+from app.services.yolo_postprocess import UNKNOWN_EVENT, YoloEventScorer
+
+CLASSES = ["person", "tie", "cake", "toothbrush"] + [f"clase {i}" for i in range(76)]
+
+def row(class_name, confidence, cx, cy, w=0.2, h=0.4):
+    values = np.zeros(5 + len(CLASSES), dtype=np.float32)
+    values[:5] = (cx, cy, w, h, confidence)
+    values[5 + CLASSES.index(class_name)] = confidence
+    return values
+
+def test_duplicates_are_suppressed_per_class_and_events_scored():
+    scorer = YoloEventScorer(CLASSES)
+    outputs = [
+        np.stack([row("person", 0.9, 0.30, 0.5), row("person", 0.8, 0.31, 0.5), row("tie", 0.7, 0.30, 0.45)]),
+        np.stack([row("person", 0.6, 0.29, 0.51), row("cake", 0.8, 0.8, 0.8, 0.1, 0.1), row("cake", 0.4, 0.1, 0.1)]),
+    ]
+
+    class_ids, confidences = scorer.detect(outputs, 640, 480)
+
+    assert sorted((c, round(v, 2)) for c, v in zip(class_ids.tolist(), confidences.tolist())) == \
+        [(0, 0.9), (1, 0.7), (2, 0.8)]
+    # boda: persona, corbata y tarta (peso 1.3) con bonificación por 3 objetos únicos
+    event, score, _ = scorer.best_event(scorer.event_scores(class_ids, confidences), confidences)
+    assert event == "boda"
+    assert score == pytest.approx((0.9 + 0.7 + 0.8) * 1.3 * 1.3, rel=1e-5)
+    assert scorer.describe(class_ids, confidences)[0] == "person x1 (máx 0.9000)"
+
+def test_low_scores_and_empty_outputs_are_unknown():
+    scorer = YoloEventScorer(CLASSES)
+    def classify(outputs):
+        class_ids, confidences = scorer.detect(outputs, 100, 100)
+        return scorer.best_event(scorer.event_scores(class_ids, confidences), confidences)
+
+    assert classify([np.stack([row("toothbrush", 0.65, 0.5, 0.5)])]) == (UNKNOWN_EVENT, pytest.approx(0.65), 0.0)
+    assert classify([np.zeros((0, 85), np.float32)]) == (UNKNOWN_EVENT, 0.0, 0.0)
+
+def test_margin_is_relative_gap_between_the_two_best_events():
+    scorer = YoloEventScorer(CLASSES)
+    class_ids, confidences = np.array([0, 1, 2]), np.array([0.9, 0.7, 0.8], dtype=np.float32)
+
+    scores = scorer.event_scores(class_ids, confidences)
+    event, score, margin = scorer.best_event(scores, confidences)
+
+    runner_up = np.sort(scores)[-2]
+    assert event == "boda"
+    assert margin == pytest.approx((score - runner_up) / score, rel=1e-5)
+    assert 0.0 < margin < 1.0
+    empty = np.zeros(0, np.float32)
+    assert scorer.best_event(scorer.event_scores(np.zeros(0, np.int64), empty), empty)[2] == 0.0
@@ -18,6 +18,8 @@ import { ReactQueryDevtools } from '@tanstack/react-query-devtools';
 import { Header, UploadArea, MediaGrid, MediaTable, AIModelSelector } from './components';
 import { mediaService } from './services';
 import type { Media, MediaUpdate } from './services/mediaService';
+import { AIModelLabels } from './types/common';
+import type { AIModelType } from './types/common';
 
 const queryClient = new QueryClient({
     defaultOptions: {
@@ -144,21 +146,18 @@ function AppContent() {
     const handleUpload = async (files: File[]) => {
         setIsUploading(true);
         try {
-            // Subir archivos uno por uno y manejar errores individualmente
-            for (const file of files) {
-                try {
-                    await mediaService.uploadFile(file);
-                } catch (error) {
-                    console.error(`Error uploading file ${file.name}:`, error);
-                    showNotification(`Error al subir el archivo ${file.name}`, 'error');
-                }
-            }
+            // Subir solo los archivos que el servidor no tiene todavía
+            const summary = await mediaService.uploadFiles(files);
+            summary.failed.forEach((name) => {
+                showNotification(`Error al subir el archivo ${name}`, 'error');
+            });
             
             // Recargar la lista después de subir todos los archivos
             queryClient.removeQueries({ queryKey: ['mediaList'] });
             await refetch();
             
-            showNotification('Archivos procesados exitosamente', 'success');
+            const skipped = summary.skipped > 0 ? ` (${summary.skipped} ya estaban en el servidor)` : '';
+            showNotification(`Archivos subidos; se están procesando en segundo plano${skipped}`, 'success');
         } catch (error) {
             console.error('Error general en la subida:', error);
             showNotification('Error al procesar los archivos', 'error');
@@ -243,7 +242,7 @@ function AppContent() {
                 {/* AI Model Selector */}
                 <AIModelSelector 
                     onModelChange={(model) => {
-                        showNotification(`Modelo cambiado a ${model === 'clip' ? 'CLIP' : 'OpenCV+DNN'}`, 'success');
+                        showNotification(`Modelo cambiado a ${AIModelLabels[model as AIModelType] ?? model}`, 'success');
                     }}
                 />
 
@@ -14,13 +14,15 @@ import {
   Snackbar
 } from '@mui/material';
 import { getSystemConfig, setAIModel } from '../services/configService';
+import { AIModelLabels } from '../types/common';
+import type { AIModelType } from '../types/common';
 
 interface AIModelSelectorProps {
   onModelChange?: (model: string) => void;
 }
 
 const AIModelSelector: React.FC<AIModelSelectorProps> = ({ onModelChange }) => {
-  const [currentModel, setCurrentModel] = useState<'clip' | 'opencv_dnn' | 'opencv_yolo'>('clip');
+  const [currentModel, setCurrentModel] = useState<AIModelType>('clip');
   const [loading, setLoading] = useState(true);
   const [saving, setSaving] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -47,7 +49,7 @@ const AIModelSelector: React.FC<AIModelSelectorProps> = ({ onModelChange }) => {
 
   // Manejar cambio de modelo
   const handleModelChange = (event: React.ChangeEvent<HTMLInputElement>) => {
-    setCurrentModel(event.target.value as 'clip' | 'opencv_dnn');
+    setCurrentModel(event.target.value as AIModelType);
   };
 
   // Guardar la configuración
@@ -58,17 +60,7 @@ const AIModelSelector: React.FC<AIModelSelectorProps> = ({ onModelChange }) => {
       
       await setAIModel(currentModel);
       
-      // Determinar mensaje según el modelo seleccionado
-      let modelDisplayName = '';
-      if (currentModel === 'clip') {
-        modelDisplayName = 'CLIP';
-      } else if (currentModel === 'opencv_dnn') {
-        modelDisplayName = 'OpenCV+DNN';
-      } else if (currentModel === 'opencv_yolo') {
-        modelDisplayName = 'OpenCV+YOLO';
-      }
-      
-      setSuccess(`Modelo cambiado a ${modelDisplayName}`);
+      setSuccess(`Modelo cambiado a ${AIModelLabels[currentModel]}`);
       
       if (onModelChange) {
         onModelChange(currentModel);
@@ -109,6 +101,16 @@ const AIModelSelector: React.FC<AIModelSelectorProps> = ({ onModelChange }) => {
             control={<Radio />} 
             label="CLIP (mayor precisión en la clasificación de eventos)" 
           />
+          <FormControlLabel 
+            value="clip_onnx" 
+            control={<Radio />} 
+            label="CLIP con ONNX Runtime (misma precisión, más rápido en CPU)" 
+          />
+          <FormControlLabel 
+            value="clip_int8" 
+            control={<Radio />} 
+            label="CLIP cuantizado int8 (menos memoria, precisión ligeramente menor)" 
+          />
           <FormControlLabel 
             value="opencv_dnn" 
             control={<Radio />} 
@@ -119,6 +121,11 @@ const AIModelSelector: React.FC<AIModelSelectorProps> = ({ onModelChange }) => {
             control={<Radio />} 
             label="OpenCV + YOLO (detección de objetos avanzada)" 
           />
+          <FormControlLabel 
+            value="cascade" 
+            control={<Radio />} 
+            label="Cascada: YOLO ligero y CLIP solo en las imágenes dudosas (mucho más rápido)" 
+          />
         </RadioGroup>
       </FormControl>
       
@@ -146,6 +153,10 @@ const AIModelSelector: React.FC<AIModelSelectorProps> = ({ onModelChange }) => {
           <strong>CLIP:</strong> Modelo de OpenAI que ofrece alta precisión en la detección de eventos en imágenes, 
           pero requiere más recursos computacionales.
         </Typography>
+        <Typography variant="body2" color="textSecondary" mt={1}>
+          <strong>CLIP ONNX / int8:</strong> El mismo modelo CLIP con el codificador de imagen optimizado para CPU 
+          (ONNX Runtime o pesos cuantizados a 8 bits). Usan las mismas etiquetas y embeddings que CLIP.
+        </Typography>
         <Typography variant="body2" color="textSecondary" mt={1}>
           <strong>OpenCV + DNN:</strong> Utiliza redes neuronales preentrenadas (ResNet-50) para detectar objetos 
           en imágenes con menor uso de recursos, aunque con menor precisión para eventos específicos.
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import type { AIModelType } from '../types/common';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api/v1';
 
@@ -17,9 +18,9 @@ export const getSystemConfig = async () => {
 
 /**
  * Cambia el modelo de IA a utilizar
- * @param model - Modelo a utilizar ('clip', 'opencv_dnn' o 'opencv_yolo')
+ * @param model - Modelo a utilizar ('clip', 'clip_onnx', 'clip_int8', 'opencv_dnn', 'opencv_yolo' o 'cascade')
  */
-export const setAIModel = async (model: 'clip' | 'opencv_dnn' | 'opencv_yolo') => {
+export const setAIModel = async (model: AIModelType) => {
   try {
     const response = await axios.post(`${API_URL}/config/ai-model`, {
       model
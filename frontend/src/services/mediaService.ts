@@ -14,6 +14,7 @@ export interface Media {
     filename: string;
     file_path: string;
     file_size: number;
+    content_hash?: string | null;
     created_at: string;
     updated_at: string;
     creation_date?: string;
@@ -27,6 +28,53 @@ export interface Media {
     longitude?: number | null;
     event_type?: string | null;
     event_confidence?: number | null;
+    classified_by?: string | null;
+}
+
+export interface UploadAccepted {
+    job_id: number | null;
+    media_id: number;
+    status: string;
+    status_url: string | null;
+    duplicate: boolean;
+}
+
+export interface UploadCheckResult {
+    existing: { content_hash: string; media_id: number }[];
+    missing: string[];
+}
+
+export interface BatchUploadItem {
+    filename: string;
+    status: 'accepted' | 'duplicate' | 'error';
+    media_id: number | null;
+    job_id: number | null;
+    status_url: string | null;
+    error: string | null;
+}
+
+export interface BatchUploadResult {
+    accepted: number;
+    duplicates: number;
+    failed: number;
+    items: BatchUploadItem[];
+}
+
+export interface UploadSummary {
+    uploaded: BatchUploadItem[];
+    skipped: number;
+    failed: string[];
+}
+
+export interface IngestJob {
+    id: number;
+    media_id: number;
+    status: 'queued' | 'running' | 'retrying' | 'completed' | 'failed';
+    stage?: string | null;
+    progress: number;
+    attempts: number;
+    max_attempts: number;
+    error?: string | null;
 }
 
 export interface MediaUpdate {
@@ -35,6 +83,46 @@ export interface MediaUpdate {
     longitude?: number | null;
 }
 
+// Número máximo de hashes por petición de comprobación
+const UPLOAD_CHECK_BATCH = 1000;
+
+// Límites de cada petición de subida por lotes
+const UPLOAD_BATCH_MAX_FILES = 100;
+const UPLOAD_BATCH_MAX_BYTES = 256 * 1024 * 1024;
+
+const splitIntoBatches = (files: File[]): File[][] => {
+    const batches: File[][] = [];
+    let current: File[] = [];
+    let currentBytes = 0;
+    for (const file of files) {
+        if (current.length > 0 &&
+            (current.length >= UPLOAD_BATCH_MAX_FILES || currentBytes + file.size > UPLOAD_BATCH_MAX_BYTES)) {
+            batches.push(current);
+            current = [];
+            currentBytes = 0;
+        }
+        current.push(file);
+        currentBytes += file.size;
+    }
+    if (current.length > 0) batches.push(current);
+    return batches;
+};
+
+// crypto.subtle no tiene hash incremental: el archivo se lee entero en memoria,
+// así que por encima de este tamaño no se calcula y el servidor deduplica al recibirlo
+const HASH_MAX_FILE_SIZE = 64 * 1024 * 1024;
+
+// SHA-256 en hexadecimal del contenido del archivo (null si el navegador no
+// expone crypto.subtle, p. ej. fuera de un contexto seguro, o si el archivo
+// supera HASH_MAX_FILE_SIZE)
+export const hashFile = async (file: File): Promise<string | null> => {
+    if (!window.crypto?.subtle || file.size > HASH_MAX_FILE_SIZE) return null;
+    const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest))
+        .map((byte) => byte.toString(16).padStart(2, '0'))
+        .join('');
+};
+
 // Función para construir URLs de medios (archivos originales y miniaturas)
 export const getMediaUrl = (path: string | null | undefined): string => {
     if (!path) return '';
@@ -62,7 +150,7 @@ const handleError = (error: unknown) => {
 };
 
 const mediaService = {
-    async uploadFile(file: File): Promise<Media> {
+    async uploadFile(file: File): Promise<UploadAccepted> {
         try {
             const formData = new FormData();
             formData.append('file', file);
@@ -79,6 +167,94 @@ const mediaService = {
         }
     },
     
+    async checkUploads(files: { content_hash: string; file_size: number }[]): Promise<UploadCheckResult> {
+        try {
+            const response = await axios.post(`${API_URL}/media/upload/check`, { files });
+            return response.data;
+        } catch (error) {
+            handleError(error);
+            throw error;
+        }
+    },
+    
+    async uploadBatch(files: File[]): Promise<BatchUploadResult> {
+        try {
+            const formData = new FormData();
+            files.forEach((file) => formData.append('files', file));
+            
+            const response = await axios.post(`${API_URL}/media/upload/batch`, formData, {
+                headers: {
+                    'Content-Type': 'multipart/form-data',
+                },
+            });
+            return response.data;
+        } catch (error) {
+            handleError(error);
+            throw error;
+        }
+    },
+    
+    // Sube solo los archivos cuyo contenido no está ya en el servidor
+    async uploadFiles(files: File[]): Promise<UploadSummary> {
+        const summary: UploadSummary = { uploaded: [], skipped: 0, failed: [] };
+        
+        // Calcular los hashes de uno en uno para no cargar todos los archivos en memoria
+        const hashes: (string | null)[] = [];
+        for (const file of files) {
+            hashes.push(await hashFile(file).catch(() => null));
+        }
+        
+        const existing = new Set<string>();
+        const candidates = files
+            .map((file, index) => ({ content_hash: hashes[index], file_size: file.size }))
+            .filter((item): item is { content_hash: string; file_size: number } => item.content_hash !== null);
+        for (let start = 0; start < candidates.length; start += UPLOAD_CHECK_BATCH) {
+            try {
+                const result = await this.checkUploads(candidates.slice(start, start + UPLOAD_CHECK_BATCH));
+                result.existing.forEach((match) => existing.add(match.content_hash));
+            } catch (error) {
+                // Si la comprobación falla se suben todos; el servidor deduplica igualmente
+                console.error('Error comprobando archivos existentes:', error);
+            }
+        }
+        
+        const pending = files.filter((file, index) => {
+            const hash = hashes[index];
+            return !(hash && existing.has(hash));
+        });
+        summary.skipped = files.length - pending.length;
+        
+        // Enviar los archivos restantes en lotes (una petición por lote)
+        for (const batch of splitIntoBatches(pending)) {
+            try {
+                const result = await this.uploadBatch(batch);
+                result.items.forEach((item) => {
+                    if (item.status === 'error') {
+                        summary.failed.push(item.filename);
+                    } else if (item.status === 'duplicate') {
+                        summary.skipped += 1;
+                    } else {
+                        summary.uploaded.push(item);
+                    }
+                });
+            } catch (error) {
+                console.error('Error uploading batch:', error);
+                summary.failed.push(...batch.map((file) => file.name));
+            }
+        }
+        return summary;
+    },
+    
+    async getJob(jobId: number): Promise<IngestJob> {
+        try {
+            const response = await axios.get(`${API_URL}/media/jobs/${jobId}`);
+            return response.data;
+        } catch (error) {
+            handleError(error);
+            throw error;
+        }
+    },
+    
     async getAllMedia(): Promise<Media[]> {
         try {
             // Añadir un timestamp como parámetro de consulta para evitar caché
@@ -42,8 +42,11 @@ export const ViewMode = {
 
 export const AIModel = {
   CLIP: 'clip',
+  CLIP_ONNX: 'clip_onnx',
+  CLIP_INT8: 'clip_int8',
   OPENCV_DNN: 'opencv_dnn',
-  OPENCV_YOLO: 'opencv_yolo'
+  OPENCV_YOLO: 'opencv_yolo',
+  CASCADE: 'cascade'
 } as const;
 
 export const FileType = {
@@ -55,3 +58,13 @@ export const FileType = {
 export type ViewModeType = typeof ViewMode[keyof typeof ViewMode];
 export type AIModelType = typeof AIModel[keyof typeof AIModel];
 export type FileTypeType = typeof FileType[keyof typeof FileType];
+
+// Nombre visible de cada modelo de IA
+export const AIModelLabels: Record<AIModelType, string> = {
+  clip: 'CLIP',
+  clip_onnx: 'CLIP (ONNX Runtime)',
+  clip_int8: 'CLIP (int8)',
+  opencv_dnn: 'OpenCV+DNN',
+  opencv_yolo: 'OpenCV+YOLO',
+  cascade: 'Cascada (YOLO + CLIP)'
+};
@@ -7,6 +7,7 @@ export interface Media {
   filename: string;
   file_path: string;
   file_size: number;
+  content_hash?: string | null;
   created_at: string;
   updated_at: string;
   creation_date?: string;
@@ -20,6 +21,7 @@ export interface Media {
   longitude?: number | null;
   event_type?: string | null;
   event_confidence?: number | null;
+  classified_by?: string | null;
 }
 
 export interface MediaUpdate {
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark del índice aproximado (IVF / IVF-PQ) frente a la búsqueda exacta.
+
+Mide el recall@k respecto a la fuerza bruta y la latencia media por consulta
+para varios valores de nprobe, sobre datos sintéticos agrupados o sobre los
+embeddings reales del almacén.
+
+Uso:
+    python scripts/benchmark_ann.py --n 100000 --nprobe 1 4 8 16 32
+    python scripts/benchmark_ann.py --pq-m 32
+    python scripts/benchmark_ann.py --store   # embeddings de storage/embeddings
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from module_loader_v2 import setup_paths
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Vectores normalizados agrupados alrededor de ``clusters`` centros (como embeddings reales)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="Vectores sintéticos")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--pq-m", type=int, default=0, help="Subespacios PQ (0 = sin PQ)")
+    parser.add_argument("--rerank", type=int, default=4, help="Factor de re-puntuación exacta con PQ")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--store", action="store_true", help="Usar los embeddings del almacén en lugar de datos sintéticos")
+    args = parser.parse_args()
+
+    setup_paths()
+    from app.services.ann_index import IVFIndex
+    from app.services.embedding_store import get_embedding_store
+
+    if args.store:
+        ids, vectors = get_embedding_store().live()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if ids.shape[0] == 0:
+            print("El almacén de embeddings está vacío")
+            return 1
+    else:
+        vectors = synthetic_vectors(args.n, args.dim, args.clusters, seed=0)
+        ids = np.arange(vectors.shape[0], dtype=np.int64)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(vectors.shape[0], min(args.queries, vectors.shape[0]), replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    print(f"Vectores: {vectors.shape[0]} x {vectors.shape[1]}, consultas: {queries.shape[0]}, k={args.k}")
+
+    # Referencia exacta
+    started = time.perf_counter()
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        truth.append(set(ids[np.argpartition(-scores, args.k - 1)[:args.k]].tolist()))
+    brute_ms = (time.perf_counter() - started) * 1000 / queries.shape[0]
+    print(f"Fuerza bruta: {brute_ms:.2f} ms/consulta")
+
+    started = time.perf_counter()
+    index = IVFIndex(vectors.shape[1], nlist=args.nlist, pq_m=args.pq_m)
+    index.train(vectors)
+    index.add(ids, vectors)
+    print(f"Entrenamiento + inserción: {time.perf_counter() - started:.1f} s ({index.nlist} particiones)")
+
+    row_of = {int(item_id): row for row, item_id in enumerate(ids)}
+    rerank = (lambda found: vectors[[row_of[int(i)] for i in found]]) if args.pq_m else None
+
+    print(f"{'nprobe':>7} {'recall@k':>9} {'ms/consulta':>12} {'aceleración':>12}")
+    for nprobe in args.nprobe:
+        hits = 0
+        started = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            found, _ = index.search(query, args.k, nprobe, rerank=rerank, rerank_factor=args.rerank)
+            hits += len(expected.intersection(found.tolist()))
+        ann_ms = (time.perf_counter() - started) * 1000 / queries.shape[0]
+        recall = hits / (args.k * queries.shape[0])
+        print(f"{nprobe:>7} {recall:>9.3f} {ann_ms:>12.2f} {brute_ms / ann_ms:>11.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
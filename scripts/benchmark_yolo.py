@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Latencia y coincidencia del evento de cada variante de YOLO y tamaño de entrada.
+
+Clasifica una muestra de imágenes con cada combinación (variante × tamaño) y
+muestra los ms por imagen (preprocesado, red y post-procesado), la aceleración y
+la fracción de imágenes con el mismo evento que la referencia (la primera
+combinación), para elegir el punto velocidad/precisión de cada despliegue.
+
+Uso:
+    python scripts/benchmark_yolo.py storage/uploads --limit 100
+    python scripts/benchmark_yolo.py muestra --variants yolov4 yolov4-tiny --sizes 416 320 288
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+from module_loader_v2 import setup_paths
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir", type=Path, help="Directorio con las imágenes (recursivo)")
+    parser.add_argument("--limit", type=int, default=100, help="Máximo de imágenes")
+    parser.add_argument("--variants", nargs="+", help="Variantes a comparar (por defecto, todas las descubiertas)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[416, 320, 288])
+    args = parser.parse_args()
+
+    setup_paths()
+    from app.core.config import settings
+    from app.services.media_context import MediaContext
+    from app.services.media_processor import MediaProcessor
+    from app.services.yolo_models import discover_yolo_bundles, yolo_input_size
+
+    variants = args.variants or sorted(discover_yolo_bundles(), key=lambda v: (v != "yolov4", v))
+    if not variants:
+        print("No hay variantes de YOLO en el directorio de modelos")
+        return 1
+    paths = sorted(p for p in args.sample_dir.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)[:args.limit]
+    if not paths:
+        print(f"No hay imágenes en {args.sample_dir}")
+        return 1
+    contexts = [MediaContext(str(path), "image/*") for path in paths]
+    for context in contexts:
+        context.image_bgr  # decodificar antes de medir
+    print(f"Imágenes: {len(contexts)}, variantes: {', '.join(variants)}")
+
+    processor = MediaProcessor(use_inference_server=False)
+    reference = None
+    print(f"{'variante':>14} {'tamaño':>7} {'ms/imagen':>10} {'aceleración':>12} {'mismo evento':>13}")
+    for variant in variants:
+        for size in dict.fromkeys(yolo_input_size(s) for s in args.sizes):
+            settings.YOLO_VARIANT, settings.YOLO_INPUT_SIZE = variant, size
+            with contextlib.redirect_stdout(io.StringIO()):
+                processor._predict_event_opencv_dnn(str(paths[0]), contexts[0])  # carga y calentamiento
+                started = time.perf_counter()
+                events = [processor._predict_event_opencv_dnn(c.file_path, c)[0] for c in contexts]
+                elapsed_ms = (time.perf_counter() - started) * 1000 / len(contexts)
+            if reference is None:
+                reference = (events, elapsed_ms)
+            agreement = sum(a == b for a, b in zip(events, reference[0])) / len(events)
+            print(f"{variant:>14} {size:>7} {elapsed_ms:>10.1f} {reference[1] / elapsed_ms:>11.2f}x {agreement:>13.3f}")
+    for context in contexts:
+        context.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Paridad y rendimiento de las variantes de CLIP (clip_onnx, clip_int8) frente a fp32.
+
+Clasifica una muestra de imágenes con cada codificador de imagen y muestra los
+ms por imagen, la aceleración respecto a fp32, la coincidencia del evento top-1
+con fp32, la similitud coseno de los embeddings y, si la muestra está
+etiquetada, la precisión. Una imagen está etiquetada cuando su carpeta tiene el
+nombre de un evento (``muestra/boda/foto.jpg``).
+
+Uso:
+    python scripts/clip_parity.py storage/uploads --limit 200
+    python scripts/clip_parity.py muestra_etiquetada --variants clip_int8 --min-agreement 0.97
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from module_loader_v2 import setup_paths
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir", type=Path, help="Directorio con las imágenes (recursivo)")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de imágenes")
+    parser.add_argument("--variants", nargs="+", default=["clip_onnx", "clip_int8"],
+                        choices=["clip_onnx", "clip_int8"])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-agreement", type=float, default=0.0,
+                        help="Termina con error si alguna variante coincide con fp32 en menos de esta fracción")
+    args = parser.parse_args()
+
+    setup_paths()
+    from app.services.clip_backends import clip_parity_report
+    from app.services.event_labels import CLIP_EVENT_TRANSLATION
+    from app.services.media_context import MediaContext
+    from app.services.media_processor import MediaProcessor
+
+    paths = sorted(p for p in args.sample_dir.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)[:args.limit]
+    if not paths:
+        print(f"No hay imágenes en {args.sample_dir}")
+        return 1
+    events = set(CLIP_EVENT_TRANSLATION.values())
+    labels = [p.parent.name if p.parent.name in events else None for p in paths]
+    # Misma decodificación reducida y orientación EXIF que la ingesta
+    images = []
+    for path in paths:
+        with MediaContext(str(path), "image/*") as context:
+            images.append(context.image)
+    print(f"Imágenes: {len(images)} ({sum(label is not None for label in labels)} etiquetadas)")
+
+    report = clip_parity_report(MediaProcessor(use_inference_server=False), images, labels,
+                                variants=args.variants, batch_size=args.batch_size)
+
+    print(f"{'variante':>10} {'ms/imagen':>10} {'aceleración':>12} {'top-1 = fp32':>13} {'coseno mín':>11} {'precisión':>10}")
+    failed = False
+    for variant, entry in report.items():
+        agreement = entry.get("top1_agreement")
+        if agreement is not None and agreement < args.min_agreement:
+            failed = True
+        print(f"{variant:>10} {entry['ms_per_image']:>10.2f} "
+              f"{entry.get('speedup', 1.0):>11.2f}x "
+              f"{'-' if agreement is None else f'{agreement:.3f}':>13} "
+              f"{'-' if 'min_cosine' not in entry else format(entry['min_cosine'], '.4f'):>11} "
+              f"{'-' if 'accuracy' not in entry else format(entry['accuracy'], '.3f'):>10}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
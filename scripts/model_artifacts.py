@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Prepara y verifica los artefactos de modelos para nodos sin salida a internet.
+
+Subcomandos:
+    bundle   Descarga/exporta los modelos a storage/models y escribe manifest.json
+             (tamaño, SHA-256 y origen de cada archivo). Con --archive empaqueta
+             el directorio en un .tar.gz para copiarlo a los nodos.
+    verify   Comprueba los archivos contra el manifiesto (--quick: solo tamaños).
+    install  Extrae un paquete en storage/models y lo verifica.
+
+Uso:
+    python scripts/model_artifacts.py bundle --clip --clip-onnx --yolo yolov4 yolov4-tiny --archive modelos.tar.gz
+    python scripts/model_artifacts.py install modelos.tar.gz
+    python scripts/model_artifacts.py verify
+"""
+import argparse
+import sys
+import tarfile
+from pathlib import Path
+
+from module_loader_v2 import setup_paths
+
+def bundle(args) -> int:
+    from app.core.config import settings
+    from app.services.media_processor import MediaProcessor
+    from app.services.model_artifacts import ModelManifest, clip_bundle_dir, models_dir
+
+    settings.MODEL_OFFLINE = False  # preparar el paquete es precisamente lo que necesita red
+    manifest = ModelManifest(models_dir())
+
+    if args.clip or args.clip_onnx:
+        from transformers import CLIPModel, CLIPProcessor
+        target = clip_bundle_dir()
+        if not (target / "config.json").exists():
+            print(f"Descargando {settings.CLIP_MODEL_NAME} -> {target}")
+            # safetensors: transformers lo carga mapeado en memoria
+            CLIPModel.from_pretrained(settings.CLIP_MODEL_NAME).save_pretrained(target, safe_serialization=True)
+            CLIPProcessor.from_pretrained(settings.CLIP_MODEL_NAME).save_pretrained(target)
+        count = manifest.add_tree(target, source=f"hf://{settings.CLIP_MODEL_NAME}")
+        print(f"CLIP: {count} archivos registrados")
+
+    if args.clip_onnx:
+        from app.services.clip_backends import export_vision_onnx
+        path = export_vision_onnx()
+        manifest.add(path, source=f"onnx-export://{settings.CLIP_MODEL_NAME}")
+        print(f"CLIP ONNX: {path}")
+
+    processor = MediaProcessor(use_inference_server=False)
+    for variant in args.yolo or []:
+        paths = processor._opencv_dnn_paths(variant)
+        for path in paths:
+            manifest.add(path, source=f"yolo://{variant}")
+        print(f"YOLO {variant}: {', '.join(p.name for p in paths)}")
+
+    manifest.save()
+    print(f"Manifiesto: {manifest.path} ({len(manifest.artifacts)} artefactos)")
+
+    if args.archive:
+        with tarfile.open(args.archive, "w:gz") as archive:
+            archive.add(manifest.path, arcname="manifest.json")
+            for key in sorted(manifest.artifacts):
+                archive.add(manifest.root / key, arcname=key)
+        print(f"Paquete: {args.archive}")
+    return 0
+
+def verify(args) -> int:
+    from app.services.model_artifacts import ModelManifest, models_dir
+
+    manifest = ModelManifest(models_dir())
+    if not manifest.path.exists():
+        print(f"No hay manifiesto en {manifest.path}")
+        return 1
+    problems = manifest.verify(full=not args.quick)
+    for problem in problems:
+        print(f"ERROR {problem}")
+    print(f"{len(manifest.artifacts) - len(problems)}/{len(manifest.artifacts)} artefactos correctos")
+    return 1 if problems else 0
+
+def install(args) -> int:
+    from app.services.model_artifacts import models_dir
+
+    target = models_dir()
+    target.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(args.archive, "r:gz") as archive:
+        for member in archive.getmembers():
+            # Solo archivos dentro del directorio de modelos
+            if not member.isfile() or Path(member.name).is_absolute() or ".." in Path(member.name).parts:
+                print(f"Se omite {member.name}")
+                continue
+            archive.extract(member, target)
+    print(f"Extraído en {target}")
+    args.quick = False
+    return verify(args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bundle_parser = commands.add_parser("bundle", help="Descargar modelos y escribir el manifiesto")
+    bundle_parser.add_argument("--clip", action="store_true", help="Modelo CLIP_MODEL_NAME (safetensors)")
+    bundle_parser.add_argument("--clip-onnx", action="store_true", help="Exportar además el codificador ONNX")
+    bundle_parser.add_argument("--yolo", nargs="*", metavar="VARIANTE", help="Variantes de YOLO")
+    bundle_parser.add_argument("--archive", type=Path, help="Empaquetar en este .tar.gz")
+    bundle_parser.set_defaults(handler=bundle)
+
+    verify_parser = commands.add_parser("verify", help="Verificar contra el manifiesto")
+    verify_parser.add_argument("--quick", action="store_true", help="Comprobar solo tamaños")
+    verify_parser.set_defaults(handler=verify)
+
+    install_parser = commands.add_parser("install", help="Extraer un paquete y verificarlo")
+    install_parser.add_argument("archive", type=Path)
+    install_parser.set_defaults(handler=install)
+
+    args = parser.parse_args()
+    setup_paths()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 """
 Script para actualizar la estructura de la base de datos
-Añade la columna processed_file_path a la tabla media si no existe
+Añade las columnas processed_file_path, content_hash y classified_by a la tabla media si no existen
+y calcula el SHA-256 de los archivos ya subidos
 """
+import hashlib
 import os
 import sys
 import sqlite3
@@ -14,6 +16,36 @@ project_dir = script_dir.parent
 
 # Obtener la ruta de la base de datos
 DB_PATH = os.environ.get('DB_PATH', str(project_dir / 'storage' / 'db.sqlite3'))
+STORAGE_DIR = Path(DB_PATH).parent
+
+def file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def backfill_content_hashes(conn):
+    """Calcula el SHA-256 de los medios sin hash; los duplicados se dejan sin hash."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT content_hash FROM media WHERE content_hash IS NOT NULL")
+    known = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT id, file_path FROM media WHERE content_hash IS NULL ORDER BY id")
+    updated = 0
+    for media_id, file_path in cursor.fetchall():
+        path = STORAGE_DIR / file_path.lstrip('/')
+        if not path.exists():
+            print(f"- Archivo no encontrado para media {media_id}: {path}")
+            continue
+        content_hash = file_sha256(path)
+        if content_hash in known:
+            print(f"- Media {media_id} duplica el contenido de otro medio; se deja sin hash")
+            continue
+        known.add(content_hash)
+        conn.execute("UPDATE media SET content_hash = ? WHERE id = ?", (content_hash, media_id))
+        updated += 1
+    conn.commit()
+    print(f"Hashes de contenido calculados: {updated}")
 
 def main():
     print(f"Intentando actualizar la base de datos en: {DB_PATH}")
@@ -35,6 +67,25 @@ def main():
         else:
             print("La columna processed_file_path ya existe. No se requieren cambios.")
         
+        if 'content_hash' not in columns:
+            print("La columna content_hash no existe, añadiéndola...")
+            cursor.execute("ALTER TABLE media ADD COLUMN content_hash VARCHAR(64)")
+            conn.commit()
+            print("Columna añadida exitosamente")
+        else:
+            print("La columna content_hash ya existe.")
+        backfill_content_hashes(conn)
+        
+        if 'classified_by' not in columns:
+            print("La columna classified_by no existe, añadiéndola...")
+            cursor.execute("ALTER TABLE media ADD COLUMN classified_by VARCHAR")
+            conn.commit()
+            print("Columna añadida exitosamente")
+        else:
+            print("La columna classified_by ya existe.")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_media_content_hash ON media (content_hash)")
+        conn.commit()
+        
         print("Verificando las columnas actuales:")
         cursor.execute("PRAGMA table_info(media)")
         columns = cursor.fetchall()